@@ -0,0 +1,233 @@
+"""Autocomplete latency percentiles under mixed chat and autocomplete load.
+
+Requests go through the whole app over ASGI to a fake Ollama server, which
+generates a limited number of responses per model at once like Ollama does.
+Simulated users type in bursts, every keystroke sends an autocomplete request
+and the latency of the last request of a burst, the suggestion the user sees,
+is measured. Meanwhile chat requests keep the chat model busy.
+
+The autocomplete lane is compared with all requests sent through the default
+lane without supersession, as before the lane existed:
+
+    python benchmarks/autocomplete_latency.py
+"""
+
+import argparse
+import asyncio
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+
+AUTOCOMPLETE_MODEL = "autocomplete:latest"
+CHAT_MODEL = "chat:latest"
+
+
+class FakeOllama:
+    """Streams tokens of generate and chat responses, `parallel` responses per model at once."""
+
+    def __init__(self, parallel: int, token_delay: float) -> None:
+        from aiohttp import web
+
+        self.parallel = parallel
+        self.token_delay = token_delay
+        self.slots: dict[str, asyncio.Semaphore] = {}
+
+        self.app = web.Application()
+        self.app.router.add_post("/api/generate", self.generate)
+        self.app.router.add_post("/api/chat", self.generate)
+
+    async def generate(self, request):
+        from aiohttp import web
+
+        data = await request.json()
+        slots = self.slots.setdefault(data["model"], asyncio.Semaphore(self.parallel))
+        tokens = data.get("options", {}).get("num_predict", 20)
+
+        response = web.StreamResponse()
+        await response.prepare(request)
+
+        async with slots:
+            try:
+                for _ in range(tokens):
+                    await asyncio.sleep(self.token_delay)
+                    await response.write(b'{"response":"tok","done":false}\n')
+
+                await response.write(b'{"response":"","done":true,"eval_count":1}\n')
+            except ConnectionError:
+                # superseded autocomplete request closed by the proxy
+                pass
+
+        return response
+
+
+def build_app(upstream: str, users: dict[str, object], lanes: bool):
+    import ollama_x.api.ollama
+    from fastapi import FastAPI
+    from ollama_x.api.helpers import get_session
+    from ollama_x.api.middleware import MIDDLEWARES
+    from ollama_x.api.ollama import router
+    from ollama_x.model import APIServer
+
+    server = APIServer(url=upstream)
+
+    async def authenticate(request, anonymous_allowed=True):
+        return users[request.headers["authorization"]]
+
+    async def route(user, requested_model, lane=None):
+        return server, requested_model
+
+    async def no_completion(request, request_data):
+        return None
+
+    for module in ("ollama", "ratelimit"):
+        sys.modules[f"ollama_x.api.middleware.{module}"].authenticate = authenticate
+
+    ollama_x.api.ollama.route = route
+
+    if not lanes:
+        ollama_x.api.ollama.start_completion = no_completion
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_session] = lambda: None
+
+    for middleware in MIDDLEWARES:
+        app.add_middleware(middleware)
+
+    return app
+
+
+async def post(client, user: str, path: str, data: dict) -> tuple[float, bool]:
+    """Latency of a streamed request and whether it was completed."""
+
+    start = time.perf_counter()
+
+    async with client.stream("POST", path, json=data, headers={"authorization": user}) as response:
+        body = b"".join([chunk async for chunk in response.aiter_bytes()])
+
+    return time.perf_counter() - start, response.status_code == 200 and b'"done":true' in body
+
+
+async def type_code(client, user: str, args, deadline: float, latencies: list[float]) -> None:
+    """Type bursts of keystrokes, the last suggestion of a burst is awaited."""
+
+    prompt = ""
+
+    while time.perf_counter() < deadline:
+        requests = []
+
+        for _ in range(args.keystrokes):
+            prompt += "x"
+            data = {
+                "model": AUTOCOMPLETE_MODEL,
+                "prompt": prompt,
+                "suffix": "\n",
+                "options": {"num_predict": args.autocomplete_tokens},
+            }
+            requests.append(asyncio.create_task(post(client, user, "/api/generate", data)))
+            await asyncio.sleep(args.keystroke_interval)
+
+        latency, completed = await requests[-1]
+        await asyncio.gather(*requests)
+
+        if completed:
+            latencies.append(latency)
+
+        await asyncio.sleep(args.pause)
+
+
+async def chat(client, user: str, args, deadline: float) -> int:
+    finished = 0
+
+    while time.perf_counter() < deadline:
+        data = {
+            "model": CHAT_MODEL,
+            "messages": [{"role": "user", "content": "Explain"}],
+            "options": {"num_predict": args.chat_tokens},
+        }
+        await post(client, user, "/api/chat", data)
+        finished += 1
+
+    return finished
+
+
+async def measure(args, lanes: bool) -> tuple[list[float], int]:
+    import httpx
+    from aiohttp import web
+    from ollama_x.client.ollama import OllamaClient
+    from ollama_x.model import User
+
+    fake = FakeOllama(args.parallel, args.token_delay)
+    runner = web.AppRunner(fake.app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    users = {f"user-{i}": User(username=f"user-{i}") for i in range(args.users + args.chats)}
+    app = build_app(f"http://127.0.0.1:{port}", users, lanes)
+
+    transport = httpx.ASGITransport(app=app)
+    latencies: list[float] = []
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://test", timeout=None
+    ) as client:
+        deadline = time.perf_counter() + args.duration
+        names = list(users)
+
+        chats = [chat(client, name, args, deadline) for name in names[args.users :]]
+        typing = [
+            type_code(client, name, args, deadline, latencies) for name in names[: args.users]
+        ]
+
+        results = await asyncio.gather(*chats, *typing)
+
+    await OllamaClient.close_sessions()
+    await runner.cleanup()
+
+    return latencies, sum(results[: args.chats])
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[round(fraction * 100) - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", default=30.0, type=float)
+    parser.add_argument("--users", default=4, type=int, help="Users typing code")
+    parser.add_argument("--chats", default=8, type=int, help="Concurrent chat requests")
+    parser.add_argument("--parallel", default=2, type=int, help="Responses per model at once")
+    parser.add_argument("--token-delay", default=0.01, type=float)
+    parser.add_argument("--autocomplete-tokens", default=20, type=int)
+    parser.add_argument("--chat-tokens", default=200, type=int)
+    parser.add_argument("--keystrokes", default=5, type=int)
+    parser.add_argument("--keystroke-interval", default=0.06, type=float)
+    parser.add_argument("--pause", default=0.4, type=float)
+    parser.add_argument("--lanes", choices=["on", "off"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+    # APIServer of the fake server is never stored
+    warnings.filterwarnings("ignore", "Pydantic serializer warnings")
+
+    if args.lanes is None:
+        # Modes patch the app differently, each one runs in its own process.
+        for mode in ("off", "on"):
+            subprocess.run([sys.executable, __file__, *sys.argv[1:], "--lanes", mode], check=True)
+        return
+
+    latencies, chats = asyncio.run(measure(args, args.lanes == "on"))
+    label = "autocomplete lane" if args.lanes == "on" else "default lane only"
+
+    print(f"{label}: {len(latencies)} suggestions, {chats} chats in {args.duration:.0f}s")
+    print(f"  p50: {percentile(latencies, 0.5) * 1e3:.0f} ms")
+    print(f"  p99: {percentile(latencies, 0.99) * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
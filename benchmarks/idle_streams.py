@@ -0,0 +1,113 @@
+"""Event loop utilisation with idle inner client response streams.
+
+Opens idle streams whose consumers wait for chunks that do not come yet and
+measures the loop CPU usage and the lag of a timer meanwhile, then the cost
+of passing a chunk through one stream. Compare with an older revision by
+pointing `--root` to its worktree:
+
+    git worktree add /tmp/before 6206640~1
+    python benchmarks/idle_streams.py --root /tmp/before
+    python benchmarks/idle_streams.py
+"""
+
+import argparse
+import asyncio
+import importlib
+import pathlib
+import statistics
+import sys
+import time
+
+PROBE_INTERVAL = 0.05
+
+
+class Stream:
+    """Common interface over `ResponseChannel` and the former `ResponseIterable`."""
+
+    def __init__(self, inner) -> None:
+        if hasattr(inner, "ResponseChannel"):
+            self.iterable = inner.ResponseChannel()
+        else:
+            self.iterable = inner.ResponseIterable()
+
+    async def put(self, chunk: bytes) -> None:
+        if hasattr(self.iterable, "put"):
+            await self.iterable.put(chunk)
+        else:
+            await self.iterable.add(chunk)
+
+    async def finish(self) -> None:
+        if hasattr(self.iterable, "finish"):
+            self.iterable.finish()
+        else:
+            await self.iterable.stop()
+
+    async def consume(self) -> None:
+        async for _ in self.iterable:
+            pass
+
+
+async def idle(inner, streams: int, probes: int) -> tuple[float, float]:
+    """Loop CPU usage and mean timer lag in seconds while the streams are idle."""
+
+    opened = [Stream(inner) for _ in range(streams)]
+    consumers = [asyncio.create_task(stream.consume()) for stream in opened]
+    await asyncio.sleep(0)
+
+    lags = []
+    cpu, wall = time.process_time(), time.perf_counter()
+
+    for _ in range(probes):
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+
+    for stream in opened:
+        await stream.finish()
+
+    await asyncio.gather(*consumers)
+
+    return cpu / wall, statistics.mean(lags)
+
+
+async def throughput(inner, chunks: int) -> float:
+    """Seconds to pass one chunk from the producer to the consumer."""
+
+    stream = Stream(inner)
+
+    async def produce() -> None:
+        for _ in range(chunks):
+            await stream.put(b"chunk")
+
+        await stream.finish()
+
+    start = time.perf_counter()
+    await asyncio.gather(produce(), stream.consume())
+
+    return (time.perf_counter() - start) / chunks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", default=pathlib.Path(__file__).parents[1], type=pathlib.Path)
+    parser.add_argument("--streams", default=100, type=int)
+    parser.add_argument("--probes", default=40, type=int)
+    parser.add_argument("--chunks", default=20000, type=int)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(args.root.resolve()))
+    inner = importlib.import_module("ollama_x.client.inner")
+
+    usage, lag = asyncio.run(idle(inner, args.streams, args.probes))
+    per_chunk = asyncio.run(throughput(inner, args.chunks))
+
+    print(f"{args.root}: {args.streams} idle streams")
+    print(f"  loop CPU usage: {usage:.0%}")
+    print(f"  timer lag:      {lag * 1e3:.2f} ms")
+    print(f"  one stream:     {per_chunk * 1e6:.2f} us/chunk")
+
+
+if __name__ == "__main__":
+    main()
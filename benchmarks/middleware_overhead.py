@@ -0,0 +1,151 @@
+"""Per-chunk overhead of the middleware stack on a streamed /api/chat response.
+
+The app is driven directly through ASGI with authentication and langfuse
+observation stubbed, so only the middlewares are measured. Compare with an
+older revision by pointing `--root` to its worktree:
+
+    git worktree add /tmp/before 857c92f~1
+    python benchmarks/middleware_overhead.py --root /tmp/before
+    python benchmarks/middleware_overhead.py
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import pathlib
+import statistics
+import sys
+import time
+
+CHUNK = (
+    json.dumps({"model": "m", "message": {"role": "assistant", "content": "tok"}, "done": False})
+    + "\n"
+).encode()
+
+BODY = json.dumps({"model": "m", "messages": [{"role": "user", "content": "hi"}]}).encode()
+
+
+def stub_dependencies() -> None:
+    """Authenticate every request as a fixed user and skip langfuse observation."""
+
+    from ollama_x.model import User
+
+    ollama = importlib.import_module("ollama_x.api.middleware.ollama")
+    langfuse = importlib.import_module("ollama_x.api.middleware.langfuse")
+
+    async def authenticate(request, anonymous_allowed=True):
+        return User(id="0" * 24, username="user", key=User.generate_key())
+
+    async def observe(self):
+        pass
+
+    ollama.authenticate = authenticate
+
+    for name in ("LangfuseMiddleware", "LangfuseObserver"):
+        cls = getattr(langfuse, name, None)
+
+        if cls is not None and hasattr(cls, "observe"):
+            cls.observe = observe
+
+
+def build_app(chunks: int, with_middlewares: bool):
+    from fastapi import FastAPI
+    from starlette.responses import StreamingResponse
+
+    middlewares = importlib.import_module("ollama_x.api.middleware").MIDDLEWARES
+
+    app = FastAPI()
+
+    @app.post("/api/chat")
+    async def chat():
+        async def generate():
+            for _ in range(chunks):
+                yield CHUNK
+
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    if with_middlewares:
+        if isinstance(middlewares, dict):
+            # BaseHTTPMiddleware dispatch functions
+            for middleware_class, dispatchers in middlewares.items():
+                for dispatch in dispatchers:
+                    app.add_middleware(middleware_class, dispatch=dispatch)
+        else:
+            for middleware in middlewares:
+                app.add_middleware(middleware)
+
+    return app
+
+
+async def request(app) -> float:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/chat",
+        "raw_path": b"/api/chat",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"authorization", b"Bearer key")],
+        "client": ("127.0.0.1", 1),
+        "server": ("127.0.0.1", 80),
+    }
+
+    received = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal received
+
+        if not received:
+            received = True
+            return {"type": "http.request", "body": BODY, "more_body": False}
+
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and not message.get("more_body"):
+            finished.set()
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+
+    return time.perf_counter() - start
+
+
+async def measure(chunks: int, repeat: int) -> dict[str, float]:
+    results = {}
+
+    for label, with_middlewares in (("bare", False), ("middlewares", True)):
+        app = build_app(chunks, with_middlewares)
+        await request(app)
+
+        results[label] = statistics.median([await request(app) for _ in range(repeat)]) / chunks
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", default=pathlib.Path(__file__).parents[1], type=pathlib.Path)
+    parser.add_argument("--chunks", default=2000, type=int)
+    parser.add_argument("--repeat", default=15, type=int)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(args.root.resolve()))
+    stub_dependencies()
+
+    results = asyncio.run(measure(args.chunks, args.repeat))
+
+    print(f"{args.root}: {args.chunks} chunks, median of {args.repeat}")
+    print(f"  bare app:         {results['bare'] * 1e6:.2f} us/chunk")
+    print(f"  with middlewares: {results['middlewares'] * 1e6:.2f} us/chunk")
+    print(f"  overhead:         {(results['middlewares'] - results['bare']) * 1e6:.2f} us/chunk")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
-from . import continue_dev, ollama, server, user
+from . import continue_dev, metrics, ollama, registry, rollout, semantic, server, usage, user
 
 routers = [
     user.router,
     ollama.router,
     server.router,
     continue_dev.router,
+    registry.router,
+    rollout.router,
+    metrics.router,
+    usage.router,
+    semantic.router,
 ]
 
 __all__ = ["routers"]
@@ -1,16 +1,25 @@
+import dataclasses
+import hashlib
+
 from fastapi import APIRouter, Request
+from fastapi.responses import Response
 from openapi_cli.separator import CLI_SEPARATOR
 from pydantic import BaseModel, ConfigDict, Field
 
+from ollama_x import codebase, docs
 from ollama_x.api import endpoints
 from ollama_x.api.exceptions import AccessDenied, APIError
 from ollama_x.api.helpers import (
+    AdminUser,
     AuthorizedUser,
-    ContinueProject,
+    ContinueProjectId,
     ProjectWithAdminAccess,
     merge_responses,
 )
-from ollama_x.model import ContinueDevProject, User
+from ollama_x.auth import project_members
+from ollama_x.cache import MISSING, TTLCache
+from ollama_x.config import config
+from ollama_x.model import CodebaseIndex, ContinueDevProject, User
 from ollama_x.model.continue_dev import (
     AllContextProviders,
     AllModels,
@@ -19,13 +28,19 @@ from ollama_x.model.continue_dev import (
     TabAutocompleteOptions,
     UserAlreadyInProject,
 )
+from ollama_x.model.ratelimit import RateLimits
 from ollama_x.model.user import UserNotFound
 
 PREFIX = "continue"
+PERSONALIZED_CONFIG_TTL = 3600
 EDIT_COMMAND = f"{PREFIX}.edit.{CLI_SEPARATOR}"
 
 router = APIRouter(tags=[endpoints.CONTINUE])
 
+personalized_configs: TTLCache[tuple[str, int, str, str], tuple[str, bytes]] = TTLCache(
+    "continue_configs", config.continue_config_cache_size, PERSONALIZED_CONFIG_TTL
+)
+
 
 DEFAULT_RESPONSES = {
     404: {
@@ -121,6 +136,7 @@ async def continue_join(invite_id: str, user_key: str) -> JoinResult:
     project = await ContinueDevProject.one_by_invite_id(invite_id)
 
     await project.add_user(user.id)
+    project_members.invalidate(project.id)
 
     return JoinResult(continue_dev_token=f"{user.key.get_secret_value()}:{project.id}")
 
@@ -132,22 +148,65 @@ class ContinueConfig(BaseModel):
     config_js: str = Field(default="", alias="configJs")
 
 
+def config_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(header: str | None, etag: str) -> bool:
+    """Check if `If-None-Match` header lists the ETag, compared weakly."""
+
+    if header is None:
+        return False
+
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
 @router.get(
     endpoints.CONTINUE_SYNC_CONFIG,
     summary="Get project config.",
     operation_id=f"{PREFIX}.sync",
     response_model_exclude_none=True,
     response_model=ContinueConfig,
-    responses=DEFAULT_RESPONSES,
+    responses=DEFAULT_RESPONSES
+    | {304: {"description": "Config matching If-None-Match is not changed."}},
 )
-async def get_config(project: ContinueProject, request: Request):
-    """Get project config."""
+async def get_config(project_id: ContinueProjectId, request: Request) -> Response:
+    """Get project config.
 
-    return ContinueConfig(
-        config_json=project.personalize(
-            request.state.user, str(request.base_url)
-        ).config.model_dump_json(by_alias=True, exclude_none=True)
-    )
+    Personalized config is cached per project version, user key and base URL.
+    """
+
+    user = request.state.user
+    base_url = str(request.base_url)
+    access = await project_members.access(project_id)
+
+    cache_key = (project_id, access.version, user.key_hash.get_secret_value(), base_url)
+    cached = personalized_configs.get(cache_key)
+
+    if cached is MISSING:
+        project = await ContinueDevProject.one(project_id)
+
+        body = (
+            ContinueConfig(
+                config_json=project.personalize(user, base_url).config.model_dump_json(
+                    by_alias=True, exclude_none=True
+                )
+            )
+            .model_dump_json(by_alias=True)
+            .encode()
+        )
+        cached = (config_etag(body), body)
+
+        personalized_configs.set(cache_key, cached)
+
+    etag, body = cached
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return Response(body, media_type="application/json", headers={"ETag": etag})
 
 
 @router.post(
@@ -164,6 +223,7 @@ async def reset_invite_id(project_id: str):
     project = await ContinueDevProject.one(project_id)
 
     await project.reset_invite_id()
+    project_members.invalidate(project.id)
 
     return project
 
@@ -183,7 +243,8 @@ async def edit_models(project: ProjectWithAdminAccess, models: list[AllModels] |
 
     project.config.models = models
 
-    await project.commit_changes(fields=["config"])
+    await project.commit_config()
+    project_members.invalidate(project.id)
 
     return project
 
@@ -202,7 +263,8 @@ async def edit_embeddings(
 
     project.config.embeddings_provider = embeddings
 
-    await project.commit_changes(fields=["config"])
+    await project.commit_config()
+    project_members.invalidate(project.id)
 
     return project
 
@@ -221,7 +283,8 @@ async def edit_tab_autocomplete_model(
 
     project.config.tab_autocomplete_model = model
 
-    await project.commit_changes(fields=["config"])
+    await project.commit_config()
+    project_members.invalidate(project.id)
 
     return project
 
@@ -240,7 +303,8 @@ async def edit_tab_autocomplete_options(
 
     project.config.tab_autocomplete_options = options
 
-    await project.commit_changes(fields=["config"])
+    await project.commit_config()
+    project_members.invalidate(project.id)
 
     return project
 
@@ -259,6 +323,183 @@ async def edit_context_providers(
 
     project.config.context_providers = providers
 
-    await project.commit_changes(fields=["config"])
+    await project.commit_config()
+    project_members.invalidate(project.id)
+
+    return project
+
+
+@router.patch(
+    endpoints.CONTINUE_EDIT_LIMITS,
+    operation_id=f"{EDIT_COMMAND}.limits",
+    response_model=ContinueDevProject | APIError,
+    response_model_exclude_none=True,
+    responses=DEFAULT_RESPONSES,
+    tags=["admin"],
+)
+async def edit_limits(admin: AdminUser, project_id: str, limits: RateLimits) -> ContinueDevProject:
+    """Edit project rate limits."""
+
+    project = await ContinueDevProject.one(project_id)
+    project.limits = limits
+
+    await project.commit_changes(fields=["limits"])
+    project_members.invalidate(project.id)
+
+    return project
+
+
+@router.patch(
+    endpoints.CONTINUE_EDIT_SEMANTIC_CACHE,
+    operation_id=f"{EDIT_COMMAND}.semantic-cache",
+    response_model=ContinueDevProject | APIError,
+    response_model_exclude_none=True,
+    responses=DEFAULT_RESPONSES,
+)
+async def edit_semantic_cache(project: ProjectWithAdminAccess, enabled: bool) -> ContinueDevProject:
+    """Enable or disable sharing of chat answers between project members by question similarity."""
+
+    project.semantic_cache = enabled
+
+    await project.commit_changes(fields=["semantic_cache"])
+    project_members.invalidate(project.id)
 
     return project
+
+
+class CodebaseUpdate(BaseModel):
+    """Changed and removed files of the project codebase."""
+
+    files: dict[str, str] = Field(default_factory=dict, description="Content of files by path")
+    removed: list[str] = Field(default_factory=list, description="Paths of removed files")
+
+
+class CodebaseIndexStatus(BaseModel):
+    """Result of codebase index update."""
+
+    version: int = Field(description="Index version")
+    embedded: int = Field(description="Number of embedded chunks")
+    reused: int = Field(description="Number of chunks with already known embeddings")
+    removed: int = Field(description="Number of removed chunks")
+
+
+@router.put(
+    endpoints.CONTINUE_INDEX_CODEBASE,
+    operation_id=f"{PREFIX}.index",
+    response_model=CodebaseIndexStatus | APIError,
+    responses=DEFAULT_RESPONSES,
+)
+async def index_codebase(
+    user: AuthorizedUser, project: ProjectWithAdminAccess, update: CodebaseUpdate
+) -> CodebaseIndexStatus:
+    """Update project codebase index with changed and removed files.
+
+    Only chunks with new content are embedded.
+    """
+
+    result = await codebase.update_index(user, project, update.files, update.removed)
+
+    return CodebaseIndexStatus(**dataclasses.asdict(result))
+
+
+class RetrieveRequest(BaseModel):
+    """Request of continue.dev HTTP context provider."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    query: str = Field(description="Query")
+    full_input: str | None = Field(None, description="Full user input", alias="fullInput")
+    n: int = Field(10, description="Number of chunks", gt=0, le=100)
+
+
+class ContextItem(BaseModel):
+    """Context item of continue.dev HTTP context provider."""
+
+    name: str = Field(description="Item name")
+    description: str = Field(description="Item description")
+    content: str = Field(description="Item content")
+
+
+@router.post(
+    endpoints.CONTINUE_RETRIEVE,
+    summary="Retrieve codebase chunks.",
+    operation_id=f"{PREFIX}.retrieve",
+    response_model=list[ContextItem],
+    responses=DEFAULT_RESPONSES,
+)
+async def retrieve_codebase(
+    project_id: ContinueProjectId, retrieve_request: RetrieveRequest, request: Request
+) -> list[ContextItem]:
+    """Find codebase chunks most similar to the query."""
+
+    chunks = await codebase.retrieve(
+        request.state.user, project_id, retrieve_request.query, retrieve_request.n
+    )
+
+    return [
+        ContextItem(
+            name=f"{chunk.path} ({chunk.start_line}-{chunk.end_line})",
+            description=chunk.path,
+            content=chunk.content,
+        )
+        for chunk, _ in chunks
+    ]
+
+
+class DocsSiteStatus(BaseModel):
+    """Result of docs site crawl."""
+
+    site: str = Field(description="Site start URL")
+    pages: int = Field(description="Number of crawled pages")
+    changed: int = Field(description="Number of new and changed pages")
+    removed: int = Field(description="Number of pages not found anymore")
+    index: CodebaseIndexStatus | None = Field(None, description="Index update, if any")
+
+
+@router.put(
+    endpoints.CONTINUE_INDEX_DOCS,
+    operation_id=f"{PREFIX}.docs",
+    response_model=list[DocsSiteStatus] | APIError,
+    responses=DEFAULT_RESPONSES,
+)
+async def index_docs(user: AuthorizedUser, project: ProjectWithAdminAccess) -> list[DocsSiteStatus]:
+    """Crawl docs sites of the project docs context providers and index changed pages."""
+
+    return [
+        DocsSiteStatus(
+            site=result.site,
+            pages=result.pages,
+            changed=result.changed,
+            removed=result.removed,
+            index=CodebaseIndexStatus(**dataclasses.asdict(result.index))
+            if result.index is not None
+            else None,
+        )
+        for result in await docs.ingest_sites(user, project)
+    ]
+
+
+@router.post(
+    endpoints.CONTINUE_RETRIEVE_DOCS,
+    summary="Retrieve docs chunks.",
+    operation_id=f"{PREFIX}.retrieve.docs",
+    response_model=list[ContextItem],
+    responses=DEFAULT_RESPONSES,
+)
+async def retrieve_docs(
+    project_id: ContinueProjectId, retrieve_request: RetrieveRequest, request: Request
+) -> list[ContextItem]:
+    """Find chunks of the project docs sites most similar to the query."""
+
+    chunks = await codebase.retrieve(
+        request.state.user,
+        project_id,
+        retrieve_request.query,
+        retrieve_request.n,
+        sites=await CodebaseIndex.sites(project_id),
+    )
+
+    return [
+        ContextItem(name=chunk.path, description=chunk.site, content=chunk.content)
+        for chunk, _ in chunks
+    ]
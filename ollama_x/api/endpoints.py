@@ -1,3 +1,8 @@
+SESSION_HEADER = "Ollama-X-Session"
+CONTEXT_HANDLE_HEADER = "Ollama-X-Context-Handle"
+AUTOCOMPLETE_FILE_HEADER = "Ollama-X-Autocomplete-File"
+SEMANTIC_CACHE_HEADER = "Ollama-X-Semantic-Cache"
+
 OLLAMA = "ollama"
 OPENAI = "openai"
 CONTINUE = "continue"
@@ -10,6 +15,7 @@ GENERATE = "generate"
 PROXY_CHAT = f"/{API}/{CHAT}"
 PROXY_GENERATE = f"/{API}/{GENERATE}"
 PROXY_EMBEDDINGS = f"/{API}/{EMBEDDINGS}"
+PROXY_EMBED = f"/{API}/embed"
 PROXY_TAGS = f"/{API}/tags"
 PROXY_SHOW = f"/{API}/show"
 
@@ -24,6 +30,18 @@ OLLAMA_OPENAI_CHAT = f"/{OLLAMA}/v1/{CHAT}/{COMPLETIONS}"
 OLLAMA_OPENAI_COMPLETIONS = f"/{OLLAMA}/v1/{COMPLETIONS}"
 OLLAMA_OPENAI_EMBEDDINGS = f"/v1/{EMBEDDINGS}"
 
+RATE_LIMITED = (
+    PROXY_CHAT,
+    PROXY_GENERATE,
+    PROXY_EMBEDDINGS,
+    OLLAMA_CHAT,
+    OLLAMA_COMPLETIONS,
+    OLLAMA_EMBEDDINGS,
+    OLLAMA_OPENAI_CHAT,
+    OLLAMA_OPENAI_COMPLETIONS,
+    OLLAMA_OPENAI_EMBEDDINGS,
+)
+
 PREFIX_CONTINUE_PROJECT = f"/{CONTINUE}/project/{{project_id}}"
 
 CONTINUE_ALL = f"/{CONTINUE}/all"
@@ -31,9 +49,15 @@ CONTINUE_ONE = f"/{CONTINUE}/one"
 CONTINUE_CREATE = f"/{CONTINUE}/"
 CONTINUE_PROJECT_JOIN = f"/{CONTINUE}/join/{{invite_id}}"
 CONTINUE_SYNC_CONFIG = f"/{CONTINUE}/sync"
+CONTINUE_RETRIEVE = f"/{CONTINUE}/retrieve"
+CONTINUE_RETRIEVE_DOCS = f"/{CONTINUE}/retrieve/docs"
 CONTINUE_PROJECT_RESET_INVITE = f"/{CONTINUE}/reset-invite/{{project_id}}"
 CONTINUE_EDIT_MODELS = f"{PREFIX_CONTINUE_PROJECT}/models"
 CONTINUE_EDIT_EMBEDDINGS = f"{PREFIX_CONTINUE_PROJECT}/embeddings"
 CONTINUE_EDIT_TAB_AUTOCOMPLETE_MODEL = f"{PREFIX_CONTINUE_PROJECT}/tab-autocomplete-model"
 CONTINUE_EDIT_TAB_AUTOCOMPLETE_OPTIONS = f"{PREFIX_CONTINUE_PROJECT}/tab-autocomplete-options"
 CONTINUE_EDIT_CONTEXT_PROVIDERS = f"{PREFIX_CONTINUE_PROJECT}/context-providers"
+CONTINUE_EDIT_LIMITS = f"{PREFIX_CONTINUE_PROJECT}/limits"
+CONTINUE_EDIT_SEMANTIC_CACHE = f"{PREFIX_CONTINUE_PROJECT}/semantic-cache"
+CONTINUE_INDEX_CODEBASE = f"{PREFIX_CONTINUE_PROJECT}/codebase"
+CONTINUE_INDEX_DOCS = f"{PREFIX_CONTINUE_PROJECT}/docs"
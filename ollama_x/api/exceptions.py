@@ -1,3 +1,4 @@
+import math
 from typing import Generic, Literal, Self, TypeVar
 
 from fastapi import Request
@@ -6,7 +7,9 @@ from pydantic.dataclasses import dataclass
 from pydantic_mongo_document import DocumentNotFound
 from starlette.responses import JSONResponse
 
+from ollama_x.mirror import RegistryError
 from ollama_x.model.exceptions import DuplicateKeyError
+from ollama_x.ratelimit import RateLimitExceeded
 
 TE = TypeVar("TE", bound=type[Exception])
 E = TypeVar("E", bound=Exception)
@@ -66,6 +69,27 @@ class NoServerAvailable(BaseAPIException):
         super().__init__(detail)
 
 
+class StatefulSessionUnsupported(BaseAPIException):
+    status_code = 400
+
+    def __init__(self) -> None:
+        super().__init__("Stateful sessions are supported by /api/chat only")
+
+
+class RequestSuperseded(BaseAPIException):
+    status_code = 409
+
+    def __init__(self) -> None:
+        super().__init__("Superseded by a newer autocomplete request")
+
+
+class SemanticCacheEntryNotFound(BaseAPIException):
+    status_code = 404
+
+    def __init__(self) -> None:
+        super().__init__("Semantic cache entry not found")
+
+
 class UserAlreadyExist(BaseAPIException):
     status_code = 400
 
@@ -94,6 +118,28 @@ def handle_duplicate_key_error(request: Request, exc: DuplicateKeyError):
     )
 
 
+def handle_registry_error(request: Request, exc: RegistryError) -> JSONResponse:
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"errors": [{"code": exc.code, "message": str(exc)}]},
+    )
+
+
+def handle_rate_limit_exceeded(request: Request, exc: RateLimitExceeded) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content=APIError[exc](exc).model_dump(by_alias=True),
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+
+def handle_api_exception(request: Request, exc: BaseAPIException) -> JSONResponse:
+    return JSONResponse(
+        status_code=exc.status_code,
+        content=APIError[exc](exc).model_dump(by_alias=True),
+    )
+
+
 def handle_generic_exception(request: Request, exc: Exception):
     return JSONResponse(
         status_code=500,
@@ -104,5 +150,8 @@ def handle_generic_exception(request: Request, exc: Exception):
 HANDLERS = {
     DocumentNotFound: handle_document_not_found,
     DuplicateKeyError: handle_duplicate_key_error,
+    RegistryError: handle_registry_error,
+    RateLimitExceeded: handle_rate_limit_exceeded,
+    BaseAPIException: handle_api_exception,
     Exception: handle_generic_exception,
 }
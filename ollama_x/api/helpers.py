@@ -3,9 +3,12 @@ from typing import Annotated, Any, Callable
 from fastapi import Depends, Request
 from fastapi.security import HTTPAuthorizationCredentials
 
+from ollama_x.api.endpoints import SESSION_HEADER
 from ollama_x.api.exceptions import AccessDenied
 from ollama_x.api.security import security
+from ollama_x.auth import project_members, user_keys
 from ollama_x.model import ContinueDevProject, Session, User
+from ollama_x.sessions import sessions
 
 
 def get_token(
@@ -28,12 +31,13 @@ async def auth_user(token: BearerToken, request: Request) -> User:
     if getattr(request.state, "user", None) is not None:
         return request.state.user
 
-    try:
-        request.state.user = await User.one_by_key(token)
-    except User.NotFoundError:
+    user = await user_keys.user(token)
+    if user is None:
         raise AccessDenied()
-    else:
-        return request.state.user
+
+    request.state.user = user
+
+    return user
 
 
 async def admin_user(token: BearerToken, request: Request) -> User:
@@ -43,17 +47,16 @@ async def admin_user(token: BearerToken, request: Request) -> User:
 
     if is_local and token == "admin":
         if not await User.one(add_query={"is_admin": True}, required=False):
-            await User.new(username="admin", key="admin", is_admin=True)
+            user = await User.new(username="admin", key="admin", is_admin=True)
+            user_keys.invalidate(user.id)
 
-    if getattr(request.state, "user", None) is not None and not request.state.user.is_admin:
+    user = getattr(request.state, "user", None) or await user_keys.user(token)
+    if user is None or not user.is_admin:
         raise AccessDenied()
-    else:
-        try:
-            request.state.user = await User.one_by_key(token, is_admin=True)
-        except User.NotFoundError:
-            raise AccessDenied()
 
-    if not is_local and request.state.user.key == "admin":
+    request.state.user = user
+
+    if not is_local and user.key.get_secret_value() == "admin":
         raise AccessDenied()
 
     return request.state.user
@@ -69,12 +72,17 @@ async def get_session(user: AuthorizedUser, request: Request):
     if hasattr(request.state, "session"):
         return request.state.session
 
+    session_id = request.headers.get(SESSION_HEADER)
+
+    if session_id is not None:
+        request.state.session = await sessions.open(user.id, session_id)
+        return request.state.session
+
     request_data = await request.json()
 
     request.state.session = await Session.find_or_create(
         user_id=user.id,
         messages=request_data.get("messages"),
-        context=request_data.get("context"),
     )
 
     return request.state.session
@@ -83,26 +91,22 @@ async def get_session(user: AuthorizedUser, request: Request):
 AISession = Annotated[Session, Depends(get_session)]
 
 
-async def continue_dev_auth(token: BearerToken, request: Request) -> ContinueDevProject:
-    """Authorize user using user_key:project_token"""
+async def continue_dev_auth(token: BearerToken, request: Request) -> str:
+    """Authorize user using user_key:project_token, returns project ID."""
 
     user_key, project_id = token.split(":", 1)
 
-    user = request.state.user = await User.one_by_key(user_key)
+    user = request.state.user = await user_keys.user(user_key)
     if user is None:
         raise AccessDenied()
 
-    project = request.state.project = await ContinueDevProject.one(project_id)
-    if project is None:
+    if not await project_members.is_member(project_id, user.id):
         raise AccessDenied()
 
-    if user.id not in project.users:
-        raise AccessDenied()
-
-    return project
+    return project_id
 
 
-ContinueProject = Annotated[ContinueDevProject, Depends(continue_dev_auth)]
+ContinueProjectId = Annotated[str, Depends(continue_dev_auth)]
 
 
 async def is_project_admin(user: AuthorizedUser, project_id: str):
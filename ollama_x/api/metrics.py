@@ -0,0 +1,25 @@
+from fastapi import APIRouter
+from starlette.responses import PlainTextResponse
+
+from ollama_x.api.exceptions import AccessDenied, APIError
+from ollama_x.api.helpers import AdminUser
+from ollama_x.metrics import metrics
+
+PREFIX = "metrics"
+
+router = APIRouter(tags=[PREFIX])
+
+
+@router.get(
+    f"/{PREFIX}",
+    operation_id=f"{PREFIX}.get",
+    tags=["admin"],
+    response_class=PlainTextResponse,
+    responses={
+        403: {"model": APIError[AccessDenied], "description": "Access errors."},
+    },
+)
+async def get_metrics(admin: AdminUser) -> str:
+    """Get internal metrics in Prometheus text format."""
+
+    return metrics.render()
@@ -1,15 +1,15 @@
-from starlette.middleware.base import BaseHTTPMiddleware
+from .continue_dev import ContinueDevMiddleware
+from .default import DefaultMiddleware
+from .langfuse import LangfuseMiddleware
+from .ollama import OllamaMiddleware
+from .ratelimit import RateLimitMiddleware
+from .usage import UsageMiddleware
 
-from .continue_dev import continue_dev_middleware
-from .default import default_middleware
-from .langfuse import langfuse_middleware
-from .ollama import ollama_middleware
-
-MIDDLEWARES = {
-    BaseHTTPMiddleware: [
-        langfuse_middleware,
-        ollama_middleware,
-        continue_dev_middleware,
-        default_middleware,
-    ]
-}
+MIDDLEWARES = [
+    LangfuseMiddleware,
+    UsageMiddleware,
+    RateLimitMiddleware,
+    OllamaMiddleware,
+    ContinueDevMiddleware,
+    DefaultMiddleware,
+]
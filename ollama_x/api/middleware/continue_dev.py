@@ -1,42 +1,36 @@
 import logging
-from typing import Callable, Coroutine
 
-from fastapi import Request, Response
+from fastapi import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from ollama_x.api.exceptions import AccessDenied
 from ollama_x.api.security import authenticate
-from ollama_x.model import ContinueDevProject
+from ollama_x.auth import project_members
 
 LOG = logging.getLogger(__name__)
 
 
-async def continue_dev_middleware(
-    request: Request,
-    call_next: Callable[[Request], Coroutine[Request, None, Response]],
-):
+class ContinueDevMiddleware:
     """Middleware that handles continue dev requests."""
 
-    LOG.debug("Processing continue.dev middleware")
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-    project_id = request.headers.get("ContinueDevProject")
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
 
-    if request.state.user is None and project_id is not None:
-        request.state.user = await authenticate(request, anonymous_allowed=False)
+        LOG.debug("Processing continue.dev middleware")
 
-    if request.state.user is None or request.state.user.is_guest:
-        result = await call_next(request)
+        request = Request(scope)
+        project_id = request.headers.get("ContinueDevProject")
 
-    else:
-        if project_id is not None:
-            project = request.state.project = await ContinueDevProject.one(project_id)
-        else:
-            return await call_next(request)
+        if request.state.user is None and project_id is not None:
+            request.state.user = await authenticate(request, anonymous_allowed=False)
 
-        if request.state.user.id not in project.users:
-            raise AccessDenied()
+        if request.state.user is not None and not request.state.user.is_guest:
+            if project_id is not None:
+                if not await project_members.is_member(project_id, request.state.user.id):
+                    raise AccessDenied()
 
-        result = await call_next(request)
-
-    LOG.debug("Finished processing continue.dev middleware")
-
-    return result
+        await self.app(scope, receive, send)
@@ -1,27 +1,26 @@
 import logging
-from typing import Callable, Coroutine
 
-from fastapi import Request, Response
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 LOG = logging.getLogger(__name__)
 
 
-async def default_middleware(
-    request: Request,
-    call_next: Callable[[Request], Coroutine[Request, None, Response]],
-):
+class DefaultMiddleware:
     """Sets default values for state."""
 
-    LOG.debug("Processing default middleware")
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-    request.state.user = None
-    request.state.model = None
-    request.state.ollama = None
-    request.state.project = None
-    request.state.path = str(request.url.path)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            LOG.debug("Processing default middleware")
 
-    result = await call_next(request)
+            scope.setdefault("state", {}).update(
+                user=None,
+                model=None,
+                ollama=None,
+                project=None,
+                path=scope["path"],
+            )
 
-    LOG.debug("Default middleware processed")
-
-    return result
+        await self.app(scope, receive, send)
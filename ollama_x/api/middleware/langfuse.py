@@ -1,94 +1,62 @@
 import asyncio
 import logging
-from typing import Callable, Coroutine
 
-from fastapi import Request, Response
-from langfuse.decorators import langfuse_context, observe
-from pydantic import BaseModel, Field
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from ollama_x.api.middleware.ollama import OllamaProxyMiddleware
+from ollama_x.telemetry import TelemetryEvent, telemetry
 
 LOG = logging.getLogger(__name__)
 
 
-class LangfuseMiddleware(BaseModel):
-    ollama: OllamaProxyMiddleware | None = Field(None, description="Ollama proxy middleware")
-
-    @observe(as_type="generation")
-    async def log_event(self) -> None:
-        """Log event to langfuse."""
-
-        await self.ollama.is_done
-
-        langfuse_context.update_current_observation(
-            input=self.ollama.input_text,
-            name=self.ollama.action,
-            metadata=self.ollama.response_metadata,
-            output=self.ollama.response_content,
-            start_time=self.ollama.start_time,
-            end_time=self.ollama.completion_stop,
-            completion_start_time=self.ollama.completion_start,
-            model=self.ollama.model,
-            model_parameters=self.ollama.request["options"],
-            tags=[self.ollama.action, "ollama", self.ollama.model],
-        )
-
-        if not self.ollama.is_done.result():
-            raise RuntimeError("Request cancelled")
-
+def telemetry_event(ollama: OllamaProxyMiddleware, done: bool) -> TelemetryEvent:
+    """Build compact telemetry record of finished ollama proxy request."""
+
+    return TelemetryEvent(
+        action=ollama.action.value,
+        user_id=ollama.user.id,
+        username=ollama.user.username,
+        model=ollama.model,
+        input=ollama.input_text,
+        output=ollama.response_content,
+        options=ollama.request.get("options"),
+        metadata=ollama.response_metadata,
+        session_context={
+            key: value
+            for key, value in ollama.request_headers.items()
+            if key not in {"authorization", "content-length"}
+        },
+        start_time=ollama.start_time,
+        completion_start=ollama.completion_start,
+        end_time=ollama.completion_stop,
+        done=bool(done),
+    )
+
+
+def trace(ollama: OllamaProxyMiddleware) -> None:
+    """Emit telemetry event when the request is finished."""
+
+    def emit(is_done: asyncio.Future) -> None:
         try:
-            langfuse_context.update_current_observation(
-                usage={
-                    "input": self.ollama.response_metadata.get("prompt_eval_count"),
-                    "output": self.ollama.response_metadata.get("eval_count"),
-                    "unit": "TOKENS",
-                },
-            )
+            telemetry.emit(telemetry_event(ollama, is_done.result()))
         except Exception as e:
-            LOG.exception(e)
-            raise e
-
-    @observe(name="pending-request")
-    async def observe(self):
-        """Observe ollama proxy request."""
+            LOG.exception(f"Error building telemetry event: {e}")
 
-        try:
-            session = await self.ollama.get_session()
-
-            langfuse_context.update_current_trace(
-                input=self.ollama.input_text,
-                name=self.ollama.action,
-                user_id=self.ollama.user.username,
-                session_id=session.id,
-            )
-
-            await self.log_event()
-
-            langfuse_context.update_current_trace(
-                output=self.ollama.response_content,
-            )
-        except RuntimeError as e:
-            LOG.info(e)
-            raise e
-        except Exception as e:
-            LOG.exception(e)
-            raise e
+    ollama.is_done.add_done_callback(emit)
 
 
-async def langfuse_middleware(
-    request: Request,
-    call_next: Callable[[Request], Coroutine[Request, None, Response]],
-):
-    """Log requests to langfuse."""
+class LangfuseMiddleware:
+    """Log traced requests to langfuse through the telemetry pipeline."""
 
-    LOG.debug("Processing langfuse middleware")
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-    middleware = LangfuseMiddleware(ollama=getattr(request.state, "ollama", None))
-    if middleware.ollama is not None:
-        asyncio.run_coroutine_threadsafe(middleware.observe(), asyncio.get_running_loop())
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        ollama = scope.get("state", {}).get("ollama")
 
-    result = await call_next(request)
+        if ollama is not None and ollama.traced:
+            LOG.debug("Processing langfuse middleware")
 
-    LOG.debug("Langfuse middleware processed")
+            trace(ollama)
 
-    return result
+        await self.app(scope, receive, send)
@@ -1,19 +1,23 @@
 import datetime
+import io
 import json
 import logging
+import random
 from asyncio import Future
-from collections.abc import AsyncIterable
 from enum import Enum
 from functools import cached_property
-from typing import Any, Callable, Coroutine
+from json.decoder import scanstring
+from typing import Any, Callable
 
-from fastapi import Request, Response
+from fastapi import Request
 from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
-from starlette.middleware.base import _StreamingResponse  # noqa
-from starlette.responses import StreamingResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from ollama_x.api import endpoints
 from ollama_x.api.security import authenticate
-from ollama_x.model import Session, User
+from ollama_x.config import config
+from ollama_x.model import User
+from ollama_x.telemetry import telemetry
 
 LOG = logging.getLogger(__name__)
 
@@ -26,6 +30,207 @@ class OllamaAction(str, Enum):
     OTHER = "other"
 
 
+ACTIONS = {
+    endpoints.PROXY_CHAT: OllamaAction.CHAT,
+    endpoints.PROXY_GENERATE: OllamaAction.GENERATE,
+    endpoints.OLLAMA_CHAT: OllamaAction.CHAT,
+    endpoints.OLLAMA_COMPLETIONS: OllamaAction.GENERATE,
+    endpoints.OLLAMA_OPENAI_CHAT: OllamaAction.CHAT,
+    endpoints.OLLAMA_OPENAI_COMPLETIONS: OllamaAction.GENERATE,
+}
+"""Generation endpoints and their actions."""
+
+OPENAI_ENDPOINTS = (endpoints.OLLAMA_OPENAI_CHAT, endpoints.OLLAMA_OPENAI_COMPLETIONS)
+
+TEXT_FIELDS = {
+    OllamaAction.CHAT: "content",
+    OllamaAction.GENERATE: "response",
+}
+
+OPENAI_TEXT_FIELDS = {
+    OllamaAction.CHAT: "content",
+    OllamaAction.GENERATE: "text",
+}
+
+
+def extract_string(line: bytes, field: str) -> str:
+    """Extract value of the first string field with the name from a raw JSON line."""
+
+    text = line.decode(errors="replace")
+    start = text.find(f'"{field}":"')
+
+    if start == -1:
+        return ""
+
+    start += len(field) + 4
+    end = text.find('"', start)
+
+    if end != -1 and text.find("\\", start, end) == -1:
+        return text[start:end]
+
+    try:
+        return scanstring(text, start)[0]
+    except ValueError:
+        return ""
+
+
+def is_usage_chunk(line: bytes) -> bool:
+    """Check if the line is the usage chunk ending streamed OpenAI compatible response."""
+
+    return b'"choices":[]' in line and b'"usage"' in line
+
+
+class ResponseTap:
+    """Collects response of a streamed request in constant memory.
+
+    Only text of intermediate chunks is kept, it is extracted without parsing the
+    whole chunk. The final chunk is parsed and kept as response metadata.
+    OpenAI compatible responses are collected into the same metadata fields.
+    Usage chunk of a stream whose client did not request usage is read and
+    removed from the response.
+    """
+
+    __slots__ = (
+        "field",
+        "openai",
+        "hide_usage",
+        "collect_text",
+        "buffer",
+        "content",
+        "metadata",
+        "completion_start",
+    )
+
+    def __init__(
+        self,
+        action: OllamaAction,
+        collect_text: bool,
+        openai: bool = False,
+        hide_usage: bool = False,
+    ) -> None:
+        self.field = (OPENAI_TEXT_FIELDS if openai else TEXT_FIELDS).get(action)
+        self.openai = openai
+        self.hide_usage = hide_usage
+        self.collect_text = collect_text and self.field is not None
+        self.buffer = b""
+        self.content = io.StringIO()
+        self.metadata: dict[str, Any] = {}
+        self.completion_start: datetime.datetime | None = None
+
+    def feed(self, body: bytes) -> bytes:
+        """Collect response lines from a piece of the response body, returns the piece to send.
+
+        With usage hidden, only complete lines are sent.
+        """
+
+        if self.completion_start is None:
+            self.completion_start = datetime.datetime.now()
+
+        received = body
+
+        if self.buffer:
+            body = self.buffer + body
+
+        *lines, self.buffer = body.split(b"\n")
+
+        for line in lines:
+            self.add_line(line)
+
+        if not self.hide_usage:
+            return received
+
+        return b"".join(line + b"\n" for line in lines if not is_usage_chunk(line))
+
+    def add_line(self, line: bytes) -> None:
+        if self.openai:
+            return self.add_openai_line(line)
+
+        if b'"done":false' in line:
+            if self.collect_text:
+                self.content.write(extract_string(line, self.field))
+            return
+
+        if not line.strip():
+            return
+
+        try:
+            chunk = json.loads(line)
+        except json.JSONDecodeError:
+            return
+
+        if isinstance(chunk, dict):
+            self.add_chunk(chunk)
+
+    def add_chunk(self, chunk: dict[str, Any]) -> None:
+        """Collect already parsed response chunk."""
+
+        if self.completion_start is None:
+            self.completion_start = datetime.datetime.now()
+
+        if self.collect_text:
+            text = chunk if self.field == "response" else chunk.get("message") or {}
+            self.content.write(text.get(self.field) or "")
+
+        if chunk.get("done") is not False:
+            self.metadata = chunk
+
+    def add_openai_line(self, line: bytes) -> None:
+        """Collect line of OpenAI compatible response, server-sent event or JSON body."""
+
+        line = line.strip()
+
+        if line.startswith(b"data:"):
+            line = line[5:].lstrip()
+
+        if not line or line == b"[DONE]":
+            return
+
+        if b'"finish_reason":null' in line and b'"usage"' not in line:
+            if self.collect_text:
+                self.content.write(extract_string(line, self.field))
+            return
+
+        try:
+            chunk = json.loads(line)
+        except json.JSONDecodeError:
+            return
+
+        if isinstance(chunk, dict):
+            self.add_openai_chunk(chunk)
+
+    def add_openai_chunk(self, chunk: dict[str, Any]) -> None:
+        """Collect parsed OpenAI compatible response chunk, usage is kept as ollama metadata."""
+
+        choice = (chunk.get("choices") or [{}])[0]
+
+        if self.collect_text:
+            if self.field == "text":
+                self.content.write(choice.get("text") or "")
+            else:
+                message = choice.get("delta") or choice.get("message") or {}
+                self.content.write(message.get("content") or "")
+
+        if choice.get("finish_reason") is not None:
+            self.metadata.update(done=True, done_reason=choice["finish_reason"])
+
+        if chunk.get("usage"):
+            self.metadata.update(
+                prompt_eval_count=chunk["usage"].get("prompt_tokens"),
+                eval_count=chunk["usage"].get("completion_tokens"),
+            )
+
+    def close(self) -> bytes:
+        """Collect the last line not terminated by newline, returns what is left to send."""
+
+        line, self.buffer = self.buffer, b""
+        self.add_line(line)
+
+        if not self.hide_usage or is_usage_chunk(line):
+            return b""
+
+        return line
+
+
 class OllamaProxyMiddleware(BaseModel):
     """Ollama proxy middleware."""
 
@@ -46,9 +251,24 @@ class OllamaProxyMiddleware(BaseModel):
         description="Headers received in request",
     )
 
-    response: list[dict[str, Any]] = Field(
-        default_factory=list,
-        description="Response from ollama server",
+    traced: bool = Field(
+        True,
+        description="Collect response text for tracing",
+    )
+
+    stateful: bool = Field(
+        False,
+        description="Conversation history is kept by ollama-x",
+    )
+
+    openai: bool = Field(
+        False,
+        description="Request and response are OpenAI compatible",
+    )
+
+    hide_usage: bool = Field(
+        False,
+        description="Usage is requested from the server for accounting only, not by the client",
     )
 
     start_time: datetime.datetime = Field(
@@ -77,6 +297,7 @@ class OllamaProxyMiddleware(BaseModel):
     )
 
     _model: Callable[..., str] = PrivateAttr(None)
+    _tap: ResponseTap = PrivateAttr(None)
 
     @property
     def model(self) -> str:
@@ -90,19 +311,29 @@ class OllamaProxyMiddleware(BaseModel):
     def is_done(self):
         return Future()
 
-    @cached_property
+    @property
     def response_content(self) -> str:
-        if self.action == OllamaAction.CHAT:
-            return "".join([chunk["message"]["content"] for chunk in self.response])
-        elif self.action == OllamaAction.GENERATE:
-            return "".join([chunk["response"] for chunk in self.response])
+        return self.tap.content.getvalue()
 
-    @cached_property
+    @property
     def response_metadata(self) -> dict[str, Any]:
-        for chunk in self.response:
-            if chunk.get("done"):
-                return chunk
-        return {}
+        """Final `done` record of the response."""
+
+        return self.tap.metadata
+
+    @property
+    def tap(self) -> ResponseTap:
+        if self._tap is None:
+            self._tap = ResponseTap(
+                self.action, self.traced or self.stateful, self.openai, self.hide_usage
+            )
+
+        return self._tap
+
+    def collect_text(self) -> None:
+        """Collect response text even if the request is not traced."""
+
+        self.tap.collect_text = self.tap.field is not None
 
     @cached_property
     def input_text(self) -> str | list[dict[str, Any]]:
@@ -111,75 +342,105 @@ class OllamaProxyMiddleware(BaseModel):
         elif self.action == OllamaAction.GENERATE:
             return self.request["prompt"]
 
-    async def get_session(self) -> Session:
-        return await Session.find_or_create(
-            self.user.id,
-            messages=self.input_text if self.action == OllamaAction.CHAT else None,
-            context={
-                key: value
-                for key, value in self.request_headers.items()
-                if key not in {"authorization", "content-length"}
-            },
-        )
+    def finish(self, done: bool | None = None) -> None:
+        """Mark response as finished, `done` is taken from the last chunk if not set."""
 
-    async def listen_stream(self, stream: AsyncIterable[bytes]) -> AsyncIterable[bytes]:
-        """Listen to stream and update response."""
+        if self.is_done.done():
+            return
+
+        self.tap.close()
+
+        self.completion_start = self.tap.completion_start
+        self.completion_stop = datetime.datetime.now()
+        self.is_done.set_result(self.response_metadata.get("done") if done is None else done)
+
+
+def is_traced(user: User) -> bool:
+    """Decide if request of the user is traced in langfuse."""
+
+    if not telemetry.enabled:
+        return False
+
+    return user.username in config.traced_users or random.random() < config.trace_sample_rate
 
-        try:
-            async for chunk in stream:
-                if self.completion_start is None:
-                    self.completion_start = datetime.datetime.now()
-
-                try:
-                    self.response.append(json.loads(chunk))
-                except json.JSONDecodeError:
-                    pass
-                finally:
-                    yield chunk
-        finally:
-            self.completion_stop = datetime.datetime.now()
-            self.is_done.set_result(self.response_metadata.get("done"))
 
+def replay_body(body: bytes, receive: Receive) -> Receive:
+    """Receive already read request body again."""
 
-async def ollama_middleware(
-    request: Request,
-    call_next: Callable[[Request], Coroutine[Request, None, Response]],
-):
-    """Adds ollama property to request state."""
+    replayed = False
 
-    LOG.debug("Processing Ollama middleware")
+    async def wrapped() -> Message:
+        nonlocal replayed
 
-    ollama: OllamaProxyMiddleware | None = None
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
 
-    if request.url.path.startswith(("/api/chat", "/api/generate")):
-        request_data = await request.json()
+        return await receive()
+
+    return wrapped
+
+
+class OllamaMiddleware:
+    """Adds ollama property to request state and collects the response."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in ACTIONS:
+            return await self.app(scope, receive, send)
+
+        LOG.debug("Processing Ollama middleware")
+
+        request = Request(scope, receive)
+        body = await request.body()
+        request_data = json.loads(body)
 
         if request.state.user is None:
             request.state.user = await authenticate(request)
 
+        openai = scope["path"] in OPENAI_ENDPOINTS
+        stream_options = request_data.get("stream_options")
+
         headers = dict(request.headers)
         headers.update({"client_host": request.client.host})
 
         ollama = request.state.ollama = OllamaProxyMiddleware(
-            action=request.url.path.split("/")[-1],
+            action=ACTIONS[scope["path"]],
             request=request_data,
             user=request.state.user,
             request_headers=headers,
+            traced=is_traced(request.state.user),
+            stateful=endpoints.SESSION_HEADER in request.headers,
+            openai=openai,
+            hide_usage=openai
+            and bool(request_data.get("stream"))
+            and not (isinstance(stream_options, dict) and stream_options.get("include_usage")),
         )
         ollama.model = lambda: request.state.model
 
-    response = await call_next(request)
+        tap = ollama.tap
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                if message["status"] != 200:
+                    ollama.finish(False)
 
-    if ollama is not None:
-        if response.status_code != 200:
-            ollama.is_done.set_result(False)
+            elif message["type"] == "http.response.body":
+                if not ollama.is_done.done():
+                    body = tap.feed(message.get("body", b""))
 
-        elif isinstance(response, (_StreamingResponse, StreamingResponse)):
-            response.body_iterator = ollama.listen_stream(response.body_iterator)
-        else:
-            ollama.response = response.body
-            ollama.is_done.set_result(True)
+                    if not message.get("more_body", False):
+                        body += tap.close()
+                        ollama.finish()
 
-    LOG.debug("Ollama middleware processed")
+                    if body is not message.get("body"):
+                        message = {**message, "body": body}
 
-    return response
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body(body, receive), send_wrapper)
+        finally:
+            ollama.finish()
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+
+from fastapi import HTTPException, Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ollama_x.api.endpoints import RATE_LIMITED
+from ollama_x.api.exceptions import AccessDenied, handle_rate_limit_exceeded
+from ollama_x.api.security import authenticate
+from ollama_x.auth import project_members
+from ollama_x.model.ratelimit import RateLimits
+from ollama_x.ratelimit import RateLimitExceeded, rate_limiter
+
+LOG = logging.getLogger(__name__)
+
+
+class RateLimitMiddleware:
+    """Rejects proxied requests over rate limits of the user or the project."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def limits(self, request: Request) -> dict[str, RateLimits]:
+        """Rate limits of the request by user and project keys."""
+
+        limits = {}
+        user = request.state.user
+
+        if user.limits is not None:
+            limits[f"user:{user.id}"] = user.limits
+
+        project_id = request.headers.get("ContinueDevProject")
+
+        if project_id is not None:
+            access = await project_members.access(project_id)
+
+            if access is not None and access.limits is not None:
+                limits[f"project:{project_id}"] = access.limits
+
+        return limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in RATE_LIMITED:
+            return await self.app(scope, receive, send)
+
+        request = Request(scope, receive)
+
+        if request.state.user is None:
+            try:
+                request.state.user = await authenticate(request)
+            except (AccessDenied, HTTPException):
+                return await self.app(scope, receive, send)
+
+        limits = await self.limits(request)
+
+        if not limits:
+            return await self.app(scope, receive, send)
+
+        try:
+            rate_limiter.acquire(limits)
+        except RateLimitExceeded as e:
+            response = handle_rate_limit_exceeded(request, e)
+            return await response(scope, receive, send)
+
+        ollama = request.state.ollama
+
+        if ollama is not None:
+
+            def settle(is_done: asyncio.Future) -> None:
+                metadata = ollama.response_metadata
+                tokens = metadata.get("prompt_eval_count", 0) + metadata.get("eval_count", 0)
+
+                rate_limiter.settle(list(limits), tokens)
+
+            ollama.is_done.add_done_callback(settle)
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,38 @@
+import asyncio
+import logging
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ollama_x.model.usage import UsageKey
+from ollama_x.usage import usage
+
+LOG = logging.getLogger(__name__)
+
+
+class UsageMiddleware:
+    """Accounts usage of finished ollama requests in the usage ledger."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        ollama = scope.get("state", {}).get("ollama")
+
+        if ollama is not None:
+            headers = ollama.request_headers
+
+            def record(is_done: asyncio.Future) -> None:
+                try:
+                    key = UsageKey(
+                        user=ollama.user.id,
+                        username=ollama.user.username,
+                        model=ollama.model or ollama.request.get("model") or "unknown",
+                        project=headers.get("continuedevproject"),
+                    )
+                    usage.record(key, ollama.response_metadata)
+                except Exception as e:
+                    LOG.exception(f"Error recording usage: {e}")
+
+            ollama.is_done.add_done_callback(record)
+
+        await self.app(scope, receive, send)
@@ -1,74 +1,142 @@
 import asyncio
 import dataclasses
+import datetime
+import enum
+import io
+import json
+import logging
 import math
+import weakref
 from asyncio import Semaphore
 from collections import defaultdict
-from collections.abc import AsyncIterable
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Callable
+from functools import partial
 from typing import Any, Self
 
 import aiohttp
+import numpy as np
 from fastapi import APIRouter, Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.types import Receive, Scope, Send
 
 from ollama_x.api import endpoints
-from ollama_x.api.exceptions import NoServerAvailable
+from ollama_x.api.exceptions import (
+    NoServerAvailable,
+    RequestSuperseded,
+    StatefulSessionUnsupported,
+)
 from ollama_x.api.helpers import AISession, multi_endpoint
+from ollama_x.api.middleware.langfuse import trace
+from ollama_x.api.middleware.ollama import (
+    OllamaAction,
+    OllamaProxyMiddleware,
+    extract_string,
+    is_traced,
+)
+from ollama_x.auth import project_members
+from ollama_x.autocomplete import Completion, completion_cache, completions, is_fim_request
 from ollama_x.config import config
-from ollama_x.model import APIServer, OllamaModel
+from ollama_x.demand import demand
+from ollama_x.fleet import active_servers
+from ollama_x.model import APIServer, GenerateContext, OllamaModel, Session, User
+from ollama_x.semantic import (
+    SemanticEntry,
+    SemanticScope,
+    chat_question,
+    semantic_cache,
+    semantic_scope,
+)
+from ollama_x.sessions import sessions
 from ollama_x.types import ollama_model_converter
+from ollama_x.vectors import normalize
 
+LOG = logging.getLogger(__name__)
 
 router = APIRouter(tags=["ollama"])
 
 queues: dict[str, asyncio.Queue] = defaultdict(asyncio.Queue)
 
 
+class Lane(enum.StrEnum):
+    """Server queue lane, autocomplete never waits behind other requests."""
+
+    DEFAULT = "default"
+    AUTOCOMPLETE = "autocomplete"
+
+
 @dataclasses.dataclass
 class QueueRequest:
     """Handle requests."""
 
     server: APIServer
-    request: Request
-
-    openai_compatibility: bool = False
+    send: Callable[[], Awaitable[Any]]
+    completion: Completion | None = None
 
     response: asyncio.Future = dataclasses.field(default_factory=asyncio.Future)
     ready: asyncio.Event = dataclasses.field(default_factory=asyncio.Event)
+    permit: "Permit | None" = None
+    """Permit held by the streamed response of an autocomplete request."""
+    abandoned: bool = False
+    """Nobody waits for the response anymore."""
 
     def set_result(self, result: Any):
-        self.response.set_result(result)
+        if not self.response.done():
+            self.response.set_result(result)
+
         self.ready.set()
 
     def set_exception(self, e):
-        self.response.set_exception(e)
+        if not self.response.done():
+            self.response.set_exception(e)
+
         self.ready.set()
 
+    def abandon(self) -> None:
+        """Release the permit of a response nobody will send."""
+
+        self.abandoned = True
+
+        if self.permit is not None:
+            self.permit.release()
+
 
 class QueueHandler:
-    QUEUES: dict[str, "QueueHandler"] = {}
+    QUEUES: dict[tuple[str, Lane], "QueueHandler"] = {}
     LIMIT = 20
 
     @classmethod
-    def get(cls, server_url: str) -> Self:
-        """Get queue handler."""
+    def get(cls, server_url: str, lane: Lane = Lane.DEFAULT) -> Self:
+        """Get queue handler of the server lane."""
 
-        if server_url not in cls.QUEUES:
-            cls.QUEUES[server_url] = cls(server_url)
+        if (server_url, lane) not in cls.QUEUES:
+            cls.QUEUES[server_url, lane] = cls(server_url, lane)
 
-        return cls.QUEUES[server_url]
+        return cls.QUEUES[server_url, lane]
 
-    def __init__(self, server_url: str) -> None:
+    def __init__(self, server_url: str, lane: Lane = Lane.DEFAULT) -> None:
         self.server_url: str = server_url
+        self.lane: Lane = lane
         self.queue: asyncio.Queue[QueueRequest] = asyncio.Queue()
         self.task: asyncio.Task = asyncio.create_task(self.handle_requests())
-        self.pending: asyncio.Semaphore = asyncio.Semaphore(value=self.LIMIT)
+        self.pending: asyncio.Semaphore = asyncio.Semaphore(
+            value=config.autocomplete_lane_limit if lane == Lane.AUTOCOMPLETE else self.LIMIT
+        )
 
     async def handle_requests(self):
         while True:
             request: QueueRequest = await self.queue.get()
+
+            if request.ready.is_set():
+                # superseded while queued
+                self.queue.task_done()
+                continue
+
             await self.pending.acquire()
             try:
-                await asyncio.create_task(proxy_queue_request(self.pending, request))
+                await asyncio.create_task(
+                    proxy_queue_request(self.pending, request, hold=self.lane == Lane.AUTOCOMPLETE)
+                )
             except Exception as e:
                 request.set_exception(e)
                 self.pending.release()
@@ -76,13 +144,13 @@ class QueueHandler:
                 self.queue.task_done()
 
 
-async def get_min_queue_server(model: str | None) -> APIServer | None:
-    """Find the least loaded server."""
+async def get_min_queue_server(model: str | None, lane: Lane = Lane.DEFAULT) -> APIServer | None:
+    """Find the server with the shortest queue in the lane."""
 
     min_queue = (None, math.inf)
 
-    async for server in APIServer.all_active(model_name=model):
-        queue_size = QueueHandler.get(server.url).queue.qsize()
+    async for server in active_servers(model_name=model):
+        queue_size = QueueHandler.get(server.url, lane).queue.qsize()
 
         if queue_size < min_queue[1]:
             min_queue = (server, queue_size)
@@ -90,25 +158,79 @@ async def get_min_queue_server(model: str | None) -> APIServer | None:
     return min_queue[0]
 
 
+async def replace_context(user_id: str, chunk: bytes) -> bytes:
+    """Replace context tokens in the final generate chunk with a handle."""
+
+    try:
+        data = json.loads(chunk)
+    except json.JSONDecodeError:
+        return chunk
+
+    if not isinstance(data, dict) or not isinstance(data.get("context"), list):
+        return chunk
+
+    context = await GenerateContext.store(user_id, data["context"])
+    data["context"] = context.id
+
+    return json.dumps(data, separators=(",", ":")).encode() + (
+        b"\n" if chunk.endswith(b"\n") else b""
+    )
+
+
 def stream_response(
-    request: Request, server: APIServer, openai_compatibility: bool = False
+    request: Request,
+    server: APIServer,
+    openai_compatibility: bool = False,
+    completion: Completion | None = None,
 ) -> StreamingResponse:
-    """Stream response content."""
+    """Stream response content.
+
+    Superseded autocomplete response is closed and the stream ends early, the
+    finished one is cached.
+    """
 
     is_sse_stream = request.headers.get("accept") == "text/event-stream" and openai_compatibility
 
+    context_handles = endpoints.CONTEXT_HANDLE_HEADER in request.headers
+
+    suggestion = io.StringIO() if completion is not None and not openai_compatibility else None
+
     async def stream() -> AsyncIterable[bytes]:
         data = await request.json()
 
-        async with aiohttp.ClientSession(base_url=str(server.url)) as session:
-            method = getattr(session, request.method.lower())
+        session = server.ollama_client.get_session()
+        method = getattr(session, request.method.lower())
+        try:
             async with method(
                 request.state.path,
                 json=data,
             ) as response:
+                if completion is not None:
+                    if completion.superseded:
+                        return
+
+                    completion.cancel = response.close
+
                 async for chunk in response.content:
+                    if context_handles and b'"context":' in chunk:
+                        chunk = await replace_context(request.state.user.id, chunk)
+
                     yield chunk
 
+                    if suggestion is not None:
+                        suggestion.write(extract_string(chunk, "response"))
+
+                        if b'"done":true' in chunk:
+                            completion_cache.store(
+                                (*completion.key, request.state.model), data, suggestion.getvalue()
+                            )
+        except aiohttp.ClientError:
+            if completion is None or not completion.superseded:
+                raise
+        finally:
+            if completion is not None:
+                completions.finish(completion)
+
     return StreamingResponse(
         stream(),
         headers={
@@ -119,37 +241,125 @@ def stream_response(
 
 
 async def proxy_request(
-    server: APIServer, request: Request, openai_compatibility: bool = False
+    server: APIServer,
+    request: Request,
+    openai_compatibility: bool = False,
+    completion: Completion | None = None,
 ) -> StreamingResponse:
     """Proxy request to APIServer."""
 
     data = await request.json()
     data["model"] = request.state.model
 
-    return stream_response(request, server, openai_compatibility=openai_compatibility)
+    return stream_response(
+        request, server, openai_compatibility=openai_compatibility, completion=completion
+    )
+
 
+class Permit:
+    """Queue semaphore permit held by a streamed response, released once."""
 
-async def proxy_queue_request(semaphore: Semaphore, queue_request: QueueRequest) -> None:
-    """Proxy request to APIServer."""
+    __slots__ = ("semaphore", "released", "__weakref__")
+
+    def __init__(self, semaphore: Semaphore) -> None:
+        self.semaphore = semaphore
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.semaphore.release()
+
+
+class HeldStreamingResponse(StreamingResponse):
+    """Streaming response releasing the permit however sending ends.
+
+    Starlette runs background tasks only after complete responses, and the body
+    iterator does not start if the client disconnects first.
+    """
+
+    permit: Permit
+
+    @classmethod
+    def hold(cls, response: StreamingResponse, permit: Permit) -> Self:
+        held = cls.__new__(cls)
+        held.__dict__.update(response.__dict__)
+        held.permit = permit
+
+        return held
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.permit.release()
+
+
+def release_after(chunks: AsyncIterator[Any], release: Callable[[], None]) -> AsyncIterator[Any]:
+    """Iterate chunks, calling release when the iteration stops."""
+
+    async def wrapped() -> AsyncIterator[Any]:
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            release()
+
+    return wrapped()
+
+
+def hold_permit(result: Any, permit: Permit) -> Any | None:
+    """Response holding the permit until it is streamed, `None` if it is not streamed.
+
+    Responses dropped without being sent release the permit when collected.
+    """
+
+    if isinstance(result, StreamingResponse):
+        result.body_iterator = release_after(result.body_iterator, permit.release)
+        result = HeldStreamingResponse.hold(result, permit)
+    elif isinstance(result, AsyncIterator):
+        result = release_after(result, permit.release)
+    else:
+        return None
+
+    weakref.finalize(result, permit.release)
+
+    return result
+
+
+async def proxy_queue_request(
+    semaphore: Semaphore, queue_request: QueueRequest, hold: bool = False
+) -> None:
+    """Proxy request to APIServer.
+
+    Semaphore is released when the request is sent, or when its streamed
+    response ends if `hold` is set.
+    """
+
+    permit = Permit(semaphore)
 
     try:
-        result = await proxy_request(
-            queue_request.server,
-            queue_request.request,
-            openai_compatibility=queue_request.openai_compatibility,
-        )
+        result = await queue_request.send()
     except Exception as e:
         queue_request.set_exception(e)
     else:
+        if hold and not queue_request.ready.is_set() and not queue_request.abandoned:
+            held = hold_permit(result, permit)
+
+            if held is not None:
+                queue_request.permit = permit
+                result = held
+
         queue_request.set_result(result)
     finally:
-        semaphore.release()
+        if queue_request.permit is None:
+            permit.release()
 
 
 async def get_models() -> dict[str, Any]:
     models = {}
 
-    async for server in APIServer.all_active():
+    async for server in active_servers():
         for model in server.models:
             models[model["model"]] = model
 
@@ -161,7 +371,7 @@ async def get_running_models() -> list[str]:
 
     models = set()
 
-    async for server in APIServer.all_active():
+    async for server in active_servers():
         models.update([model["model"] for model in server.running_models])
 
     return list(models)
@@ -209,9 +419,329 @@ async def generate_embeddings(request: Request):
     if server is None:
         raise NoServerAvailable()
 
+    demand.record(request.state.model)
+
     return await proxy_request(server, request, openai_compatibility=openai_compatibility)
 
 
+async def route(
+    user: User, requested_model: str, lane: Lane = Lane.DEFAULT
+) -> tuple[APIServer, str]:
+    """Choose model for the user and the least loaded server running it."""
+
+    if user.is_guest:
+        model = config.anonymous_model or config.enforce_model or requested_model
+    else:
+        model = config.enforce_model or requested_model
+
+    model = ollama_model_converter(model)
+
+    server = await get_min_queue_server(model, lane)
+    if server is None:
+        raise NoServerAvailable()
+
+    model_names = [server_model["model"] for server_model in server.models]
+    if model not in model_names:
+        for server_model in server.models:
+            if server_model["model"].startswith(model):
+                model = server_model["model"]
+                break
+
+    demand.record(model)
+
+    return server, model
+
+
+async def enqueue(
+    server: APIServer,
+    send: Callable[[], Awaitable[Any]],
+    completion: Completion | None = None,
+) -> Any:
+    """Wait for a turn in the server queue and send the request.
+
+    Autocomplete requests go to their own lane and leave it when superseded.
+    """
+
+    queue_request = QueueRequest(server, send, completion)
+    lane = Lane.DEFAULT
+
+    if completion is not None:
+        if completion.superseded:
+            raise RequestSuperseded()
+
+        lane = Lane.AUTOCOMPLETE
+
+        def cancel() -> None:
+            if not queue_request.ready.is_set():
+                queue_request.set_exception(RequestSuperseded())
+
+        completion.cancel = cancel
+
+    queue = QueueHandler.get(server.url, lane).queue
+
+    await queue.put(queue_request)
+
+    try:
+        await queue_request.ready.wait()
+    except asyncio.CancelledError:
+        queue_request.abandon()
+        raise
+
+    if queue_request.response.exception():
+        raise queue_request.response.exception()
+
+    return queue_request.response.result()
+
+
+async def stream_chunks(
+    server: APIServer, path: str, payload: dict[str, Any]
+) -> AsyncIterator[dict[str, Any]]:
+    """Send request to the server and yield parsed response lines."""
+
+    session = server.ollama_client.get_session()
+
+    async with session.post(path, json=payload) as response:
+        response.raise_for_status()
+
+        async for line in response.content:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ChatRequest(BaseModel):
+    """Chat request made by ollama-x itself."""
+
+    model: str = Field(description="Model name")
+    messages: list[dict[str, Any]] = Field(description="Chat messages")
+    stream: bool = Field(False, description="Stream response chunks")
+    tools: list[dict[str, Any]] | None = Field(None, description="Tools available to the model")
+    options: dict[str, Any] | None = Field(None, description="Model options")
+
+
+async def chat(user: User, request: ChatRequest) -> AsyncIterator[dict[str, Any]]:
+    """Send chat request of ollama-x itself, yields parsed response chunks.
+
+    Request is routed and queued like a proxied one and traced in langfuse, but
+    nothing is serialized except the request to the server.
+    """
+
+    server, model = await route(user, request.model)
+    payload = request.model_dump(exclude_none=True)
+    payload["model"] = model
+
+    ollama = OllamaProxyMiddleware(
+        action=OllamaAction.CHAT,
+        request=payload,
+        user=user,
+        traced=is_traced(user),
+    )
+    ollama.model = lambda: model
+
+    if ollama.traced:
+        trace(ollama)
+
+    async def send() -> AsyncIterator[dict[str, Any]]:
+        return stream_chunks(server, endpoints.PROXY_CHAT, payload)
+
+    chunks = await enqueue(server, send)
+    tap = ollama.tap
+
+    try:
+        async for chunk in chunks:
+            tap.add_chunk(chunk)
+            yield chunk
+    finally:
+        ollama.finish()
+
+
+async def embed(user: User, model: str, texts: list[str]) -> list[list[float]]:
+    """Embed texts for ollama-x itself.
+
+    Like proxied embeddings requests, it is routed but not queued.
+    """
+
+    server, model = await route(user, model)
+    session = server.ollama_client.get_session()
+
+    async with session.post(
+        endpoints.PROXY_EMBED, json={"model": model, "input": texts}
+    ) as response:
+        response.raise_for_status()
+
+        return (await response.json())["embeddings"]
+
+
+async def start_completion(request: Request, request_data: dict[str, Any]) -> Completion | None:
+    """Start autocomplete request of the user and file, if it is one.
+
+    Generate requests are autocomplete when they have a suffix, name the file
+    in the autocomplete header or ask for the tab autocomplete model of the
+    continue.dev project.
+    """
+
+    if not request.url.path.endswith(
+        (endpoints.PROXY_GENERATE, endpoints.OLLAMA_OPENAI_COMPLETIONS)
+    ):
+        return None
+
+    if (
+        not is_fim_request(request_data)
+        and endpoints.AUTOCOMPLETE_FILE_HEADER not in request.headers
+    ):
+        project_id = request.headers.get("ContinueDevProject")
+        if project_id is None:
+            return None
+
+        access = await project_members.access(project_id)
+        if access is None or request_data.get("model") not in access.autocomplete_models:
+            return None
+
+    return completions.start(
+        (request.state.user.id, request.headers.get(endpoints.AUTOCOMPLETE_FILE_HEADER))
+    )
+
+
+def final_chunk(
+    request_data: dict[str, Any],
+    model: str,
+    content: dict[str, Any],
+    headers: dict[str, str] | None = None,
+) -> Response:
+    """Respond with a single final chunk, streamed or not as requested."""
+
+    chunk = {
+        "model": model,
+        "created_at": datetime.datetime.now(datetime.UTC).isoformat(),
+        **content,
+        "done": True,
+        "done_reason": "stop",
+    }
+
+    return Response(
+        json.dumps(chunk) + "\n",
+        media_type="application/x-ndjson"
+        if request_data.get("stream", True)
+        else "application/json",
+        headers=headers,
+    )
+
+
+def cached_completion(request_data: dict[str, Any], model: str, suggestion: str) -> Response:
+    """Respond to generate request with a cached suggestion."""
+
+    return final_chunk(request_data, model, {"response": suggestion})
+
+
+def cached_answer(request_data: dict[str, Any], model: str, entry: SemanticEntry) -> Response:
+    """Respond to chat request with a cached answer, its ID is sent in a header."""
+
+    return final_chunk(
+        request_data,
+        model,
+        {"message": {"role": "assistant", "content": entry.answer}},
+        {endpoints.SEMANTIC_CACHE_HEADER: entry.id},
+    )
+
+
+async def semantic_question(
+    request: Request, request_data: dict[str, Any], server: APIServer
+) -> tuple[SemanticScope, np.ndarray] | None:
+    """Scope and normalized embedding of a chat question, if it is semantically cached.
+
+    Answers are shared between members of projects with the semantic cache
+    enabled, and between all users of `SEMANTIC_CACHE_MODELS`. Only single
+    questions without tools or output format are cached.
+    """
+
+    ollama = request.state.ollama
+    user = request.state.user
+    model = request.state.model
+
+    if (
+        ollama is None
+        or ollama.action != OllamaAction.CHAT
+        or ollama.openai
+        or semantic_cache.maxsize <= 0
+        or config.default_embeddings_model is None
+        or user.is_guest
+        or request_data.get("tools")
+        or request_data.get("format")
+        or request.headers.get(endpoints.SESSION_HEADER) is not None
+    ):
+        return None
+
+    question = chat_question(request_data.get("messages"))
+    if question is None:
+        return None
+
+    project_id = request.headers.get("ContinueDevProject")
+    if project_id is not None:
+        access = await project_members.access(project_id)
+
+        if access is None or not access.semantic_cache or user.id not in access.members:
+            project_id = None
+
+    models = config.semantic_cache_models
+    requested_model = ollama_model_converter(request_data["model"])
+
+    if project_id is None and model not in models and requested_model not in models:
+        return None
+
+    system, text = question
+    digest = next(
+        (
+            server_model.get("digest")
+            for server_model in server.models
+            if server_model["model"] == model
+        ),
+        None,
+    )
+
+    try:
+        (vector,) = await embed(user, config.default_embeddings_model, [text])
+    except (NoServerAvailable, aiohttp.ClientError) as e:
+        LOG.warning(f"Semantic cache skipped, question not embedded: {e}")
+        return None
+
+    return semantic_scope(project_id, model, digest, system), normalize(vector)
+
+
+def cache_answer(request: Request, scope: SemanticScope, vector: np.ndarray) -> None:
+    """Store the answer in the semantic cache when it is finished by the model."""
+
+    ollama = request.state.ollama
+    ollama.collect_text()
+
+    def store(is_done: asyncio.Future) -> None:
+        if is_done.result() and ollama.response_metadata.get("done_reason", "stop") == "stop":
+            semantic_cache.store(scope, vector, ollama.response_content)
+
+    ollama.is_done.add_done_callback(store)
+
+
+def continue_session(session: Session, request: Request, request_data: dict[str, Any]) -> None:
+    """Send new messages of a stateful chat together with the stored history.
+
+    New messages and the assistant reply are appended to the session when the
+    response is finished.
+    """
+
+    ollama = request.state.ollama
+
+    if ollama is None or ollama.action != OllamaAction.CHAT:
+        raise StatefulSessionUnsupported()
+
+    new_messages = request_data.get("messages") or []
+    request_data["messages"] = [*(session.messages or []), *new_messages]
+
+    def append_reply(is_done: asyncio.Future) -> None:
+        if is_done.result():
+            reply = {"role": "assistant", "content": ollama.response_content}
+            sessions.append(session, [*new_messages, reply])
+
+    ollama.is_done.add_done_callback(append_reply)
+
+
 @multi_endpoint(
     router.post,
     endpoints.PROXY_CHAT,
@@ -237,33 +767,63 @@ async def proxy(session: AISession, request: Request):
 
     request_data = await request.json()
 
-    if request.state.user.is_guest:
-        request.state.model = (
-            config.anonymous_model or config.enforce_model or request_data["model"]
-        )
-    else:
-        request.state.model = config.enforce_model or request_data["model"]
+    if openai_compatibility and request_data.get("stream"):
+        # Streamed OpenAI responses include usage only on request, tokens are
+        # rate limited and accounted from it.
+        request_data["stream_options"] = {
+            **(request_data.get("stream_options") or {}),
+            "include_usage": True,
+        }
 
-    request.state.model = ollama_model_converter(request.state.model)
+    completion = await start_completion(request, request_data)
+    lane = Lane.AUTOCOMPLETE if completion is not None else Lane.DEFAULT
 
-    server = await get_min_queue_server(request.state.model)
-    if server is None:
-        raise NoServerAvailable()
+    server, request.state.model = await route(request.state.user, request_data["model"], lane)
 
-    model_names = [model["model"] for model in server.models]
-    if request.state.model not in model_names:
-        for model in server.models:
-            if model["model"].startswith(request.state.model):
-                request.state.model = model["model"]
-                break
+    if completion is not None and not openai_compatibility:
+        suggestion = completion_cache.lookup((*completion.key, request.state.model), request_data)
 
-    queue_request = QueueRequest(server, request, openai_compatibility=openai_compatibility)
-    queue = QueueHandler.get(server.url).queue
+        if suggestion is not None:
+            completions.finish(completion)
+            return cached_completion(request_data, request.state.model, suggestion)
 
-    await queue.put(queue_request)
-    await queue_request.ready.wait()
+    if completion is None:
+        question = await semantic_question(request, request_data, server)
 
-    if queue_request.response.exception():
-        raise queue_request.response.exception()
+        if question is not None:
+            entry = semantic_cache.lookup(*question)
 
-    return queue_request.response.result()
+            if entry is not None:
+                return cached_answer(request_data, request.state.model, entry)
+
+            cache_answer(request, *question)
+
+    if request.headers.get(endpoints.SESSION_HEADER) is not None:
+        continue_session(session, request, request_data)
+
+    if isinstance(request_data.get("context"), str):
+        request_data["context"] = await GenerateContext.expand(
+            request.state.user.id, request_data["context"]
+        )
+
+    try:
+        response = await enqueue(
+            server,
+            partial(
+                proxy_request,
+                server,
+                request,
+                openai_compatibility=openai_compatibility,
+                completion=completion,
+            ),
+            completion,
+        )
+    except Exception:
+        if completion is not None:
+            completions.finish(completion)
+        raise
+
+    if request.headers.get(endpoints.SESSION_HEADER) is not None:
+        response.headers[endpoints.SESSION_HEADER] = str(session.id)
+
+    return response
@@ -0,0 +1,198 @@
+import asyncio
+import ipaddress
+import re
+import urllib.parse
+
+from fastapi import APIRouter, Depends, Request, Response
+from starlette.responses import FileResponse, StreamingResponse
+
+from ollama_x import mirror
+from ollama_x.api.security import security
+from ollama_x.auth import user_keys
+from ollama_x.cache import MISSING, TTLCache
+from ollama_x.mirror import BlobDownload, BlobStore, RegistryError
+from ollama_x.model import APIServer
+
+PREFIX = "registry"
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+SERVER_ADDRESSES_TTL = 60
+
+IPAddress = ipaddress.IPv4Address | ipaddress.IPv6Address
+
+server_addresses: TTLCache[str, frozenset[IPAddress]] = TTLCache(
+    "registry_server_addresses", 1, SERVER_ADDRESSES_TTL
+)
+
+
+def parse_address(host: str) -> IPAddress | None:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return None
+
+    return getattr(address, "ipv4_mapped", None) or address
+
+
+async def resolve_servers() -> frozenset[IPAddress]:
+    """Addresses of hosts of all API servers, resolved again after TTL."""
+
+    addresses = server_addresses.get("servers")
+
+    if addresses is MISSING:
+        hosts = {urllib.parse.urlsplit(server.url).hostname async for server in APIServer.all()}
+        loop = asyncio.get_running_loop()
+        resolved = await asyncio.gather(
+            *(loop.getaddrinfo(host, None) for host in hosts if host), return_exceptions=True
+        )
+
+        addresses = frozenset(
+            parse_address(info[4][0])
+            for infos in resolved
+            if not isinstance(infos, BaseException)
+            for info in infos
+        )
+        server_addresses.set("servers", addresses)
+
+    return addresses
+
+
+async def registry_client(request: Request) -> None:
+    """Allow pulls by API servers and admins only.
+
+    Mirror downloads every requested blob from upstream. Servers pull without
+    credentials, they are recognized by address.
+    """
+
+    if request.client is not None:
+        address = parse_address(request.client.host)
+
+        if address is not None and address in await resolve_servers():
+            return
+
+    authorization = await security(request)
+
+    if authorization is not None:
+        user = await user_keys.user(authorization.credentials)
+
+        if user is not None and user.is_admin:
+            return
+
+    raise RegistryError(401, "UNAUTHORIZED", "Registry mirror is available to API servers only")
+
+
+router = APIRouter(prefix="/v2", tags=[PREFIX], dependencies=[Depends(registry_client)])
+
+
+class BlobResponse(FileResponse):
+    chunk_size = mirror.CHUNK_SIZE
+
+
+def get_store() -> BlobStore:
+    if mirror.store is None:
+        raise RegistryError(404, "UNSUPPORTED", "Registry mirror is disabled")
+
+    return mirror.store
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Parse single byte range into `[start, end)`."""
+
+    if header is None:
+        return None
+
+    match = RANGE_RE.match(header.strip())
+
+    if match is None or match.groups() == ("", ""):
+        raise RegistryError(416, "RANGE_INVALID", f"Unsupported range `{header}`")
+
+    start, end = match.groups()
+
+    if not start:
+        return max(size - int(end), 0), size
+
+    start, end = int(start), min(int(end) + 1, size) if end else size
+
+    if start >= size or start >= end:
+        raise RegistryError(416, "RANGE_INVALID", f"Range `{header}` is not satisfiable")
+
+    return start, end
+
+
+@router.get("/", operation_id=f"{PREFIX}.version")
+async def version() -> dict:
+    """Registry API version check."""
+
+    get_store()
+
+    return {}
+
+
+@router.api_route(
+    "/{name:path}/manifests/{reference}",
+    methods=["GET", "HEAD"],
+    operation_id=f"{PREFIX}.manifest",
+)
+async def get_manifest(request: Request, name: str, reference: str) -> Response:
+    """Get model manifest from the mirror."""
+
+    manifest = await get_store().get_manifest(name, reference)
+
+    return Response(
+        content=b"" if request.method == "HEAD" else manifest.content,
+        media_type=manifest.media_type,
+        headers={
+            "Docker-Content-Digest": manifest.digest,
+            "Content-Length": str(len(manifest.content)),
+        },
+    )
+
+
+@router.api_route(
+    "/{name:path}/blobs/{digest}",
+    methods=["GET", "HEAD"],
+    operation_id=f"{PREFIX}.blob",
+)
+async def get_blob(request: Request, name: str, digest: str) -> Response:
+    """Get blob from the mirror, downloading it from upstream if not cached.
+
+    Cached blobs are sent as files, in progress downloads are streamed to every
+    reader while they are being written.
+    """
+
+    blob = get_store().get_blob(name, digest)
+    headers = {"Docker-Content-Digest": digest, "Accept-Ranges": "bytes"}
+
+    if isinstance(blob, BlobDownload):
+        size = await blob.wait_size()
+    else:
+        size = blob.stat().st_size
+
+        if "range" not in request.headers:
+            return BlobResponse(blob, media_type="application/octet-stream", headers=headers)
+
+    byte_range = parse_range(request.headers.get("range"), size)
+
+    if byte_range is None:
+        start, end, status_code = 0, size, 200
+    else:
+        (start, end), status_code = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+
+    headers["Content-Length"] = str(end - start)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers)
+
+    if isinstance(blob, BlobDownload):
+        content = blob.read(start, end)
+    else:
+        content = mirror.read_mapped(blob, start, end)
+
+    return StreamingResponse(
+        content,
+        status_code=status_code,
+        media_type="application/octet-stream",
+        headers=headers,
+    )
@@ -0,0 +1,99 @@
+from fastapi import APIRouter, Query
+
+from ollama_x.api.exceptions import AccessDenied, APIError
+from ollama_x.api.helpers import AdminUser
+from ollama_x.fleet import active_servers
+from ollama_x.model import APIServer, ModelRollout
+from ollama_x.rollout import rollouts
+
+PREFIX = "rollout"
+
+router = APIRouter(prefix=f"/{PREFIX}", tags=[PREFIX])
+
+
+@router.post(
+    "/create",
+    operation_id=f"{PREFIX}.create",
+    tags=["admin"],
+    response_model=ModelRollout | APIError,
+    responses={
+        400: {
+            "model": APIError[ModelRollout.DuplicateKeyError],
+            "description": "Generic errors.",
+        },
+        403: {"model": APIError[AccessDenied], "description": "Access errors."},
+    },
+)
+async def create_rollout(
+    admin: AdminUser,
+    model: str,
+    server_ids: list[str] | None = Query(None),
+    min_ready: int = 1,
+) -> ModelRollout:
+    """Roll model out to servers, all active servers if not set.
+
+    Requests are routed to the new version once `min_ready` servers pulled it.
+    """
+
+    if server_ids:
+        servers = [await APIServer.one(server_id) for server_id in server_ids]
+    else:
+        servers = [server async for server in active_servers()]
+
+    return await rollouts.create(model, servers, min_ready)
+
+
+@router.get(
+    "/one",
+    operation_id=f"{PREFIX}.one",
+    tags=["admin"],
+    response_model=ModelRollout | APIError,
+    responses={
+        404: {
+            "model": APIError[ModelRollout.NotFoundError],
+            "description": "Generic errors.",
+        },
+        403: {"model": APIError[AccessDenied], "description": "Access errors."},
+    },
+)
+async def get_rollout(admin: AdminUser, rollout_id: str) -> ModelRollout:
+    """Get rollout progress."""
+
+    return await ModelRollout.one(rollout_id)
+
+
+@router.get(
+    "/all",
+    operation_id=f"{PREFIX}.all",
+    tags=["admin"],
+    response_model=list[ModelRollout] | APIError,
+    responses={
+        403: {"model": APIError[AccessDenied], "description": "Access errors."},
+    },
+)
+async def get_rollouts(admin: AdminUser, active: bool = False) -> list[ModelRollout]:
+    """Get rollouts."""
+
+    if active:
+        return [rollout async for rollout in ModelRollout.all_active()]
+
+    return [rollout async for rollout in ModelRollout.all()]
+
+
+@router.post(
+    "/cancel",
+    operation_id=f"{PREFIX}.cancel",
+    tags=["admin"],
+    response_model=ModelRollout | APIError,
+    responses={
+        404: {
+            "model": APIError[ModelRollout.NotFoundError],
+            "description": "Generic errors.",
+        },
+        403: {"model": APIError[AccessDenied], "description": "Access errors."},
+    },
+)
+async def cancel_rollout(admin: AdminUser, rollout_id: str) -> ModelRollout:
+    """Cancel rollout, servers which already pulled the new version keep it."""
+
+    return await rollouts.cancel(rollout_id)
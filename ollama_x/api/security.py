@@ -2,6 +2,7 @@ from fastapi import HTTPException, Request
 from fastapi.security import APIKeyHeader, HTTPBearer
 
 from ollama_x.api.exceptions import AccessDenied
+from ollama_x.auth import user_keys
 from ollama_x.config import config
 from ollama_x.model import User
 
@@ -35,7 +36,8 @@ async def authenticate(request: Request, anonymous_allowed: bool = True) -> User
             key=User.generate_key(),
         )
 
-    try:
-        return await User.one_by_key(authorization.credentials)
-    except User.NotFoundError:
+    user = await user_keys.user(authorization.credentials)
+    if user is None:
         raise AccessDenied()
+
+    return user
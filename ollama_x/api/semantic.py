@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Response
+
+from ollama_x.api.exceptions import AccessDenied, APIError, SemanticCacheEntryNotFound
+from ollama_x.api.helpers import AuthorizedUser
+from ollama_x.semantic import semantic_cache
+
+PREFIX = "semantic-cache"
+
+router = APIRouter(prefix=f"/{PREFIX}", tags=[PREFIX])
+
+
+@router.post(
+    "/{entry_id}/false-positive",
+    operation_id=f"{PREFIX}.false-positive",
+    status_code=204,
+    response_class=Response,
+    responses={
+        403: {"model": APIError[AccessDenied], "description": "Access errors."},
+        404: {
+            "model": APIError[SemanticCacheEntryNotFound],
+            "description": "Entry not found by this app worker.",
+        },
+    },
+)
+async def report_false_positive(user: AuthorizedUser, entry_id: str) -> None:
+    """Report cached answer as not answering the question, it is not served anymore.
+
+    Entry ID is sent in the `Ollama-X-Semantic-Cache` header of cached answers.
+    Answers are cached in memory of every app worker, a report handled by
+    another worker than the one which served the answer is answered with 404
+    and the entry is served until it expires.
+    """
+
+    if not semantic_cache.report(entry_id):
+        raise SemanticCacheEntryNotFound()
@@ -1,10 +1,16 @@
-from fastapi import APIRouter
+import datetime
+
+from fastapi import APIRouter, Query
 
 from ollama_x.api.exceptions import AccessDenied, APIError
 from ollama_x.api.helpers import AdminUser
-from ollama_x.model import APIServer
+from ollama_x.config import config
+from ollama_x.fleet import active_servers
+from ollama_x.model import APIServer, ModelDemand, ModelRollout
 from ollama_x.model.server import ServerBase
-from ollama_x.scheduler import add_server_job, delete_server_job
+from ollama_x.placement import PlacementPlan, plan_placement
+from ollama_x.rollout import rollouts
+from ollama_x.warmer import desired_models
 
 PREFIX = "server"
 
@@ -69,7 +75,6 @@ async def create_server(admin: AdminUser, url: str) -> APIServer:
     """Create server."""
 
     server = await APIServer.new(ServerBase(url=url))
-    add_server_job(server.id)
 
     return server
 
@@ -91,6 +96,9 @@ async def update_server(
     admin: AdminUser,
     server_id: str,
     server_url: str | None = None,
+    vram_capacity: int | None = None,
+    pinned_models: list[str] | None = Query(None),
+    allowed_models: list[str] | None = Query(None),
 ) -> APIServer:
     """Update server parameters."""
 
@@ -98,11 +106,38 @@ async def update_server(
 
     server.url = server_url or server.url
 
-    await server.commit_changes(fields=["url"])
+    if vram_capacity is not None:
+        server.vram_capacity = vram_capacity or None
+
+    if pinned_models is not None:
+        server.pinned_models = pinned_models
+
+    if allowed_models is not None:
+        server.allowed_models = allowed_models or None
+
+    await server.commit_changes(fields=list(APIServer.SETTINGS_FIELDS))
 
     return server
 
 
+@router.get(
+    "/placement",
+    operation_id=f"{PREFIX}.placement",
+    tags=["admin"],
+    response_model=PlacementPlan | APIError,
+    responses={
+        403: {"model": APIError[AccessDenied], "description": "Access errors."},
+    },
+)
+async def get_placement(admin: AdminUser) -> PlacementPlan:
+    """Show model placement plan without applying it."""
+
+    rates = await ModelDemand.rates(datetime.timedelta(seconds=config.demand_window))
+    servers = [server async for server in active_servers()]
+
+    return plan_placement(servers, rates, desired_models(rates))
+
+
 @router.delete(
     "/",
     operation_id=f"{PREFIX}.delete",
@@ -122,15 +157,26 @@ async def delete_server(admin: AdminUser, server_id: str) -> APIServer:
     server = await APIServer.one(server_id)
 
     await server.delete()
-    delete_server_job(server_id)
 
     return server
 
 
-@router.post("/{server_id:str}/pull")
-async def server_pull_model(server_id: str, model: str):
-    """Pull model to server."""
+@router.post(
+    "/{server_id:str}/pull",
+    operation_id=f"{PREFIX}.pull",
+    tags=["admin"],
+    response_model=ModelRollout | APIError,
+    responses={
+        400: {
+            "model": APIError[APIServer.NotFoundError],
+            "description": "Generic errors.",
+        },
+        403: {"model": APIError[AccessDenied], "description": "Access errors."},
+    },
+)
+async def server_pull_model(admin: AdminUser, server_id: str, model: str) -> ModelRollout:
+    """Pull model to server as a single server rollout."""
 
     server = await APIServer.one(server_id)
 
-    return server.pull_model(model)
+    return await rollouts.create(model, [server], min_ready=1)
@@ -0,0 +1,40 @@
+import datetime
+
+from fastapi import APIRouter
+
+from ollama_x.api.exceptions import AccessDenied, APIError
+from ollama_x.api.helpers import AdminUser
+from ollama_x.model import UsageRollup
+from ollama_x.model.usage import UsagePeriod
+
+PREFIX = "usage"
+
+router = APIRouter(prefix=f"/{PREFIX}", tags=[PREFIX])
+
+
+@router.get(
+    "/rollups",
+    operation_id=f"{PREFIX}.rollups",
+    tags=["admin"],
+    response_model=list[UsageRollup] | APIError,
+    responses={
+        403: {"model": APIError[AccessDenied], "description": "Access errors."},
+    },
+)
+async def get_rollups(
+    admin: AdminUser,
+    since: datetime.datetime,
+    until: datetime.datetime | None = None,
+    period: UsagePeriod = "day",
+    user_id: str | None = None,
+    model: str | None = None,
+    project_id: str | None = None,
+) -> list[UsageRollup]:
+    """Get hourly or daily usage per user, model and project."""
+
+    return [
+        rollup
+        async for rollup in UsageRollup.find(
+            period, since, until, user=user_id, model=model, project=project_id
+        )
+    ]
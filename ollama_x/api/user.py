@@ -3,7 +3,9 @@ from pydantic import BaseModel, EmailStr
 
 from ollama_x.api.exceptions import AccessDenied, APIError, UserAlreadyExist, UserNotFound
 from ollama_x.api.helpers import AdminUser
+from ollama_x.auth import user_keys
 from ollama_x.model import User
+from ollama_x.model.ratelimit import RateLimits
 from ollama_x.model.user import UserBase
 from ollama_x.config import config
 
@@ -111,6 +113,7 @@ async def delete_user(admin: AdminUser, username: str) -> User:
     user = await User.one_by_username(username)
 
     await user.delete()
+    user_keys.invalidate(user.id)
 
     return user
 
@@ -137,13 +140,43 @@ async def change_key(admin: AdminUser, username: str) -> UserBase:
 
     user = await User.one_by_username(username)
 
-    user.key = User.generate_key()
+    user.set_key(User.generate_key())
 
-    await user.commit_changes(fields=["key"])
+    await user.commit_changes(fields=["key_hash"])
+    user_keys.invalidate(user.id)
 
     return UserBase.from_document(user, exclude_secrets=False)
 
 
+@router.post(
+    "/limits",
+    response_model=User | APIError,
+    operation_id=f"{PREFIX}.limits",
+    summary="Set user rate limits",
+    tags=["admin"],
+    responses={
+        403: {
+            "model": APIError[AccessDenied],
+            "description": "Access errors",
+        },
+        404: {
+            "model": APIError[User.NotFoundError],
+            "description": "Not found errors",
+        },
+    },
+)
+async def set_limits(admin: AdminUser, username: str, limits: RateLimits) -> User:
+    """Set rate limits of the user, unset limits are not enforced."""
+
+    user = await User.one_by_username(username)
+    user.limits = limits
+
+    await user.commit_changes(fields=["limits"])
+    user_keys.invalidate(user.id)
+
+    return user
+
+
 @router.get(
     "/register",
     operation_id=f"{PREFIX}.register",
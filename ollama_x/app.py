@@ -2,10 +2,10 @@ from fastapi import FastAPI
 
 from ollama_x.api import exceptions, routers
 from ollama_x.api.middleware import MIDDLEWARES
-from ollama_x.startup import STARTUP_TASKS
+from ollama_x.startup import APP_STARTUP_TASKS, SHUTDOWN_TASKS
 
 
-app = FastAPI(on_startup=STARTUP_TASKS)
+app = FastAPI(on_startup=APP_STARTUP_TASKS, on_shutdown=SHUTDOWN_TASKS)
 
 for router in routers:
     app.include_router(router)
@@ -14,6 +14,5 @@ for exc, handler in exceptions.HANDLERS.items():
     app.add_exception_handler(exc, handler)
 
 
-for mw_type, middlewares in MIDDLEWARES.items():
-    for middleware in middlewares:
-        app.add_middleware(mw_type, dispatch=middleware)
+for middleware in MIDDLEWARES:
+    app.add_middleware(middleware)
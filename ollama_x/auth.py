@@ -0,0 +1,157 @@
+import asyncio
+import dataclasses
+import logging
+from typing import Any
+
+import bson
+from pydantic import SecretStr
+
+from ollama_x.cache import MISSING, TTLCache, watch_changes
+from ollama_x.config import config
+from ollama_x.model import ContinueDevProject, User
+from ollama_x.model.ratelimit import RateLimits
+from ollama_x.model.user import hash_key
+
+LOG = logging.getLogger(__name__)
+
+
+class UserKeyCache:
+    """Users cached by hash of their API key.
+
+    Unknown keys are cached too. Entries are dropped when users change, either
+    by the users change stream or directly by the API changing them.
+    """
+
+    def __init__(self) -> None:
+        self.users: TTLCache[str, User | None] = TTLCache(
+            "users", config.auth_cache_size, config.auth_cache_ttl
+        )
+        self.task: asyncio.Task | None = None
+
+    async def user(self, key: str) -> User | None:
+        """Find user by API key."""
+
+        key_hash = hash_key(key)
+        user = self.users.get(key_hash)
+
+        if user is MISSING:
+            user = await User.one(add_query={"key_hash": key_hash}, required=False)
+
+            if user is not None:
+                user.key = SecretStr(key)
+
+            self.users.set(key_hash, user)
+
+        return user
+
+    def invalidate(self, user_id: Any) -> None:
+        """Drop cached user and all unknown keys, one of them may belong to the user now."""
+
+        self.users.discard(lambda user: user is None or user.id == str(user_id))
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(watch_changes(User, self.invalidate, self.users.clear))
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+
+user_keys = UserKeyCache()
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ProjectAccess:
+    """Cached members, limits, config version and request routing settings of a project."""
+
+    members: frozenset[str]
+    limits: RateLimits | None
+    version: int
+    autocomplete_models: frozenset[str]
+    semantic_cache: bool
+
+
+def autocomplete_models(document: dict[str, Any]) -> frozenset[str]:
+    """Names of tab autocomplete models of raw project document."""
+
+    models = document.get("config", {}).get("tabAutocompleteModel") or []
+
+    if isinstance(models, dict):
+        models = [models]
+
+    return frozenset(model["model"] for model in models if "model" in model)
+
+
+class ProjectMemberCache:
+    """IDs of continue.dev project members cached by project ID.
+
+    Only `users`, `limits`, `version`, `semantic_cache` and tab autocomplete model
+    fields of the project are read. Entries are dropped on any change of the project.
+    """
+
+    def __init__(self) -> None:
+        self.projects: TTLCache[str, ProjectAccess | None] = TTLCache(
+            "project_members", config.auth_cache_size, config.auth_cache_ttl
+        )
+        self.task: asyncio.Task | None = None
+
+    async def access(self, project_id: str) -> ProjectAccess | None:
+        """Get members and limits of the project, `None` if it does not exist."""
+
+        access = self.projects.get(project_id)
+
+        if access is MISSING:
+            access = None
+
+            if bson.ObjectId.is_valid(project_id):
+                document = await ContinueDevProject.collection().find_one(
+                    {"_id": bson.ObjectId(project_id)},
+                    {
+                        "users": 1,
+                        "limits": 1,
+                        "version": 1,
+                        "semantic_cache": 1,
+                        "config.tabAutocompleteModel.model": 1,
+                    },
+                )
+
+                if document is not None:
+                    access = ProjectAccess(
+                        members=frozenset(str(user) for user in document.get("users", [])),
+                        limits=RateLimits.model_validate(document["limits"])
+                        if document.get("limits") is not None
+                        else None,
+                        version=document.get("version", 0),
+                        autocomplete_models=autocomplete_models(document),
+                        semantic_cache=document.get("semantic_cache", False),
+                    )
+
+            self.projects.set(project_id, access)
+
+        return access
+
+    async def is_member(self, project_id: str, user_id: str) -> bool:
+        """Check if user is member of the project."""
+
+        access = await self.access(project_id)
+
+        return access is not None and user_id in access.members
+
+    def invalidate(self, project_id: Any) -> None:
+        self.projects.pop(str(project_id))
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(
+            watch_changes(ContinueDevProject, self.invalidate, self.projects.clear)
+        )
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+
+project_members = ProjectMemberCache()
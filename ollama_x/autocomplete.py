@@ -0,0 +1,287 @@
+import dataclasses
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterator
+from typing import Any
+
+from ollama_x.cache import MISSING, TTLCache
+from ollama_x.config import config
+from ollama_x.metrics import metrics
+
+AutocompleteKey = tuple[Hashable, ...]
+
+FIM_SUFFIX_MARKERS = (
+    "<|fim_suffix|>",
+    "<fim_suffix>",
+    "<｜fim▁hole｜>",
+    " <SUF>",
+)
+"""Markers of the code after the cursor in raw prompts of common FIM templates."""
+
+
+def is_fim_request(data: dict[str, Any]) -> bool:
+    """Check if generate request is fill-in-the-middle completion.
+
+    Raw prompts are not enough, they are also sent by clients applying their own
+    chat templates.
+    """
+
+    return data.get("suffix") is not None
+
+
+def split_prompt(data: dict[str, Any]) -> tuple[str, str] | None:
+    """Split FIM prompt into the code before the cursor and the rest of the prompt."""
+
+    prompt = data.get("prompt")
+    if not isinstance(prompt, str):
+        return None
+
+    suffix = data.get("suffix")
+    if isinstance(suffix, str):
+        return prompt, suffix
+
+    if data.get("raw") is True:
+        for marker in FIM_SUFFIX_MARKERS:
+            position = prompt.find(marker)
+
+            if position != -1:
+                return prompt[:position], prompt[position:]
+
+    return None
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    """Length of the common prefix, found by comparing slices instead of characters."""
+
+    low, high = 0, min(len(a), len(b))
+
+    while low < high:
+        middle = (low + high + 1) // 2
+
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+
+    return low
+
+
+class TrieNode:
+    __slots__ = ("label", "value", "children")
+
+    def __init__(self, label: str, value: str | None = None) -> None:
+        self.label = label
+        self.value = value
+        self.children: dict[str, TrieNode] = {}
+
+
+class PrefixTrie:
+    """Radix trie of strings, shared prefixes of keys are stored once."""
+
+    def __init__(self) -> None:
+        self.root = TrieNode("")
+
+    def insert(self, key: str, value: str) -> None:
+        node, position = self.root, 0
+
+        while position < len(key):
+            child = node.children.get(key[position])
+
+            if child is None:
+                node.children[key[position]] = TrieNode(key[position:], value)
+                return
+
+            if key.startswith(child.label, position):
+                node, position = child, position + len(child.label)
+                continue
+
+            common = common_prefix_length(child.label, key[position:])
+            middle = TrieNode(child.label[:common])
+            child.label = child.label[common:]
+            middle.children[child.label[0]] = child
+            node.children[key[position]] = middle
+            node, position = middle, position + common
+
+        node.value = value
+
+    def prefixes(self, key: str) -> Iterator[tuple[int, str]]:
+        """Yield length and value of stored keys which are prefixes of the key, longest first."""
+
+        found = []
+        node, position = self.root, 0
+
+        while True:
+            if node.value is not None:
+                found.append((position, node.value))
+
+            if position == len(key):
+                break
+
+            child = node.children.get(key[position])
+            if child is None or not key.startswith(child.label, position):
+                break
+
+            node, position = child, position + len(child.label)
+
+        return reversed(found)
+
+    def remove(self, key: str) -> None:
+        path = [self.root]
+        position = 0
+
+        while position < len(key):
+            child = path[-1].children.get(key[position])
+            if child is None or not key.startswith(child.label, position):
+                return
+
+            path.append(child)
+            position += len(child.label)
+
+        node = path.pop()
+        node.value = None
+
+        if not path:
+            return
+
+        if len(node.children) == 1:
+            self.merge(node)
+            return
+
+        if node.children:
+            return
+
+        parent = path[-1]
+        del parent.children[node.label[0]]
+
+        if parent is not self.root and parent.value is None and len(parent.children) == 1:
+            self.merge(parent)
+
+    @staticmethod
+    def merge(node: TrieNode) -> None:
+        """Merge node without value into its only child."""
+
+        (child,) = node.children.values()
+        node.label += child.label
+        node.value = child.value
+        node.children = child.children
+
+
+@dataclasses.dataclass(slots=True)
+class FileCompletions:
+    """Recent completions at one place of a file."""
+
+    rest: str
+    trie: PrefixTrie = dataclasses.field(default_factory=PrefixTrie)
+    recent: OrderedDict[str, None] = dataclasses.field(default_factory=OrderedDict)
+
+
+class CompletionCache:
+    """Recent FIM completions per user, file and model.
+
+    Completions are stored in a prefix trie by the code before the cursor. A
+    request whose code extends a stored one by exactly the start of its
+    suggestion gets the rest of the suggestion. Completions are kept while the
+    rest of the prompt, the code after the cursor, stays the same.
+    """
+
+    LIMIT = 32
+    """Number of completions kept per file."""
+
+    def __init__(self) -> None:
+        self.files: TTLCache[AutocompleteKey, FileCompletions] = TTLCache(
+            "autocomplete_files", config.autocomplete_cache_size, config.autocomplete_cache_ttl
+        )
+
+        self.hits = metrics.counter("ollama_x_cache_hits_total", "Cache hits")
+        self.misses = metrics.counter("ollama_x_cache_misses_total", "Cache misses")
+
+    def lookup(self, key: AutocompleteKey, data: dict[str, Any]) -> str | None:
+        """Find the rest of a stored suggestion the request continues."""
+
+        split = split_prompt(data)
+        files = self.files.get(key) if split is not None else MISSING
+
+        if files is not MISSING and files.rest == split[1]:
+            prefix = split[0]
+
+            for length, suggestion in files.trie.prefixes(prefix):
+                typed = len(prefix) - length
+
+                if len(suggestion) > typed and suggestion.startswith(prefix[length:]):
+                    self.hits.inc(cache="autocomplete")
+                    return suggestion[typed:]
+
+        self.misses.inc(cache="autocomplete")
+        return None
+
+    def store(self, key: AutocompleteKey, data: dict[str, Any], suggestion: str) -> None:
+        split = split_prompt(data)
+        if split is None or not suggestion:
+            return
+
+        prefix, rest = split
+
+        files = self.files.get(key)
+        if files is MISSING or files.rest != rest:
+            files = FileCompletions(rest)
+            self.files.set(key, files)
+
+        files.trie.insert(prefix, suggestion)
+        files.recent[prefix] = None
+        files.recent.move_to_end(prefix)
+
+        while len(files.recent) > self.LIMIT:
+            files.trie.remove(files.recent.popitem(last=False)[0])
+
+
+@dataclasses.dataclass(eq=False, slots=True)
+class Completion:
+    """Autocomplete request which is dropped once a newer one arrives."""
+
+    key: AutocompleteKey
+    superseded: bool = False
+    cancel: Callable[[], Any] | None = None
+    """Cancels the request at its current stage, queued or streaming."""
+
+    def supersede(self) -> None:
+        self.superseded = True
+
+        if self.cancel is not None:
+            self.cancel()
+
+
+class Supersession:
+    """Latest autocomplete request per user and file.
+
+    Starting a completion supersedes the previous one with the same key, it is
+    removed from the queue or its upstream response is closed.
+    """
+
+    def __init__(self) -> None:
+        self.latest: dict[AutocompleteKey, Completion] = {}
+
+        self.superseded = metrics.counter(
+            "ollama_x_autocomplete_superseded_total",
+            "Autocomplete requests superseded by newer ones",
+        )
+
+    def __len__(self) -> int:
+        return len(self.latest)
+
+    def start(self, key: AutocompleteKey) -> Completion:
+        previous = self.latest.get(key)
+
+        if previous is not None:
+            previous.supersede()
+            self.superseded.inc()
+
+        completion = self.latest[key] = Completion(key)
+
+        return completion
+
+    def finish(self, completion: Completion) -> None:
+        if self.latest.get(completion.key) is completion:
+            del self.latest[completion.key]
+
+
+completions = Supersession()
+completion_cache = CompletionCache()
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any, Generic, TypeVar
+
+import pymongo.errors
+from pydantic_mongo_document.document.asyncio import Document
+
+from ollama_x.metrics import metrics
+
+LOG = logging.getLogger(__name__)
+
+WATCH_RETRY_INTERVAL = 5
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+MISSING: Any = object()
+
+
+class TTLCache(Generic[K, V]):
+    """LRU cache with entries expiring after TTL.
+
+    Cached `None` is a valid value, `get` returns `MISSING` for absent keys.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+        self.hits = metrics.counter("ollama_x_cache_hits_total", "Cache hits")
+        self.misses = metrics.counter("ollama_x_cache_misses_total", "Cache misses")
+        metrics.gauge(
+            f"ollama_x_cache_{name}_size",
+            f"Number of entries in {name} cache",
+            lambda: len(self.entries),
+        )
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: K, default: Any = MISSING) -> V | Any:
+        entry = self.entries.get(key)
+
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+
+            self.misses.inc(cache=self.name)
+            return default
+
+        self.entries.move_to_end(key)
+        self.hits.inc(cache=self.name)
+
+        return entry[1]
+
+    def set(self, key: K, value: V) -> None:
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def pop(self, key: K) -> None:
+        self.entries.pop(key, None)
+
+    def discard(self, predicate: Callable[[V], bool]) -> int:
+        """Remove entries with values matching the predicate."""
+
+        keys = [key for key, (_, value) in self.entries.items() if predicate(value)]
+
+        for key in keys:
+            del self.entries[key]
+
+        return len(keys)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+async def watch_changes(
+    document: type[Document],
+    invalidate: Callable[[Any], None],
+    clear: Callable[[], None],
+) -> None:
+    """Call `invalidate` with ID of every changed document of the collection.
+
+    Cache is cleared whenever the change stream is (re)opened, changes may have
+    been missed before it.
+    """
+
+    while True:
+        try:
+            async with await document.collection().watch() as stream:
+                clear()
+
+                async for change in stream:
+                    invalidate(change["documentKey"]["_id"])
+        except pymongo.errors.OperationFailure as e:
+            LOG.warning(
+                f"Change stream of {document.__collection__} is not available, "
+                f"cache expires by TTL: {e}"
+            )
+            return
+        except pymongo.errors.PyMongoError as e:
+            LOG.error(f"Change stream of {document.__collection__} failed: {e}")
+            clear()
+
+        await asyncio.sleep(WATCH_RETRY_INTERVAL)
@@ -1,50 +1,91 @@
 import asyncio
 import json
+from collections import deque
 from functools import partial
-from typing import Any, AsyncIterable, Callable
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Self
 
 from fastapi import FastAPI, Request
 from starlette.datastructures import Headers
 from starlette.responses import JSONResponse, StreamingResponse
 
-from ollama_x.api import endpoints
-from ollama_x.types import ollama_model_converter
+from ollama_x.api.ollama import ChatRequest, chat
+from ollama_x.api.security import authenticate
 
 
-class ResponseIterable(AsyncIterable):
-    EMPTY = object()
+class ResponseChannelClosed(ConnectionError):
+    """Consumer of the response has gone away."""
 
-    def __init__(self):
-        self.data = []
-        self.stop_event = asyncio.Event()
-        self.lock = asyncio.Lock()
 
-    async def add(self, data):
-        async with self.lock:
-            self.data.append(data)
+class ResponseChannel(AsyncIterable[bytes]):
+    """Bounded channel of response body chunks between one producer and one consumer.
 
-    async def stop(self):
-        async with self.lock:
-            self.stop_event.set()
+    Producer waits while the channel is full and consumer waits while it is
+    empty, both without polling.
+    """
 
-    def __aiter__(self):
-        return self
+    def __init__(self, maxsize: int = 16) -> None:
+        self.maxsize = maxsize
+        self.chunks: deque[bytes] = deque()
+        self.finished = False
+        self.closed = False
+        self.getter: asyncio.Future | None = None
+        self.putter: asyncio.Future | None = None
+
+    @staticmethod
+    def wake(waiter: asyncio.Future | None) -> None:
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def put(self, chunk: bytes) -> None:
+        """Add chunk, waiting for the consumer if the channel is full."""
+
+        while len(self.chunks) >= self.maxsize and not self.closed:
+            self.putter = asyncio.get_running_loop().create_future()
+            await self.putter
+
+        if self.closed:
+            raise ResponseChannelClosed()
+
+        self.chunks.append(chunk)
+        self.wake(self.getter)
 
-    async def pop(self):
-        async with self.lock:
-            return self.data.pop(0) if self.data else self.EMPTY
+    def finish(self) -> None:
+        """No more chunks will be added."""
 
-    async def __anext__(self):
-        while True:
-            result = await self.pop()
+        self.finished = True
+        self.wake(self.getter)
 
-            if result is not self.EMPTY:
-                return result
+    def close(self) -> None:
+        """Consumer stops reading, waiting producer gets `ResponseChannelClosed`."""
 
-            if self.stop_event.is_set() and not self.data:
+        self.closed = True
+        self.chunks.clear()
+        self.wake(self.putter)
+
+    def __aiter__(self) -> Self:
+        return self
+
+    async def __anext__(self) -> bytes:
+        while not self.chunks:
+            if self.finished or self.closed:
                 raise StopAsyncIteration()
 
-            await asyncio.sleep(0)
+            self.getter = asyncio.get_running_loop().create_future()
+            await self.getter
+
+        chunk = self.chunks.popleft()
+        self.wake(self.putter)
+
+        return chunk
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        """Iterate chunks, closing the channel when iteration stops."""
+
+        try:
+            async for chunk in self:
+                yield chunk
+        finally:
+            self.close()
 
 
 class InnerClient:
@@ -66,7 +107,8 @@ class InnerClient:
         called = asyncio.Event()
         can_return = asyncio.Event()
 
-        iterable = ResponseIterable()
+        channel = ResponseChannel()
+        body = []
         response_kwargs = {}
 
         async def fake_receive(message: dict[str, Any]):
@@ -90,16 +132,20 @@ class InnerClient:
                     can_return.set()
 
             elif message["type"] == "http.response.body":
-                if message["body"]:
-                    await iterable.add(message["body"])
+                if not stream:
+                    body.append(message.get("body", b""))
+                elif message.get("body"):
+                    await channel.put(message["body"])
 
-                if not stream or not message.get("more_body", False):
-                    await iterable.stop()
+                if not message.get("more_body", False):
+                    channel.finish()
                     can_return.set()
 
-        loop = asyncio.get_running_loop()
-        loop.call_soon(
-            asyncio.create_task,
+        def finish(task: asyncio.Task) -> None:
+            channel.finish()
+            can_return.set()
+
+        task = asyncio.create_task(
             self.app(
                 {
                     "type": "http",
@@ -122,45 +168,51 @@ class InnerClient:
                 fake_send,
             ),
         )
+        task.add_done_callback(finish)
 
         await can_return.wait()
 
+        if task.done() and task.exception() is not None:
+            raise task.exception()
+
         if stream:
-            return StreamingResponse(content=iterable, **response_kwargs)
+            return StreamingResponse(content=channel.stream(), **response_kwargs)
 
         return JSONResponse(
-            [json.loads(d) async for d in iterable][0],
+            json.loads(b"".join(body)),
             **response_kwargs,
         )
 
-    def ollama_chat(
+    async def ollama_chat(
         self,
         request: Request,
         model: str,
         messages: list[dict[str, Any]],
         stream: bool = False,
-        tools: bool | None = None,
+        tools: list[dict[str, Any]] | None = None,
         options: dict[str, Any] | None = None,
-    ):
-        """Forward request to ollama chat API."""
-
-        return self.send_request(
-            endpoints.OLLAMA_CHAT,
-            request.receive,
-            request.headers,
-            {
-                "model": ollama_model_converter(model),
-                "messages": [
-                    {
-                        "content": message["content"],
-                        "role": message["role"],
-                    }
-                    for message in messages
-                ],
-                "options": options,
-                "stream": stream,
-                "tools": tools,
-            },
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Send chat request to ollama directly, yields parsed response chunks.
+
+        User of the request is authenticated, but the request skips HTTP layer
+        of the app.
+        """
+
+        user = getattr(request.state, "user", None) or await authenticate(request)
+
+        chat_request = ChatRequest(
+            model=model,
+            messages=[
+                {
+                    "content": message["content"],
+                    "role": message["role"],
+                }
+                for message in messages
+            ],
             stream=stream,
-            method="POST",
+            tools=tools,
+            options=options,
         )
+
+        async for chunk in chat(user, chat_request):
+            yield chunk
@@ -7,10 +7,17 @@ import certifi
 from aiohttp import TCPConnector
 from pydantic import HttpUrl
 
+from ollama_x.config import config
+
+MANIFEST_MEDIA_TYPE = "application/vnd.docker.distribution.manifest.v2+json"
+
 
 class OllamaClient:
     """Client to Ollama Server API."""
 
+    SESSIONS: dict[str, aiohttp.ClientSession] = {}
+    SSL_CONTEXT = ssl.create_default_context(cafile=certifi.where())
+
     def __init__(self, base_url: str | HttpUrl | None, is_self: bool = False):
         self.base_url = str(base_url) if base_url is not None else None
         self.is_self = is_self
@@ -25,16 +32,37 @@ class OllamaClient:
     ) -> aiohttp.ClientResponse:
         """Send request to the server."""
 
-        ssl_context = ssl.create_default_context(cafile=certifi.where())
+        kwargs.setdefault("timeout", 5)
+
+        async with getattr(self.get_session(base_url), method)(path, **kwargs) as response:
+            yield response
 
-        if self.base_url is None and base_url is None:
+    def get_session(self, base_url: None | str = None) -> aiohttp.ClientSession:
+        """Get connection pool shared by all clients of the server."""
+
+        base_url = base_url or self.base_url
+
+        if base_url is None:
             raise RuntimeError("Base url is not provided.")
 
-        async with aiohttp.ClientSession(
-            base_url or self.base_url, connector=TCPConnector(ssl=ssl_context)
-        ) as session:
-            async with getattr(session, method)(path, timeout=5, **kwargs) as response:
-                yield response
+        session = self.SESSIONS.get(base_url)
+
+        if session is None or session.closed:
+            session = self.SESSIONS[base_url] = aiohttp.ClientSession(
+                base_url,
+                connector=TCPConnector(ssl=self.SSL_CONTEXT),
+            )
+
+        return session
+
+    @classmethod
+    async def close_sessions(cls) -> None:
+        """Close all shared connection pools."""
+
+        for session in cls.SESSIONS.values():
+            await session.close()
+
+        cls.SESSIONS.clear()
 
     def list_models(self) -> aiohttp.ClientResponse:
         """List all models available on the server."""
@@ -58,6 +86,66 @@ class OllamaClient:
 
         return self.send_request("/api/ps", "get")
 
+    def preload_model(self, model_name: str, keep_alive: int) -> aiohttp.ClientResponse:
+        """Load model into memory and set its keep alive in seconds."""
+
+        return self.send_request(
+            "/api/generate",
+            "post",
+            json={
+                "model": model_name,
+                "keep_alive": keep_alive,
+            },
+            timeout=300,
+        )
+
+    def unload_model(self, model_name: str) -> aiohttp.ClientResponse:
+        """Unload model from memory."""
+
+        return self.send_request(
+            "/api/generate",
+            "post",
+            json={
+                "model": model_name,
+                "keep_alive": 0,
+            },
+        )
+
+    def pull_model(self, model_name: str, insecure: bool = False) -> aiohttp.ClientResponse:
+        """Pull model to the server, progress is streamed as JSON lines."""
+
+        return self.send_request(
+            "/api/pull",
+            "post",
+            json={
+                "model": model_name,
+                "insecure": insecure,
+                "stream": True,
+            },
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=300),
+        )
+
+    def copy_model(self, source: str, destination: str) -> aiohttp.ClientResponse:
+        """Copy model to a new name."""
+
+        return self.send_request(
+            "/api/copy",
+            "post",
+            json={
+                "source": source,
+                "destination": destination,
+            },
+        )
+
+    def delete_model(self, model_name: str) -> aiohttp.ClientResponse:
+        """Delete model from the server."""
+
+        return self.send_request(
+            "/api/delete",
+            "delete",
+            json={"model": model_name},
+        )
+
     async def tokenize(self, model_name: str, prompt: str) -> aiohttp.ClientResponse:
         return self.send_request(
             "/api/tokenize",
@@ -80,22 +168,34 @@ class OllamaClient:
 
         return model_name, version
 
-    async def get_manifest(self, model_name: str):
+    def get_manifest(self, model_name: str) -> aiohttp.ClientResponse:
+        """Get model manifest from the registry."""
+
         model_name, version = self.get_model_params(model_name)
 
-        return await self.send_request(
+        return self.send_request(
             f"/v2/{model_name}/manifests/{version}",
             "get",
-            base_url="https://registry.ollama.ai",
+            base_url=config.registry_upstream,
+            headers={"Accept": MANIFEST_MEDIA_TYPE},
         )
 
-    async def download_blob(self, model_name: str, digest: str) -> aiohttp.ClientResponse:
+    def download_blob(
+        self,
+        model_name: str,
+        digest: str,
+        offset: int = 0,
+    ) -> aiohttp.ClientResponse:
+        """Download blob from the registry starting at offset."""
+
         model_name, _ = self.get_model_params(model_name)
 
-        return await self.send_request(
+        return self.send_request(
             f"/v2/{model_name}/blobs/{digest}",
             "get",
-            base_url="https://registry.ollama.ai",
+            base_url=config.registry_upstream,
+            headers={"Range": f"bytes={offset}-"} if offset else {},
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60),
         )
 
     def chat(
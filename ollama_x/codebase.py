@@ -0,0 +1,215 @@
+import asyncio
+import dataclasses
+import hashlib
+from collections.abc import Iterator
+from typing import NamedTuple
+
+import bson
+import numpy as np
+
+from ollama_x.api.ollama import embed
+from ollama_x.config import config
+from ollama_x.model import CodebaseChunk, CodebaseIndex, ContinueDevProject, User
+from ollama_x.vectors import normalize, quantize, vector_indexes
+
+CHUNK_LINES = 40
+CHUNK_CHARS = 4000
+EMBED_BATCH = 32
+EMBED_CONCURRENCY = 4
+
+
+class FileChunk(NamedTuple):
+    start_line: int
+    end_line: int
+    content: str
+    hash: str
+
+
+def file_chunk(pieces: list[tuple[int, str]]) -> FileChunk | None:
+    text = "".join(piece for _, piece in pieces)
+
+    if not text.strip():
+        return None
+
+    return FileChunk(
+        pieces[0][0],
+        pieces[-1][0],
+        text,
+        hashlib.blake2b(text.encode(), digest_size=16).hexdigest(),
+    )
+
+
+def chunk_file(content: str) -> Iterator[FileChunk]:
+    """Split file into chunks of up to `CHUNK_LINES` lines and `CHUNK_CHARS` characters.
+
+    Longer lines are split too, blank chunks are skipped.
+    """
+
+    chunk, size = [], 0
+
+    for number, line in enumerate(content.splitlines(keepends=True), 1):
+        for offset in range(0, len(line), CHUNK_CHARS):
+            piece = line[offset : offset + CHUNK_CHARS]
+
+            if chunk and (len(chunk) == CHUNK_LINES or size + len(piece) > CHUNK_CHARS):
+                if (done := file_chunk(chunk)) is not None:
+                    yield done
+
+                chunk, size = [], 0
+
+            chunk.append((number, piece))
+            size += len(piece)
+
+    if chunk and (done := file_chunk(chunk)) is not None:
+        yield done
+
+
+def embeddings_model(project: ContinueDevProject) -> str:
+    provider = project.config.embeddings_provider
+
+    if provider is not None and provider.model is not None:
+        return provider.model
+
+    return config.default_embeddings_model
+
+
+@dataclasses.dataclass(slots=True)
+class IndexUpdate:
+    version: int
+    embedded: int
+    reused: int
+    removed: int
+
+
+async def embed_chunks(
+    user: User, model: str, chunks: list[FileChunk]
+) -> list[tuple[bytes, float]]:
+    """Embed chunks in batches, several batches at once."""
+
+    semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+    async def embed_batch(batch: list[FileChunk]) -> list[tuple[bytes, float]]:
+        async with semaphore:
+            quantized, scales = quantize(
+                await embed(user, model, [chunk.content for chunk in batch])
+            )
+
+        return [(vector.tobytes(), float(scale)) for vector, scale in zip(quantized, scales)]
+
+    batches = await asyncio.gather(
+        *(
+            embed_batch(chunks[start : start + EMBED_BATCH])
+            for start in range(0, len(chunks), EMBED_BATCH)
+        )
+    )
+
+    return [vector for batch in batches for vector in batch]
+
+
+async def update_index(
+    user: User,
+    project: ContinueDevProject,
+    files: dict[str, str],
+    removed: list[str],
+    site: str | None = None,
+) -> IndexUpdate:
+    """Replace chunks of changed and removed files and publish a new index version.
+
+    Chunks are embedded only if the project has no chunk with the same content
+    embedded by the same model. If the embeddings model changed, chunks of other
+    files are embedded again, the index only searches vectors of one model.
+    """
+
+    model = embeddings_model(project)
+    version = await CodebaseIndex.reserve(project.id, model, site)
+
+    try:
+        chunks = {path: list(chunk_file(content)) for path, content in files.items()}
+
+        current = await CodebaseIndex.current(project.id, site)
+
+        if current is not None and current.model != model:
+            async for chunk in CodebaseChunk.contents(current, [*files, *removed]):
+                chunks.setdefault(chunk["path"], []).append(
+                    FileChunk(
+                        chunk["start_line"], chunk["end_line"], chunk["content"], chunk["hash"]
+                    )
+                )
+
+        new = {chunk.hash: chunk for file_chunks in chunks.values() for chunk in file_chunks}
+        vectors = await CodebaseChunk.embedded(project.id, model, new)
+        missing = [chunk for chunk_hash, chunk in new.items() if chunk_hash not in vectors]
+
+        for chunk, vector in zip(missing, await embed_chunks(user, model, missing)):
+            vectors[chunk.hash] = vector
+
+        removed_count = await CodebaseChunk.replace_files(
+            project.id,
+            [*chunks, *removed],
+            [
+                {
+                    "path": path,
+                    "start_line": chunk.start_line,
+                    "end_line": chunk.end_line,
+                    "content": chunk.content,
+                    "hash": chunk.hash,
+                    "model": model,
+                    "vector": vectors[chunk.hash][0],
+                    "scale": vectors[chunk.hash][1],
+                }
+                for path, file_chunks in chunks.items()
+                for chunk in file_chunks
+            ],
+            version,
+            site,
+        )
+    except BaseException:
+        await CodebaseChunk.discard(project.id, version, site)
+        await CodebaseIndex.abort(project.id, version, site)
+        raise
+
+    index = await CodebaseIndex.publish(project.id, version, model, site)
+    await CodebaseChunk.remove_replaced(index)
+
+    return IndexUpdate(
+        version=index.version,
+        embedded=len(missing),
+        reused=len(new) - len(missing),
+        removed=removed_count,
+    )
+
+
+async def retrieve(
+    user: User, project_id: str, query: str, n: int, sites: list[str | None] | None = None
+) -> list[tuple[CodebaseChunk, float]]:
+    """Find `n` chunks most similar to the query in the project codebase or docs sites."""
+
+    indexes = [
+        await vector_indexes.get(project_id, site)
+        for site in (sites if sites is not None else [None])
+    ]
+    queries: dict[str, np.ndarray] = {}
+    results = []
+
+    for found in indexes:
+        if found is None:
+            continue
+
+        current, index = found
+
+        if current.model not in queries:
+            (vector,) = await embed(user, current.model, [query])
+            queries[current.model] = normalize(vector)
+
+        results.extend(index.search(queries[current.model], n))
+
+    results = sorted(results, key=lambda result: result[1], reverse=True)[:n]
+
+    ids = [bson.ObjectId(chunk_id) for chunk_id, _ in results]
+    chunks = {chunk.id: chunk async for chunk in CodebaseChunk.all(ids)}
+
+    return [
+        (chunks[str(chunk_id)], score)
+        for chunk_id, (_, score) in zip(ids, results)
+        if str(chunk_id) in chunks
+    ]
@@ -1,6 +1,6 @@
 from typing import Literal
 
-from pydantic import Field
+from pydantic import Field, Json
 from pydantic_conf import EnvAppConfig
 
 from ollama_x.types import OllamaModel
@@ -38,6 +38,144 @@ class OllamaXConfig(EnvAppConfig):
         alias="SERVER_CHECK_INTERVAL",
     )
 
+    embedded_scheduler: bool = Field(
+        default=False,
+        description="Run scheduler inside the API app and route from in-memory server state",
+        alias="EMBEDDED_SCHEDULER",
+    )
+
+    scheduler_lease_ttl: int = Field(
+        default=10,
+        description="Scheduler replica heartbeat and leader lease TTL in seconds",
+        alias="SCHEDULER_LEASE_TTL",
+    )
+
+    scheduler_replica_id: str | None = Field(
+        default=None,
+        description="Scheduler replica ID. Defaults to hostname and process ID",
+        alias="SCHEDULER_REPLICA_ID",
+    )
+
+    demand_flush_interval: int = Field(
+        default=5,
+        description="Interval in seconds between model demand flushes to Mongo",
+        alias="DEMAND_FLUSH_INTERVAL",
+    )
+
+    demand_window: int = Field(
+        default=300,
+        description="Window in seconds used to measure model demand",
+        alias="DEMAND_WINDOW",
+    )
+
+    warmer_enabled: bool = Field(
+        default=False,
+        description="Preload models across the fleet according to demand",
+        alias="WARMER_ENABLED",
+    )
+
+    warm_interval: int = Field(
+        default=30,
+        description="Model warmer interval in seconds",
+        alias="WARM_INTERVAL",
+    )
+
+    warm_keep_alive: int = Field(
+        default=600,
+        description="Keep alive in seconds set on preloaded models",
+        alias="WARM_KEEP_ALIVE",
+    )
+
+    warm_requests_per_replica: float = Field(
+        default=30.0,
+        description="Requests per minute served by one warm model replica",
+        alias="WARM_REQUESTS_PER_REPLICA",
+    )
+
+    warm_targets: Json[dict[str, int]] = Field(
+        default_factory=dict,
+        description='Minimum warm replicas per model, e.g. {"llama3.1:latest": 2}',
+        alias="WARM_TARGETS",
+    )
+
+    placement_enabled: bool = Field(
+        default=False,
+        description="Plan model loads and unloads against VRAM capacity of servers",
+        alias="PLACEMENT_ENABLED",
+    )
+
+    placement_dry_run: bool = Field(
+        default=False,
+        description="Log placement plan without applying it",
+        alias="PLACEMENT_DRY_RUN",
+    )
+
+    registry_cache_dir: str | None = Field(
+        default=None,
+        description="Directory of the model registry mirror cache, mirror is disabled if not set",
+        alias="REGISTRY_CACHE_DIR",
+    )
+
+    vector_index_dir: str | None = Field(
+        default=None,
+        description="Directory of memory-mapped codebase indexes, kept in memory if not set",
+        alias="VECTOR_INDEX_DIR",
+    )
+
+    vector_index_cache_size: int = Field(
+        default=100,
+        description="Number of codebase indexes kept loaded",
+        alias="VECTOR_INDEX_CACHE_SIZE",
+    )
+
+    vector_index_cache_ttl: float = Field(
+        default=3600,
+        description="Seconds an unused codebase index is kept loaded",
+        alias="VECTOR_INDEX_CACHE_TTL",
+    )
+
+    docs_crawl_concurrency: int = Field(
+        default=8,
+        description="Number of pages of a docs site fetched at once",
+        alias="DOCS_CRAWL_CONCURRENCY",
+    )
+
+    docs_max_pages: int = Field(
+        default=1000,
+        description="Maximum number of crawled pages of a docs site",
+        alias="DOCS_MAX_PAGES",
+    )
+
+    registry_upstream: str = Field(
+        default="https://registry.ollama.ai",
+        description="Upstream model registry",
+        alias="REGISTRY_UPSTREAM",
+    )
+
+    registry_manifest_ttl: int = Field(
+        default=300,
+        description="Time in seconds a cached manifest is served without checking upstream",
+        alias="REGISTRY_MANIFEST_TTL",
+    )
+
+    registry_bandwidth_limit: int = Field(
+        default=0,
+        description="Upstream registry download limit in bytes per second, unlimited if 0",
+        alias="REGISTRY_BANDWIDTH_LIMIT",
+    )
+
+    rollout_concurrency: int = Field(
+        default=4,
+        description="Maximum number of model pulls running at once during rollouts",
+        alias="ROLLOUT_CONCURRENCY",
+    )
+
+    rollout_registry: str | None = Field(
+        default=None,
+        description="Registry mirror host servers pull rolled out models from",
+        alias="ROLLOUT_REGISTRY",
+    )
+
     langfuse_secret_key: str | None = Field(
         default=None,
         description="Langfuse secret key",
@@ -56,6 +194,132 @@ class OllamaXConfig(EnvAppConfig):
         alias="LANGFUSE_HOST",
     )
 
+    trace_sample_rate: float = Field(
+        default=1.0,
+        description="Fraction of requests traced in langfuse",
+        alias="TRACE_SAMPLE_RATE",
+    )
+
+    traced_users: Json[list[str]] = Field(
+        default_factory=list,
+        description="Usernames whose requests are always traced",
+        alias="TRACED_USERS",
+    )
+
+    telemetry_buffer_size: int = Field(
+        default=10000,
+        description="Maximum number of telemetry events waiting for export",
+        alias="TELEMETRY_BUFFER_SIZE",
+    )
+
+    telemetry_batch_size: int = Field(
+        default=100,
+        description="Number of telemetry events exported at once",
+        alias="TELEMETRY_BATCH_SIZE",
+    )
+
+    telemetry_flush_interval: float = Field(
+        default=1.0,
+        description="Time in seconds telemetry events wait for a full batch",
+        alias="TELEMETRY_FLUSH_INTERVAL",
+    )
+
+    session_cache_size: int = Field(
+        default=1000,
+        description="Number of stateful chat sessions kept in memory",
+        alias="SESSION_CACHE_SIZE",
+    )
+
+    session_flush_interval: float = Field(
+        default=2.0,
+        description="Time in seconds between saves of changed stateful chat sessions",
+        alias="SESSION_FLUSH_INTERVAL",
+    )
+
+    context_handle_ttl: int = Field(
+        default=3600,
+        description="Time in seconds a generate context is kept under its handle",
+        alias="CONTEXT_HANDLE_TTL",
+    )
+
+    key_hash_secret: str = Field(
+        default="",
+        description="Secret of API key hashes stored in Mongo, required. Changing it invalidates all keys",
+        alias="KEY_HASH_SECRET",
+    )
+
+    auth_cache_size: int = Field(
+        default=10000,
+        description="Number of API keys cached by authentication",
+        alias="AUTH_CACHE_SIZE",
+    )
+
+    auth_cache_ttl: int = Field(
+        default=60,
+        description="Time in seconds API keys are cached by authentication",
+        alias="AUTH_CACHE_TTL",
+    )
+
+    rate_limit_sync_interval: float = Field(
+        default=5.0,
+        description="Time in seconds between syncs of rate limit usage between app workers",
+        alias="RATE_LIMIT_SYNC_INTERVAL",
+    )
+
+    usage_flush_interval: float = Field(
+        default=5.0,
+        description="Time in seconds between flushes of usage ledger to Mongo",
+        alias="USAGE_FLUSH_INTERVAL",
+    )
+
+    continue_config_cache_size: int = Field(
+        default=1000,
+        description="Number of personalized continue.dev configs kept in memory",
+        alias="CONTINUE_CONFIG_CACHE_SIZE",
+    )
+
+    autocomplete_lane_limit: int = Field(
+        default=4,
+        description="Number of autocomplete responses streamed from a server at once",
+        alias="AUTOCOMPLETE_LANE_LIMIT",
+    )
+
+    autocomplete_cache_size: int = Field(
+        default=1000,
+        description="Number of files with cached autocomplete suggestions, 0 disables the cache",
+        alias="AUTOCOMPLETE_CACHE_SIZE",
+    )
+
+    autocomplete_cache_ttl: float = Field(
+        default=300,
+        description="Seconds autocomplete suggestions of a file are cached",
+        alias="AUTOCOMPLETE_CACHE_TTL",
+    )
+
+    semantic_cache_models: Json[list[OllamaModel]] = Field(
+        default_factory=list,
+        description="Models whose chat answers are cached for all users by question similarity",
+        alias="SEMANTIC_CACHE_MODELS",
+    )
+
+    semantic_cache_threshold: float = Field(
+        default=0.95,
+        description="Minimum cosine similarity of questions to serve a cached answer",
+        alias="SEMANTIC_CACHE_THRESHOLD",
+    )
+
+    semantic_cache_size: int = Field(
+        default=1000,
+        description="Number of answers in the semantic cache, 0 disables the cache",
+        alias="SEMANTIC_CACHE_SIZE",
+    )
+
+    semantic_cache_ttl: float = Field(
+        default=3600,
+        description="Seconds answers are kept in the semantic cache",
+        alias="SEMANTIC_CACHE_TTL",
+    )
+
     enforce_model: str | None = Field(
         None, description="Enforce model for all requests", alias="ENFORCE_MODEL"
     )
@@ -0,0 +1,107 @@
+import bisect
+import hashlib
+import logging
+import os
+import socket
+from collections.abc import Iterable
+
+from ollama_x.config import config
+from ollama_x.model import SchedulerLease, SchedulerReplica
+
+LOG = logging.getLogger(__name__)
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes."""
+
+    VNODES = 64
+
+    def __init__(self, nodes: Iterable[str] = ()) -> None:
+        self.nodes: frozenset[str] = frozenset(nodes)
+
+        ring = sorted(
+            (self.hash(f"{node}#{index}"), node)
+            for node in self.nodes
+            for index in range(self.VNODES)
+        )
+
+        self.points: list[int] = [point for point, _ in ring]
+        self.owners: list[str] = [node for _, node in ring]
+
+    @staticmethod
+    def hash(value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest())
+
+    def node_for(self, key: str) -> str | None:
+        """Find node owning the key."""
+
+        if not self.points:
+            return None
+
+        index = bisect.bisect(self.points, self.hash(key)) % len(self.points)
+
+        return self.owners[index]
+
+
+class Coordinator:
+    """Coordinates scheduler replicas through Mongo leases.
+
+    Every replica heartbeats into `scheduler_replicas`; servers are split between live
+    replicas with a consistent hash ring, so a replica joining or leaving only moves
+    its own share of servers. Fleet-wide jobs run only on the replica holding the
+    leader lease.
+    """
+
+    LEADER_LEASE = "leader"
+
+    def __init__(self, replica_id: str | None = None, ttl: int | None = None) -> None:
+        self.replica_id: str = replica_id or self.generate_replica_id()
+        self.ttl: int = ttl or config.scheduler_lease_ttl
+        self.is_leader: bool = False
+        self.ring: HashRing = HashRing([self.replica_id])
+
+    @staticmethod
+    def generate_replica_id() -> str:
+        return config.scheduler_replica_id or f"{socket.gethostname()}-{os.getpid()}"
+
+    @property
+    def renew_interval(self) -> float:
+        """Interval between heartbeats. Leaves room for two missed renewals."""
+
+        return self.ttl / 3
+
+    def owns(self, key: str) -> bool:
+        """Check if this replica owns the key."""
+
+        return self.ring.node_for(key) == self.replica_id
+
+    async def tick(self) -> bool:
+        """Renew heartbeat and leases. Returns `True` if ownership changed."""
+
+        await SchedulerReplica.heartbeat(self.replica_id, self.ttl)
+
+        replicas = {replica.id async for replica in SchedulerReplica.all_alive()}
+        replicas.add(self.replica_id)
+
+        is_leader = await SchedulerLease.acquire(self.LEADER_LEASE, self.replica_id, self.ttl)
+
+        changed = replicas != self.ring.nodes or is_leader != self.is_leader
+
+        if replicas != self.ring.nodes:
+            LOG.info(f"Scheduler replicas changed: {sorted(replicas)}")
+            self.ring = HashRing(replicas)
+
+        if is_leader != self.is_leader:
+            LOG.info(f"Replica {self.replica_id} leadership: {is_leader}")
+            self.is_leader = is_leader
+
+        return changed
+
+    async def resign(self) -> None:
+        """Give up leadership and shards so other replicas take over immediately."""
+
+        if self.is_leader:
+            await SchedulerLease.release(self.LEADER_LEASE, self.replica_id)
+            self.is_leader = False
+
+        await SchedulerReplica.resign(self.replica_id)
@@ -0,0 +1,52 @@
+import asyncio
+import logging
+from collections import Counter
+
+from ollama_x.config import config
+from ollama_x.model import ModelDemand
+
+LOG = logging.getLogger(__name__)
+
+
+class DemandTracker:
+    """Counts requests per model in memory and flushes them to Mongo in bulk."""
+
+    def __init__(self) -> None:
+        self.counts: Counter[str] = Counter()
+        self.task: asyncio.Task | None = None
+
+    def record(self, model: str) -> None:
+        """Record request to the model."""
+
+        self.counts[model] += 1
+
+    async def flush(self) -> None:
+        """Write collected counts to Mongo."""
+
+        counts, self.counts = self.counts, Counter()
+
+        if counts:
+            await ModelDemand.add(counts)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(config.demand_flush_interval)
+
+            try:
+                await self.flush()
+            except Exception as e:
+                LOG.exception(f"Error flushing model demand: {e}")
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+        await self.flush()
+
+
+demand = DemandTracker()
@@ -0,0 +1,403 @@
+import asyncio
+import dataclasses
+import datetime
+import hashlib
+import ipaddress
+import logging
+import socket
+from html.parser import HTMLParser
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+import aiohttp
+from aiohttp.abc import ResolveResult
+from aiohttp.resolver import ThreadedResolver
+from pytz import utc
+
+from ollama_x import codebase
+from ollama_x.config import config
+from ollama_x.model import ContinueDevProject, DocsPage, User
+from ollama_x.model.continue_dev import DocsParameters, DocsSite
+
+LOG = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 5 * 1024 * 1024
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+GONE_STATUSES = {404, 410}
+
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "nav", "footer", "head"}
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "pre", "table", "tr",
+    "br", "hr", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "dt", "dd",
+}  # fmt: skip
+
+
+class PageParser(HTMLParser):
+    """Extracts title, text by blocks and links of HTML page."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+
+        self.title: str | None = None
+        self.links: list[str] = []
+        self.lines: list[str] = [""]
+        self.skipped = 0
+        self.in_title = False
+        self.in_pre = 0
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag in SKIPPED_TAGS:
+            self.skipped += 1
+        elif tag == "title":
+            self.in_title = True
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.links.append(href)
+
+        if tag == "pre":
+            self.in_pre += 1
+
+        if tag in BLOCK_TAGS:
+            self.lines.append("")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in SKIPPED_TAGS:
+            self.skipped = max(self.skipped - 1, 0)
+        elif tag == "title":
+            self.in_title = False
+        elif tag == "pre":
+            self.in_pre = max(self.in_pre - 1, 0)
+
+        if tag in BLOCK_TAGS:
+            self.lines.append("")
+
+    def handle_data(self, data: str) -> None:
+        if self.in_title:
+            self.title = (self.title or "") + data.strip()
+        elif not self.skipped:
+            if self.in_pre:
+                first, *rest = data.split("\n")
+                self.lines[-1] += first
+                self.lines.extend(rest)
+            else:
+                self.lines[-1] += " ".join(data.split()) + (" " if data[-1:].isspace() else "")
+
+    @property
+    def text(self) -> str:
+        return "\n".join(line.rstrip() for line in self.lines if line.strip()) + "\n"
+
+
+def is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address)
+
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+
+    return ip.is_global and not ip.is_multicast
+
+
+def check_url(url: str) -> None:
+    """Reject URLs other than http(s) and hosts given as non-public addresses.
+
+    Host names are checked when they are resolved by `PublicResolver`.
+    """
+
+    parts = urlsplit(url)
+
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise aiohttp.InvalidURL(url, "only http(s) URLs are crawled")
+
+    try:
+        public = is_public_address(parts.hostname)
+    except ValueError:
+        return
+
+    if not public:
+        raise aiohttp.InvalidURL(url, "address is not public")
+
+
+class PublicResolver(ThreadedResolver):
+    """Resolves only host names of public addresses, crawled sites cannot reach internal hosts."""
+
+    async def resolve(
+        self, host: str, port: int = 0, family: socket.AddressFamily = socket.AF_INET
+    ) -> list[ResolveResult]:
+        results = await super().resolve(host, port, family)
+
+        if not all(is_public_address(result["host"]) for result in results):
+            raise OSError(f"{host} resolves to a non-public address")
+
+        return results
+
+
+@dataclasses.dataclass(slots=True)
+class CrawledPage:
+    url: str
+    links: list[str]
+    title: str | None = None
+    text: str | None = None
+    """Text of a fetched page, not set if it was not modified."""
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+class SiteCrawler:
+    """Crawls pages of a docs site reachable from the start URL within the root URL.
+
+    Pages are fetched by a bounded number of workers. Known pages are requested
+    conditionally and links of not modified pages are taken from the last crawl.
+    Known pages failing to be fetched are kept with links of the last crawl.
+    """
+
+    def __init__(
+        self,
+        start_url: str,
+        root_url: str,
+        known: dict[str, DocsPage] | None = None,
+        concurrency: int | None = None,
+        max_pages: int | None = None,
+    ) -> None:
+        self.start_url = urldefrag(start_url).url
+        self.root = urlsplit(root_url)
+        self.known = known or {}
+        self.concurrency = concurrency or config.docs_crawl_concurrency
+        self.max_pages = max_pages or config.docs_max_pages
+
+        self.pages: dict[str, CrawledPage] = {}
+        self.seen: set[str] = set()
+        self.gone: set[str] = set()
+        self.queue: asyncio.Queue[str] = asyncio.Queue()
+
+    def within_root(self, url: str) -> bool:
+        """Check if the URL has the same origin as the root URL and a path below it."""
+
+        parts = urlsplit(url)
+        root_path = self.root.path.rstrip("/")
+
+        return (
+            parts.scheme == self.root.scheme
+            and parts.netloc.lower() == self.root.netloc.lower()
+            and (parts.path == root_path or parts.path.startswith(f"{root_path}/"))
+        )
+
+    def visit(self, url: str) -> None:
+        if url not in self.seen and len(self.seen) < self.max_pages:
+            self.seen.add(url)
+            self.queue.put_nowait(url)
+
+    async def crawl(self, session: aiohttp.ClientSession) -> dict[str, CrawledPage]:
+        """Crawl the site, returns pages by URL."""
+
+        self.visit(self.start_url)
+
+        workers = [asyncio.create_task(self.work(session)) for _ in range(self.concurrency)]
+
+        try:
+            await self.queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        return self.pages
+
+    async def work(self, session: aiohttp.ClientSession) -> None:
+        while True:
+            url = await self.queue.get()
+
+            try:
+                page = await self.fetch(session, url)
+            except (aiohttp.ClientError, asyncio.TimeoutError, LookupError) as e:
+                LOG.warning(f"Failed to fetch {url}: {e}")
+                page = None
+
+                if url in self.known:
+                    # keep the page until it is fetched again
+                    page = CrawledPage(url, self.known[url].links)
+
+            if page is None:
+                self.gone.add(url)
+            else:
+                self.pages[url] = page
+
+                for link in page.links:
+                    self.visit(link)
+
+            self.queue.task_done()
+
+    def removed(self) -> list[str]:
+        """Known pages not found anymore or not linked from crawled pages.
+
+        Known pages still linked, but not visited because of the page limit, are kept.
+        """
+
+        linked = {self.start_url, *(link for page in self.pages.values() for link in page.links)}
+
+        return [
+            url
+            for url in self.known
+            if url not in self.pages and (url in self.gone or url not in linked)
+        ]
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str) -> CrawledPage | None:
+        headers = {}
+        known = self.known.get(url)
+
+        if known is not None:
+            if known.etag is not None:
+                headers["If-None-Match"] = known.etag
+            if known.last_modified is not None:
+                headers["If-Modified-Since"] = known.last_modified
+
+        location = url
+
+        for _ in range(MAX_REDIRECTS + 1):
+            check_url(location)
+
+            async with session.get(location, headers=headers, allow_redirects=False) as response:
+                if response.status in REDIRECT_STATUSES and "Location" in response.headers:
+                    location = urldefrag(urljoin(location, response.headers["Location"])).url
+
+                    if not self.within_root(location):
+                        LOG.info(f"Not following redirect of {url} out of the site: {location}")
+                        return None
+
+                    continue
+
+                if response.status == 304 and known is not None:
+                    return CrawledPage(url, known.links, known.title)
+
+                if response.status in GONE_STATUSES:
+                    return None
+
+                if response.status != 200:
+                    # the page may be back on the next crawl
+                    raise aiohttp.ClientResponseError(
+                        response.request_info,
+                        response.history,
+                        status=response.status,
+                        message=response.reason or "",
+                    )
+
+                content_type = response.headers.get("Content-Type", "")
+
+                if not content_type.startswith(("text/", "application/xhtml")):
+                    return None
+
+                if response.content_length is not None and response.content_length > MAX_PAGE_SIZE:
+                    return None
+
+                body = await response.content.read(MAX_PAGE_SIZE)
+                text = body.decode(response.charset or "utf-8", errors="replace")
+                base_url = str(response.url)
+                break
+        else:
+            LOG.warning(f"Too many redirects of {url}")
+            return None
+
+        if "html" in content_type:
+            parser = PageParser()
+            parser.feed(text)
+            parser.close()
+
+            title, text = parser.title, parser.text
+            links = [urldefrag(urljoin(base_url, link)).url for link in parser.links]
+        else:
+            title, links = None, []
+
+        return CrawledPage(
+            url,
+            [link for link in dict.fromkeys(links) if self.within_root(link)],
+            title,
+            text,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+
+
+def text_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+@dataclasses.dataclass(slots=True)
+class SiteIngest:
+    site: str
+    pages: int
+    changed: int
+    removed: int
+    index: codebase.IndexUpdate | None
+
+
+def project_sites(project: ContinueDevProject) -> list[DocsSite]:
+    """Docs sites of the project docs context providers."""
+
+    return [
+        site
+        for provider in project.config.context_providers
+        if provider.name == "docs" and isinstance(provider.params, DocsParameters)
+        for site in provider.params.sites
+    ]
+
+
+async def ingest_site(
+    user: User, project: ContinueDevProject, site: DocsSite, session: aiohttp.ClientSession
+) -> SiteIngest:
+    """Crawl docs site and index pages whose text changed since the last crawl."""
+
+    start_url = str(site.start_url)
+    known = {page.url: page async for page in DocsPage.of_site(project.id, start_url)}
+
+    crawler = SiteCrawler(start_url, str(site.root_url), known)
+    crawled = await crawler.crawl(session)
+    now = datetime.datetime.now(utc)
+
+    changed, pages = {}, []
+
+    for url, page in crawled.items():
+        previous = known.get(url)
+
+        if page.text is None:
+            continue
+
+        page_hash = text_hash(page.text)
+        if previous is None or previous.hash != page_hash:
+            changed[url] = page.text
+
+        pages.append(
+            DocsPage(
+                project=project.id,
+                site=start_url,
+                url=url,
+                title=page.title,
+                hash=page_hash,
+                links=page.links,
+                etag=page.etag,
+                last_modified=page.last_modified,
+                fetched=now,
+            )
+        )
+
+    removed = crawler.removed()
+
+    index = None
+    if changed or removed:
+        index = await codebase.update_index(user, project, changed, removed, site=start_url)
+
+    await DocsPage.save_site(project.id, start_url, pages, removed)
+
+    LOG.info(f"Crawled {start_url}: {len(crawled)} pages, {len(changed)} changed")
+
+    return SiteIngest(start_url, len(crawled), len(changed), len(removed), index)
+
+
+async def ingest_sites(user: User, project: ContinueDevProject) -> list[SiteIngest]:
+    """Crawl and index all docs sites of the project."""
+
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(resolver=PublicResolver()),
+        timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30),
+        headers={"User-Agent": "ollama-x docs crawler"},
+    ) as session:
+        return [await ingest_site(user, project, site, session) for site in project_sites(project)]
@@ -0,0 +1,96 @@
+import datetime
+from collections.abc import AsyncIterable, Iterable
+from typing import Any
+
+from pytz import utc
+
+from ollama_x.config import config
+from ollama_x.model import APIServer
+from ollama_x.rollout import rollouts
+
+
+def as_utc(value: datetime.datetime) -> datetime.datetime:
+    """Mongo returns naive UTC datetimes, probes produce aware ones."""
+
+    return value.replace(tzinfo=utc) if value.tzinfo is None else value
+
+
+class Fleet:
+    """In-memory view of API servers shared by the embedded scheduler and the proxy."""
+
+    def __init__(self) -> None:
+        self.servers: dict[str, APIServer] = {}
+
+    def update(self, server: APIServer) -> None:
+        """Store server state unless a newer one is already known."""
+
+        known = self.servers.get(server.id)
+
+        if known is None or as_utc(server.last_update) >= as_utc(known.last_update):
+            self.servers[server.id] = server
+        else:
+            # Settings are edited through API and are not touched by probes.
+            for field in APIServer.SETTINGS_FIELDS:
+                setattr(known, field, getattr(server, field))
+
+    def sync(self, servers: Iterable[APIServer]) -> None:
+        """Replace known servers with persisted ones, keeping newer local probes."""
+
+        servers = list(servers)
+        known_ids = {server.id for server in servers}
+
+        for server_id in self.servers.keys() - known_ids:
+            del self.servers[server_id]
+
+        for server in servers:
+            self.update(server)
+
+    def update_probes(self, server_id: str, probes: dict[str, Any]) -> None:
+        """Store persisted probe results of a known server unless newer ones are known."""
+
+        known = self.servers.get(server_id)
+        last_update = probes.get("last_update")
+
+        if known is None or last_update is None:
+            return
+
+        if as_utc(last_update) >= as_utc(known.last_update):
+            for field in APIServer.PROBE_FIELDS:
+                if field in probes:
+                    setattr(known, field, probes[field])
+
+    def remove(self, server_id: str) -> None:
+        self.servers.pop(server_id, None)
+
+    async def all_active(self, model_name: str | None = None) -> AsyncIterable[APIServer]:
+        """Find all active servers suitable for the model."""
+
+        for server in list(self.servers.values()):
+            if server.is_active and (model_name is None or server.has_model(model_name)):
+                yield server
+
+
+fleet = Fleet()
+
+
+async def active_servers(model_name: str | None = None) -> AsyncIterable[APIServer]:
+    """Find active servers in memory when scheduler is embedded, otherwise in Mongo.
+
+    Servers taking part in a model rollout are chosen by the rolled out version.
+    """
+
+    if config.embedded_scheduler:
+        servers = fleet.all_active(model_name)
+    else:
+        servers = APIServer.all_active(model_name)
+
+    rollout = await rollouts.active(model_name) if model_name is not None else None
+
+    if rollout is None:
+        async for server in servers:
+            yield server
+
+        return
+
+    for server in rollouts.route(rollout, [server async for server in servers]):
+        yield server
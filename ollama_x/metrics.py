@@ -0,0 +1,86 @@
+from collections.abc import Callable
+
+
+def label_key(labels: dict[str, str]) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted(labels.items()))
+
+
+def format_labels(key: tuple[tuple[str, str], ...]) -> str:
+    if not key:
+        return ""
+
+    return "{" + ",".join(f'{name}="{value}"' for name, value in key) + "}"
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self.values: dict[tuple[tuple[str, str], ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = label_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self.values.get(label_key(labels), 0)
+
+    def samples(self) -> list[tuple[tuple[tuple[str, str], ...], float]]:
+        return list(self.values.items()) or [((), 0)]
+
+
+class Gauge:
+    """Value read when metrics are collected."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, description: str, read: Callable[[], float]) -> None:
+        self.name = name
+        self.description = description
+        self.read = read
+
+    def samples(self) -> list[tuple[tuple[tuple[str, str], ...], float]]:
+        return [((), self.read())]
+
+
+class Metrics:
+    """In-process metrics registry exposed in Prometheus text format."""
+
+    def __init__(self) -> None:
+        self.metrics: dict[str, Counter | Gauge] = {}
+
+    def counter(self, name: str, description: str) -> Counter:
+        metric = self.metrics.setdefault(name, Counter(name, description))
+
+        if not isinstance(metric, Counter):
+            raise ValueError(f"Metric {name} is not a counter")
+
+        return metric
+
+    def gauge(self, name: str, description: str, read: Callable[[], float]) -> Gauge:
+        metric = self.metrics[name] = Gauge(name, description, read)
+
+        return metric
+
+    def render(self) -> str:
+        lines = []
+
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+
+            for key, value in metric.samples():
+                lines.append(f"{metric.name}{format_labels(key)} {format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,492 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import mmap
+import os
+import pathlib
+import re
+import time
+from collections.abc import AsyncIterable
+
+import aiohttp
+
+from ollama_x.client.ollama import MANIFEST_MEDIA_TYPE, OllamaClient
+from ollama_x.config import config
+from ollama_x.throttle import TokenBucket
+
+LOG = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_RETRIES = 5
+FOLLOW_INTERVAL = 0.2
+
+DIGEST_RE = re.compile(r"^sha256:[a-f0-9]{64}$")
+NAME_RE = re.compile(r"^[a-z0-9]+(?:[._-][a-z0-9]+)*(?:/[a-z0-9]+(?:[._-][a-z0-9]+)*)*$")
+TAG_RE = re.compile(r"^\w[\w.-]{0,127}$")
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+class RegistryError(Exception):
+    """Error reported to registry clients."""
+
+    def __init__(self, status_code: int, code: str, message: str) -> None:
+        super().__init__(message)
+
+        self.status_code = status_code
+        self.code = code
+
+
+class BlobDigestMismatch(RegistryError):
+    def __init__(self, digest: str, actual: str) -> None:
+        super().__init__(502, "DIGEST_INVALID", f"Blob {digest} has digest sha256:{actual}")
+
+
+def validate_name(name: str) -> str:
+    if not NAME_RE.match(name):
+        raise RegistryError(400, "NAME_INVALID", f"Invalid repository name `{name}`")
+
+    return name
+
+
+def validate_reference(reference: str) -> str:
+    if not (TAG_RE.match(reference) or DIGEST_RE.match(reference)):
+        raise RegistryError(400, "TAG_INVALID", f"Invalid manifest reference `{reference}`")
+
+    return reference
+
+
+def validate_digest(digest: str) -> str:
+    if not DIGEST_RE.match(digest):
+        raise RegistryError(400, "DIGEST_INVALID", f"Invalid digest `{digest}`")
+
+    return digest
+
+
+def write_atomic(path: pathlib.Path, content: bytes) -> None:
+    """Write file so readers never see partial content."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(content)
+    os.replace(tmp, path)
+
+
+def write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+def hash_file(path: pathlib.Path) -> "hashlib._Hash":
+    hasher = hashlib.sha256()
+
+    with path.open("rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            hasher.update(chunk)
+
+    return hasher
+
+
+async def read_mapped(path: pathlib.Path, start: int, end: int) -> AsyncIterable[bytes]:
+    """Read byte range of a complete blob through a memory map."""
+
+    # empty files can not be mapped
+    if start == end:
+        return
+
+    with path.open("rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for offset in range(start, end, CHUNK_SIZE):
+            yield data[offset : min(offset + CHUNK_SIZE, end)]
+
+
+class Manifest:
+    """Cached manifest content."""
+
+    def __init__(self, content: bytes) -> None:
+        self.content = content
+        self.digest = f"sha256:{hashlib.sha256(content).hexdigest()}"
+
+        try:
+            self.media_type = json.loads(content).get("mediaType") or MANIFEST_MEDIA_TYPE
+        except (ValueError, AttributeError):
+            self.media_type = MANIFEST_MEDIA_TYPE
+
+
+class BlobDownload:
+    """Download of a single blob shared by every reader requesting it.
+
+    Blob is written to `<digest>-partial` and renamed after its digest is verified.
+    Readers stream bytes from the partial file as soon as they are written. Partial
+    files left by interrupted downloads are resumed with range requests.
+
+    Workers sharing the store download a blob once: the partial file is locked by
+    the downloading worker, others follow its size and stream from it too.
+    """
+
+    def __init__(self, store: "BlobStore", name: str, digest: str) -> None:
+        self.store = store
+        self.name = name
+        self.digest = digest
+
+        self.path = store.blob_path(digest)
+        self.partial_path = self.path.with_name(f"{self.path.name}-partial")
+        self.size_path = self.path.with_name(f"{self.path.name}-size")
+        self.partial_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.size: int | None = None
+        self.written = 0
+        self.hasher = hashlib.sha256()
+        self.done = False
+        self.error: Exception | None = None
+
+        self.condition = asyncio.Condition()
+        self.task = asyncio.create_task(self.run())
+
+    async def notify(self) -> None:
+        async with self.condition:
+            self.condition.notify_all()
+
+    async def run(self) -> None:
+        try:
+            await self.download()
+        except RegistryError as e:
+            self.error = e
+        except Exception as e:
+            LOG.exception(f"Error downloading {self.digest}")
+            self.error = RegistryError(502, "UNAVAILABLE", f"Upstream download failed: {e}")
+        finally:
+            self.done = True
+            self.store.downloads.pop(self.digest, None)
+            await self.notify()
+
+    async def lock(self) -> int | None:
+        """Open the partial file locked by this worker.
+
+        Waits while another worker downloads the blob, `None` if it completed it.
+        """
+
+        while not self.path.exists():
+            fd = os.open(self.partial_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                await self.follow()
+                continue
+
+            try:
+                is_current = os.stat(self.partial_path).st_ino == os.fstat(fd).st_ino
+            except FileNotFoundError:
+                is_current = False
+
+            if is_current:
+                return fd
+
+            # Renamed or removed by another worker before the lock was taken.
+            os.close(fd)
+
+        return None
+
+    async def follow(self) -> None:
+        """Follow the partial file written by another worker until it is unlocked."""
+
+        LOG.info(f"Blob {self.digest} is downloaded by another worker, following it")
+
+        try:
+            fd = os.open(self.partial_path, os.O_RDONLY)
+        except FileNotFoundError:
+            return
+
+        try:
+            inode = os.fstat(fd).st_ino
+
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    pass
+                else:
+                    break
+
+                self.written = os.fstat(fd).st_size
+
+                if self.size is None and self.size_path.exists():
+                    self.size = int(self.size_path.read_text())
+
+                await self.notify()
+                await asyncio.sleep(FOLLOW_INTERVAL)
+        finally:
+            os.close(fd)
+
+        if self.path.exists():
+            return
+
+        try:
+            is_current = os.stat(self.partial_path).st_ino == inode
+        except FileNotFoundError:
+            is_current = False
+
+        if not is_current:
+            raise RegistryError(502, "UNAVAILABLE", f"Download of {self.digest} failed")
+
+    async def download(self) -> None:
+        fd = await self.lock()
+
+        if fd is None:
+            self.size = self.written = self.path.stat().st_size
+            return
+
+        try:
+            await self.download_locked(fd)
+        except BaseException:
+            if self.written == 0:
+                self.partial_path.unlink(missing_ok=True)
+
+            raise
+        finally:
+            self.size_path.unlink(missing_ok=True)
+            os.close(fd)
+
+    async def download_locked(self, fd: int) -> None:
+        self.written = os.fstat(fd).st_size
+        self.hasher = await asyncio.to_thread(hash_file, self.partial_path)
+
+        if self.written and f"sha256:{self.hasher.hexdigest()}" == self.digest:
+            self.size = self.written
+            os.replace(self.partial_path, self.path)
+            return
+
+        if self.written:
+            LOG.info(f"Resuming download of {self.digest} from {self.written} bytes")
+
+        for attempt in range(1, DOWNLOAD_RETRIES + 1):
+            try:
+                await self.fetch(fd)
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == DOWNLOAD_RETRIES:
+                    raise
+
+                LOG.warning(
+                    f"Download of {self.digest} interrupted at {self.written} bytes, "
+                    f"retrying ({attempt}/{DOWNLOAD_RETRIES}): {e}"
+                )
+                await asyncio.sleep(attempt)
+
+        actual = self.hasher.hexdigest()
+
+        if f"sha256:{actual}" != self.digest:
+            self.partial_path.unlink(missing_ok=True)
+            raise BlobDigestMismatch(self.digest, actual)
+
+        os.replace(self.partial_path, self.path)
+        LOG.info(f"Cached blob {self.digest} ({self.written} bytes)")
+
+    async def fetch(self, fd: int) -> None:
+        """Fetch the rest of the blob from upstream."""
+
+        offset = self.written
+
+        async with self.store.client.download_blob(self.name, self.digest, offset) as response:
+            if response.status == 404:
+                raise RegistryError(404, "BLOB_UNKNOWN", f"Blob {self.digest} not found")
+
+            if response.status == 416 and offset:
+                # Partial file is already complete or corrupted, start over.
+                self.restart(fd)
+                return await self.fetch(fd)
+
+            response.raise_for_status()
+
+            if response.status == 206 and (
+                match := CONTENT_RANGE_RE.match(response.headers.get("Content-Range", ""))
+            ):
+                if int(match.group(1)) != offset:
+                    raise RegistryError(502, "UNAVAILABLE", "Upstream returned unexpected range")
+
+                self.size = int(match.group(3))
+            else:
+                if offset:
+                    LOG.info(f"Upstream ignored range for {self.digest}, downloading again")
+                    self.restart(fd)
+
+                self.size = response.content_length
+
+            if self.size is not None:
+                await asyncio.to_thread(write_atomic, self.size_path, str(self.size).encode())
+
+            await self.notify()
+
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                if self.store.bandwidth is not None:
+                    await self.store.bandwidth.consume(len(chunk))
+
+                await asyncio.to_thread(write_all, fd, chunk)
+                self.hasher.update(chunk)
+
+                self.written += len(chunk)
+                await self.notify()
+
+        if self.size is None:
+            self.size = self.written
+            await self.notify()
+
+    def restart(self, fd: int) -> None:
+        os.ftruncate(fd, 0)
+
+        self.hasher = hashlib.sha256()
+        self.written = 0
+
+    async def wait_size(self) -> int:
+        """Wait until blob size is known."""
+
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.size is not None or self.done)
+
+        if self.error is not None:
+            raise self.error
+
+        if self.size is None:
+            self.size = self.written
+
+        return self.size
+
+    async def read(self, start: int, end: int) -> AsyncIterable[bytes]:
+        """Stream byte range of the blob, waiting for bytes not downloaded yet."""
+
+        fd = None
+        position = start
+
+        try:
+            while position < end:
+                async with self.condition:
+                    await self.condition.wait_for(lambda: self.written > position or self.done)
+
+                if self.error is not None:
+                    raise self.error
+
+                available = min(self.written, end) - position
+                if available <= 0:
+                    raise RegistryError(502, "UNAVAILABLE", "Blob is shorter than expected")
+
+                if fd is None:
+                    # Descriptor stays valid after the partial file is renamed.
+                    fd = self.open()
+
+                chunk = await asyncio.to_thread(os.pread, fd, min(available, CHUNK_SIZE), position)
+                position += len(chunk)
+
+                yield chunk
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def open(self) -> int:
+        """Open the blob for reading, the partial file is renamed once verified."""
+
+        for path in (self.partial_path, self.path):
+            try:
+                return os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                pass
+
+        raise RegistryError(502, "UNAVAILABLE", f"Blob {self.digest} was removed")
+
+
+class BlobStore:
+    """Content addressed store of manifests and blobs pulled from the upstream registry.
+
+    Blobs are stored once by digest, so layers shared between models are downloaded
+    and kept only once. Upstream downloads share `REGISTRY_BANDWIDTH_LIMIT`.
+    """
+
+    def __init__(self, root: str | os.PathLike) -> None:
+        self.root = pathlib.Path(root)
+        self.client = OllamaClient(None)
+        self.downloads: dict[str, BlobDownload] = {}
+        self.bandwidth = None
+
+        if config.registry_bandwidth_limit:
+            self.bandwidth = TokenBucket(
+                config.registry_bandwidth_limit,
+                capacity=max(config.registry_bandwidth_limit, CHUNK_SIZE),
+            )
+
+    def blob_path(self, digest: str) -> pathlib.Path:
+        return self.root / "blobs" / validate_digest(digest).replace(":", "-")
+
+    def manifest_path(self, name: str, reference: str) -> pathlib.Path:
+        return (
+            self.root
+            / "manifests"
+            / validate_name(name)
+            / validate_reference(reference).replace(":", "-")
+        )
+
+    async def get_manifest(self, name: str, reference: str) -> Manifest:
+        """Get manifest from cache or upstream.
+
+        Tags are revalidated with upstream after `REGISTRY_MANIFEST_TTL`, cached
+        manifest is served if upstream is unavailable. Manifests referenced by digest
+        never change.
+        """
+
+        path = self.manifest_path(name, reference)
+        is_digest = DIGEST_RE.match(reference) is not None
+
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            stat = None
+
+        if stat is not None and (
+            is_digest or time.time() - stat.st_mtime < config.registry_manifest_ttl
+        ):
+            return Manifest(path.read_bytes())
+
+        try:
+            async with self.client.get_manifest(f"{name}:{reference}") as response:
+                if response.status == 404:
+                    raise RegistryError(
+                        404, "MANIFEST_UNKNOWN", f"Manifest {name}:{reference} not found"
+                    )
+
+                response.raise_for_status()
+                manifest = Manifest(await response.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if stat is None:
+                raise RegistryError(502, "UNAVAILABLE", f"Upstream registry error: {e}")
+
+            LOG.warning(f"Serving stale manifest {name}:{reference}: {e}")
+            return Manifest(path.read_bytes())
+
+        if is_digest and manifest.digest != reference:
+            raise RegistryError(502, "DIGEST_INVALID", f"Manifest has digest {manifest.digest}")
+
+        await asyncio.to_thread(write_atomic, path, manifest.content)
+
+        return manifest
+
+    def get_blob(self, name: str, digest: str) -> pathlib.Path | BlobDownload:
+        """Get cached blob path or the download in progress."""
+
+        validate_name(name)
+        path = self.blob_path(digest)
+
+        if digest in self.downloads:
+            return self.downloads[digest]
+
+        if path.exists():
+            return path
+
+        download = self.downloads[digest] = BlobDownload(self, name, digest)
+
+        return download
+
+
+store = BlobStore(config.registry_cache_dir) if config.registry_cache_dir else None
@@ -1,14 +1,33 @@
+from .codebase import CodebaseChunk, CodebaseIndex
+from .context import GenerateContext
 from .continue_dev import ContinueDevProject, UserAlreadyInProject
+from .demand import ModelDemand
+from .docs import DocsPage
 from .ollama import OllamaModel
+from .ratelimit import RateLimitUsage
+from .rollout import ModelRollout
+from .scheduler import SchedulerLease, SchedulerReplica
 from .server import APIServer
 from .session import Session
+from .usage import UsageRecord, UsageRollup
 from .user import User
 
 __all__ = [
     "APIServer",
+    "CodebaseChunk",
+    "CodebaseIndex",
     "ContinueDevProject",
+    "DocsPage",
+    "GenerateContext",
     "Session",
     "User",
     "UserAlreadyInProject",
+    "ModelDemand",
+    "ModelRollout",
     "OllamaModel",
+    "RateLimitUsage",
+    "SchedulerLease",
+    "SchedulerReplica",
+    "UsageRecord",
+    "UsageRollup",
 ]
@@ -0,0 +1,288 @@
+import datetime
+from collections.abc import AsyncIterator, Iterable
+from typing import Any, Self
+
+import bson
+import pymongo
+import pymongo.errors
+from pydantic import Field
+from pydantic_mongo_document import ObjectId
+from pydantic_mongo_document.document.asyncio import Document
+from pytz import utc
+
+
+class CodebaseChunk(Document):
+    """Embedded chunk of a file of continue.dev project codebase or docs site page."""
+
+    __replica__ = "default"
+    __database__ = "ollama_x"
+    __collection__ = "codebase_chunks"
+
+    project: ObjectId = Field(description="continue.dev project ID")
+    site: str | None = Field(None, description="Docs site start URL, not set for codebase")
+    path: str = Field(description="File path or page URL")
+    start_line: int = Field(description="First line of the chunk")
+    end_line: int = Field(description="Last line of the chunk")
+    content: str = Field(description="Chunk content")
+    hash: str = Field(description="Hash of the chunk content")
+    model: str = Field(description="Embeddings model")
+    vector: bytes = Field(description="Normalized embedding quantized to int8")
+    scale: float = Field(description="Scale of the quantized embedding")
+    version: int = Field(0, description="Index version the chunk was added in")
+    removed: int | None = Field(None, description="Index version the chunk was replaced in")
+
+    @classmethod
+    async def create_indexes(cls) -> None:
+        """Create indexes for the model."""
+
+        await cls.collection().create_index(
+            [("project", pymongo.ASCENDING), ("path", pymongo.ASCENDING)],
+            name="project_path_index",
+        )
+
+        await cls.collection().create_index(
+            [
+                ("project", pymongo.ASCENDING),
+                ("model", pymongo.ASCENDING),
+                ("hash", pymongo.ASCENDING),
+            ],
+            name="project_model_hash_index",
+        )
+
+    @classmethod
+    async def embedded(
+        cls, project_id: str, model: str, hashes: Iterable[str]
+    ) -> dict[str, tuple[bytes, float]]:
+        """Get already embedded vectors of the project by chunk hash."""
+
+        cursor = cls.collection().find(
+            {"project": bson.ObjectId(project_id), "model": model, "hash": {"$in": list(hashes)}},
+            {"_id": 0, "hash": 1, "vector": 1, "scale": 1},
+        )
+
+        return {chunk["hash"]: (chunk["vector"], chunk["scale"]) async for chunk in cursor}
+
+    @classmethod
+    async def replace_files(
+        cls,
+        project_id: str,
+        paths: Iterable[str],
+        chunks: list[dict[str, Any]],
+        version: int,
+        site: str | None = None,
+    ) -> int:
+        """Add chunks of the files in the reserved version, returns number of replaced chunks.
+
+        Chunks added or replaced by a version are hidden from the index until it is published.
+        """
+
+        project = bson.ObjectId(project_id)
+
+        if chunks:
+            await cls.collection().insert_many(
+                [
+                    {"project": project, "site": site, "version": version, **chunk}
+                    for chunk in chunks
+                ],
+                ordered=False,
+            )
+
+        result = await cls.collection().update_many(
+            {
+                "project": project,
+                "site": site,
+                "path": {"$in": list(paths)},
+                "version": {"$not": {"$gte": version}},
+                "removed": None,
+            },
+            {"$set": {"removed": version}},
+        )
+
+        return result.modified_count
+
+    @classmethod
+    async def discard(cls, project_id: str, version: int, site: str | None = None) -> None:
+        """Undo changes of the reserved version."""
+
+        project = bson.ObjectId(project_id)
+
+        await cls.collection().delete_many({"project": project, "site": site, "version": version})
+        await cls.collection().update_many(
+            {"project": project, "site": site, "removed": version}, {"$unset": {"removed": ""}}
+        )
+
+    @classmethod
+    async def remove_replaced(cls, index: "CodebaseIndex") -> None:
+        """Delete chunks replaced in the published index version or before."""
+
+        await cls.collection().delete_many(
+            {
+                "project": bson.ObjectId(index.project),
+                "site": index.site,
+                "removed": {"$lte": index.version, "$nin": index.pending},
+            }
+        )
+
+    @classmethod
+    def vectors(cls, index: "CodebaseIndex") -> AsyncIterator[dict[str, Any]]:
+        """Iterate IDs and vectors of chunks in the index version embedded by its model."""
+
+        return cls.collection().find(
+            {"model": index.model, **index.chunks_query()},
+            {"_id": 1, "vector": 1, "scale": 1},
+        )
+
+    @classmethod
+    def contents(
+        cls, index: "CodebaseIndex", exclude: Iterable[str]
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Iterate contents of chunks in the index version, except chunks of excluded files."""
+
+        return cls.collection().find(
+            {"path": {"$nin": list(exclude)}, **index.chunks_query()},
+            {"_id": 0, "path": 1, "start_line": 1, "end_line": 1, "content": 1, "hash": 1},
+        )
+
+
+class CodebaseIndex(Document):
+    """Version of continue.dev project codebase or docs site index.
+
+    Every update reserves a version its chunks are stamped with and publishes a
+    newer version when they are stored. Chunks of updates still pending are not
+    part of a version, so a published version never changes.
+    """
+
+    __replica__ = "default"
+    __database__ = "ollama_x"
+    __collection__ = "codebase_indexes"
+
+    project: ObjectId = Field(description="continue.dev project ID")
+    site: str | None = Field(None, description="Docs site start URL, not set for codebase")
+    version: int = Field(0, description="Published index version, increased by every update")
+    next_version: int = Field(0, description="Last reserved or published version")
+    pending: list[int] = Field(default_factory=list, description="Versions of pending updates")
+    model: str = Field(description="Embeddings model")
+    updated: datetime.datetime = Field(description="Last update time")
+
+    @classmethod
+    async def create_indexes(cls) -> None:
+        """Create indexes for the model."""
+
+        try:
+            await cls.collection().drop_index("project_unique_index")
+        except pymongo.errors.OperationFailure:
+            pass
+
+        await cls.collection().create_index(
+            [("project", pymongo.ASCENDING), ("site", pymongo.ASCENDING)],
+            unique=True,
+            name="project_site_unique_index",
+        )
+
+    @classmethod
+    async def current(cls, project_id: str, site: str | None = None) -> Self | None:
+        return await cls.one(
+            add_query={"project": bson.ObjectId(project_id), "site": site}, required=False
+        )
+
+    @classmethod
+    async def sites(cls, project_id: str) -> list[str]:
+        """Start URLs of indexed docs sites of the project."""
+
+        return await cls.collection().distinct(
+            "site", {"project": bson.ObjectId(project_id), "site": {"$ne": None}}
+        )
+
+    def chunks_query(self) -> dict[str, Any]:
+        """Query of chunks in the index version."""
+
+        return {
+            "project": bson.ObjectId(self.project),
+            "site": self.site,
+            "version": {"$not": {"$gt": self.version}, "$nin": self.pending},
+            "$or": [
+                {"removed": None},
+                {"removed": {"$gt": self.version}},
+                {"removed": {"$in": self.pending}},
+            ],
+        }
+
+    @staticmethod
+    def next_version_stage() -> dict[str, Any]:
+        return {
+            "$set": {
+                "next_version": {
+                    "$add": [
+                        {
+                            "$max": [
+                                {"$ifNull": ["$next_version", 0]},
+                                {"$ifNull": ["$version", 0]},
+                            ]
+                        },
+                        1,
+                    ]
+                },
+            },
+        }
+
+    @classmethod
+    async def reserve(cls, project_id: str, model: str, site: str | None = None) -> int:
+        """Reserve version of an update, its chunks are not searched until it is published."""
+
+        document = await cls.collection().find_one_and_update(
+            {"project": bson.ObjectId(project_id), "site": site},
+            [
+                cls.next_version_stage(),
+                {
+                    "$set": {
+                        "pending": {
+                            "$concatArrays": [{"$ifNull": ["$pending", []]}, ["$next_version"]]
+                        },
+                        "version": {"$ifNull": ["$version", 0]},
+                        "model": {"$ifNull": ["$model", model]},
+                        "updated": {"$ifNull": ["$updated", datetime.datetime.now(utc)]},
+                    },
+                },
+            ],
+            upsert=True,
+            return_document=pymongo.ReturnDocument.AFTER,
+        )
+
+        return document["next_version"]
+
+    @classmethod
+    async def publish(
+        cls, project_id: str, version: int, model: str, site: str | None = None
+    ) -> Self:
+        """Publish the reserved version, the index gets a new version including its chunks."""
+
+        document = await cls.collection().find_one_and_update(
+            {"project": bson.ObjectId(project_id), "site": site},
+            [
+                cls.next_version_stage(),
+                {
+                    "$set": {
+                        "version": "$next_version",
+                        "pending": {
+                            "$filter": {
+                                "input": "$pending",
+                                "cond": {"$ne": ["$$this", version]},
+                            }
+                        },
+                        "model": model,
+                        "updated": datetime.datetime.now(utc),
+                    },
+                },
+            ],
+            return_document=pymongo.ReturnDocument.AFTER,
+        )
+
+        return cls.model_validate(document)
+
+    @classmethod
+    async def abort(cls, project_id: str, version: int, site: str | None = None) -> None:
+        """Forget the reserved version of a failed update."""
+
+        await cls.collection().update_one(
+            {"project": bson.ObjectId(project_id), "site": site}, {"$pull": {"pending": version}}
+        )
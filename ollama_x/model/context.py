@@ -0,0 +1,86 @@
+import datetime
+import sys
+from array import array
+from typing import Self
+
+import bson
+import pymongo
+from pydantic import Field
+from pydantic_mongo_document import ObjectId
+from pydantic_mongo_document.document.asyncio import Document
+
+from ollama_x.config import config
+
+
+def pack_tokens(tokens: list[int]) -> bytes:
+    """Pack token IDs into little-endian int32 array."""
+
+    packed = array("i", tokens)
+
+    if sys.byteorder == "big":
+        packed.byteswap()
+
+    return packed.tobytes()
+
+
+def unpack_tokens(data: bytes) -> list[int]:
+    """Unpack token IDs packed by `pack_tokens`."""
+
+    packed = array("i")
+    packed.frombytes(data)
+
+    if sys.byteorder == "big":
+        packed.byteswap()
+
+    return packed.tolist()
+
+
+class GenerateContextNotFound(Document.NotFoundError):
+    def __init__(self, message: str | None = None) -> None:
+        super().__init__(message or "Context not found")
+
+
+class GenerateContext(Document):
+    """Context of /api/generate response stored under an opaque handle."""
+
+    __replica__ = "default"
+    __database__ = "ollama_x"
+    __collection__ = "generate_contexts"
+
+    user: ObjectId = Field(description="User ID")
+    tokens: bytes = Field(description="Packed context token IDs")
+    expires_after: datetime.datetime = Field(description="Context expiration time")
+
+    NotFoundError = GenerateContextNotFound
+
+    @classmethod
+    async def create_indexes(cls) -> None:
+        """Create indexes for the model."""
+
+        await cls.collection().create_index(
+            [("expires_after", pymongo.ASCENDING)],
+            expireAfterSeconds=1,
+            name="expires_after_index",
+        )
+
+    @classmethod
+    async def store(cls, user_id: str, tokens: list[int]) -> Self:
+        """Store context tokens, ID of the document is the handle."""
+
+        return await cls(
+            user=user_id,
+            tokens=pack_tokens(tokens),
+            expires_after=datetime.datetime.now()
+            + datetime.timedelta(seconds=config.context_handle_ttl),
+        ).insert()
+
+    @classmethod
+    async def expand(cls, user_id: str, handle: str) -> list[int]:
+        """Get context tokens stored under the handle by the user."""
+
+        if not bson.ObjectId.is_valid(handle):
+            raise cls.NotFoundError()
+
+        context = await cls.one(handle, add_query={"user": user_id})
+
+        return unpack_tokens(context.tokens)
@@ -10,6 +10,7 @@ from pydantic_mongo_document.cursor import Cursor
 from pydantic_mongo_document.document.asyncio import Document
 
 from ollama_x.model import exceptions
+from ollama_x.model.ratelimit import RateLimits
 
 if typing.TYPE_CHECKING:
     from ollama_x.model.user import User
@@ -265,6 +266,14 @@ class ContinueDevProject(Document):
 
     invite_id: str = Field(default_factory=lambda: os.urandom(10).hex(), description="Invite ID")
 
+    limits: RateLimits | None = Field(None, description="Rate limits of the project")
+
+    semantic_cache: bool = Field(
+        False, description="Chat answers are shared between members by question similarity"
+    )
+
+    version: int = Field(0, description="Config version, increased by every config edit")
+
     NotFoundError = ProjectNotFound
     DuplicateKeyError = exceptions.DuplicateKeyError
 
@@ -302,6 +311,25 @@ class ContinueDevProject(Document):
 
         await self.commit_changes(fields=["users"])
 
+    async def commit_config(self) -> None:
+        """Save edited config as a new version.
+
+        Version is incremented in the database, concurrent edits never share it.
+        """
+
+        data = self.encoder.encode_dict(
+            self.model_dump(by_alias=True, exclude_none=True), reveal_secrets=True
+        )
+
+        document = await self.collection().find_one_and_update(
+            self.encoder.encode_dict({self.primary_key_field_name: self.primary_key}),
+            {"$set": {"config": data["config"]}, "$inc": {"version": 1}},
+            projection={"version": 1},
+            return_document=pymongo.ReturnDocument.AFTER,
+        )
+
+        self.version = document["version"]
+
     async def reset_invite_id(self):
         """Set new invite id."""
 
@@ -322,7 +350,7 @@ class ContinueDevProject(Document):
     ) -> Self:
         """Personalize project with auth info."""
 
-        project = self.model_copy()
+        project = self.model_copy(deep=True)
 
         auth_headers = {
             "Authorization": f"Bearer {user.key.get_secret_value()}",
@@ -0,0 +1,75 @@
+import datetime
+from collections.abc import Mapping
+from typing import ClassVar
+
+import pymongo
+from pydantic import Field
+from pydantic_mongo_document.document.asyncio import Document
+from pytz import utc
+
+
+class ModelDemand(Document):
+    """Number of requests per model in a minute bucket."""
+
+    __replica__ = "default"
+    __database__ = "ollama_x"
+    __collection__ = "model_demand"
+
+    model: str = Field(description="Model name")
+    bucket: datetime.datetime = Field(description="Minute bucket start")
+    requests: int = Field(0, description="Number of requests")
+
+    RETENTION: ClassVar[datetime.timedelta] = datetime.timedelta(hours=1)
+
+    @classmethod
+    async def create_indexes(cls) -> None:
+        """Create indexes for the model."""
+
+        await cls.collection().create_index(
+            [("model", pymongo.ASCENDING), ("bucket", pymongo.ASCENDING)],
+            unique=True,
+            name="model_bucket_unique_index",
+        )
+
+        await cls.collection().create_index(
+            [("bucket", pymongo.ASCENDING)],
+            expireAfterSeconds=int(cls.RETENTION.total_seconds()),
+            name="bucket_ttl_index",
+        )
+
+    @staticmethod
+    def current_bucket() -> datetime.datetime:
+        return datetime.datetime.now(utc).replace(second=0, microsecond=0)
+
+    @classmethod
+    async def add(cls, counts: Mapping[str, int]) -> None:
+        """Add request counts to the current bucket in one bulk write."""
+
+        bucket = cls.current_bucket()
+
+        await cls.collection().bulk_write(
+            [
+                pymongo.UpdateOne(
+                    {"model": model, "bucket": bucket},
+                    {"$inc": {"requests": requests}},
+                    upsert=True,
+                )
+                for model, requests in counts.items()
+            ],
+            ordered=False,
+        )
+
+    @classmethod
+    async def rates(cls, window: datetime.timedelta) -> dict[str, float]:
+        """Get requests per minute for each model over the window."""
+
+        cursor = await cls.collection().aggregate(
+            [
+                {"$match": {"bucket": {"$gte": datetime.datetime.now(utc) - window}}},
+                {"$group": {"_id": "$model", "requests": {"$sum": "$requests"}}},
+            ]
+        )
+
+        minutes = window.total_seconds() / 60
+
+        return {item["_id"]: item["requests"] / minutes async for item in cursor}
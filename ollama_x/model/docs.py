@@ -0,0 +1,71 @@
+import datetime
+from collections.abc import Iterable
+from typing import Self
+
+import bson
+import pymongo
+from pydantic import Field
+from pydantic_mongo_document import ObjectId
+from pydantic_mongo_document.cursor import Cursor
+from pydantic_mongo_document.document.asyncio import Document
+
+
+class DocsPage(Document):
+    """Crawled page of continue.dev project docs site."""
+
+    __replica__ = "default"
+    __database__ = "ollama_x"
+    __collection__ = "docs_pages"
+
+    project: ObjectId = Field(description="continue.dev project ID")
+    site: str = Field(description="Docs site start URL")
+    url: str = Field(description="Page URL")
+    title: str | None = Field(None, description="Page title")
+    hash: str = Field(description="Hash of the page text")
+    links: list[str] = Field(default_factory=list, description="Links to other pages of the site")
+    etag: str | None = Field(None, description="ETag of the page response")
+    last_modified: str | None = Field(None, description="Last-Modified of the page response")
+    fetched: datetime.datetime = Field(description="Last fetch time")
+
+    @classmethod
+    async def create_indexes(cls) -> None:
+        """Create indexes for the model."""
+
+        await cls.collection().create_index(
+            [
+                ("project", pymongo.ASCENDING),
+                ("site", pymongo.ASCENDING),
+                ("url", pymongo.ASCENDING),
+            ],
+            unique=True,
+            name="project_site_url_unique_index",
+        )
+
+    @classmethod
+    def of_site(cls, project_id: str, site: str) -> Cursor[Self]:
+        return cls.all(add_query={"project": bson.ObjectId(project_id), "site": site})
+
+    @classmethod
+    async def save_site(
+        cls, project_id: str, site: str, pages: Iterable["DocsPage"], removed: Iterable[str]
+    ) -> None:
+        """Save crawled pages and remove pages not found anymore in one bulk write."""
+
+        project = bson.ObjectId(project_id)
+        requests = [
+            pymongo.UpdateOne(
+                {"project": project, "site": site, "url": page.url},
+                {"$set": page.model_dump(exclude={"id", "project", "site", "url"})},
+                upsert=True,
+            )
+            for page in pages
+        ]
+
+        removed = list(removed)
+        if removed:
+            requests.append(
+                pymongo.DeleteMany({"project": project, "site": site, "url": {"$in": removed}})
+            )
+
+        if requests:
+            await cls.collection().bulk_write(requests, ordered=False)
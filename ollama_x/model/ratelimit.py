@@ -0,0 +1,86 @@
+import datetime
+from collections.abc import Mapping
+from typing import ClassVar
+
+import pymongo
+from pydantic import BaseModel, Field
+from pydantic_mongo_document.document.asyncio import Document
+from pytz import utc
+
+
+class RateLimits(BaseModel):
+    """Rate limits of a user or a project, unset limits are not enforced."""
+
+    requests_per_second: float | None = Field(
+        None,
+        description="Maximum requests per second",
+        gt=0,
+    )
+    tokens_per_minute: int | None = Field(
+        None,
+        description="Maximum prompt and completion tokens per minute",
+        gt=0,
+    )
+
+
+class RateLimitUsage(Document):
+    """Usage counted by a single app worker since its start."""
+
+    __replica__ = "default"
+    __database__ = "ollama_x"
+    __collection__ = "rate_limit_usage"
+
+    key: str = Field(description="Rate limited user or project")
+    worker: str = Field(description="App worker ID")
+    requests: float = Field(0, description="Number of requests")
+    tokens: float = Field(0, description="Number of prompt and completion tokens")
+    updated: datetime.datetime = Field(description="Last update time")
+
+    RETENTION: ClassVar[datetime.timedelta] = datetime.timedelta(minutes=10)
+
+    @classmethod
+    async def create_indexes(cls) -> None:
+        """Create indexes for the model."""
+
+        await cls.collection().create_index(
+            [("key", pymongo.ASCENDING), ("worker", pymongo.ASCENDING)],
+            unique=True,
+            name="key_worker_unique_index",
+        )
+
+        await cls.collection().create_index(
+            [("updated", pymongo.ASCENDING)],
+            expireAfterSeconds=int(cls.RETENTION.total_seconds()),
+            name="updated_ttl_index",
+        )
+
+    @classmethod
+    async def publish(cls, worker: str, usage: Mapping[str, tuple[float, float]]) -> None:
+        """Save total requests and tokens of the worker per key in one bulk write."""
+
+        updated = datetime.datetime.now(utc)
+
+        await cls.collection().bulk_write(
+            [
+                pymongo.UpdateOne(
+                    {"key": key, "worker": worker},
+                    {"$set": {"requests": requests, "tokens": tokens, "updated": updated}},
+                    upsert=True,
+                )
+                for key, (requests, tokens) in usage.items()
+            ],
+            ordered=False,
+        )
+
+    @classmethod
+    async def updated_by_others(
+        cls, worker: str, since: datetime.datetime
+    ) -> list[dict[str, float | str]]:
+        """Get usage of other workers updated since the time."""
+
+        cursor = cls.collection().find(
+            {"worker": {"$ne": worker}, "updated": {"$gte": since}},
+            {"_id": 0, "key": 1, "worker": 1, "requests": 1, "tokens": 1},
+        )
+
+        return [usage async for usage in cursor]
@@ -0,0 +1,123 @@
+import datetime
+from typing import ClassVar, Literal, Self
+
+import bson
+import pymongo
+from pydantic import BaseModel, Field
+from pydantic_mongo_document.cursor import Cursor
+from pydantic_mongo_document.document.asyncio import Document
+from pytz import utc
+
+from ollama_x.model import exceptions
+
+
+class RolloutNotFound(Document.NotFoundError):
+    def __init__(self, message: str | None = None) -> None:
+        super().__init__(message or "Rollout not found")
+
+
+class RolloutServer(BaseModel):
+    """Rollout progress on a single server."""
+
+    server_id: str = Field(description="Server ID")
+    url: str = Field(description="Server URL")
+    status: Literal["pending", "pulling", "ready", "failed", "cancelled"] = Field(
+        "pending",
+        description="Pull status",
+    )
+    completed: int = Field(0, description="Downloaded bytes")
+    total: int = Field(0, description="Total bytes")
+    digest: str | None = Field(None, description="Pulled model digest")
+    error: str | None = Field(None, description="Pull error")
+
+
+class ModelRollout(Document):
+    """Rollout of a model version to a set of servers."""
+
+    __replica__ = "default"
+    __database__ = "ollama_x"
+    __collection__ = "model_rollouts"
+
+    DuplicateKeyError = exceptions.DuplicateKeyError
+    NotFoundError = RolloutNotFound
+
+    ACTIVE_STATUSES: ClassVar[tuple[str, ...]] = ("running", "cut_over")
+
+    model: str = Field(description="Model name")
+    source: str = Field(description="Name the model is pulled by")
+    min_ready: int = Field(description="Ready replicas required to cut routing over")
+    status: Literal["running", "cut_over", "completed", "failed", "cancelled"] = Field(
+        "running",
+        description="Rollout status",
+    )
+    servers: list[RolloutServer] = Field(default_factory=list, description="Servers")
+    created_at: datetime.datetime = Field(
+        default_factory=lambda: datetime.datetime.now(utc),
+        description="Creation time",
+    )
+    cut_over_at: datetime.datetime | None = Field(None, description="Cut over time")
+    finished_at: datetime.datetime | None = Field(None, description="Finish time")
+
+    @classmethod
+    async def create_indexes(cls) -> None:
+        """Create indexes for the model."""
+
+        await cls.collection().create_index(
+            [("model", pymongo.ASCENDING)],
+            unique=True,
+            partialFilterExpression={"status": {"$in": list(cls.ACTIVE_STATUSES)}},
+            name="active_model_unique_index",
+        )
+
+    @property
+    def ready(self) -> int:
+        return sum(server.status == "ready" for server in self.servers)
+
+    @property
+    def digest(self) -> str | None:
+        """Digest of the new model version."""
+
+        return next((server.digest for server in self.servers if server.digest), None)
+
+    @classmethod
+    def all_active(cls) -> Cursor[Self]:
+        return cls.all(add_query={"status": {"$in": list(cls.ACTIVE_STATUSES)}})
+
+    async def save_progress(self) -> bool:
+        """Save status and progress unless the rollout is not active anymore, e.g. cancelled."""
+
+        result = await self.collection().update_one(
+            {"_id": bson.ObjectId(self.id), "status": {"$in": list(self.ACTIVE_STATUSES)}},
+            {
+                "$set": self.model_dump(
+                    include={"status", "servers", "cut_over_at", "finished_at"}
+                ),
+            },
+        )
+
+        return result.matched_count > 0
+
+    @classmethod
+    async def cancel(cls, rollout_id: str) -> Self:
+        """Cancel active rollout, its pending and pulling servers are cancelled too."""
+
+        if not bson.ObjectId.is_valid(rollout_id):
+            raise cls.NotFoundError()
+
+        document = await cls.collection().find_one_and_update(
+            {"_id": bson.ObjectId(rollout_id), "status": {"$in": list(cls.ACTIVE_STATUSES)}},
+            {
+                "$set": {
+                    "status": "cancelled",
+                    "finished_at": datetime.datetime.now(utc),
+                    "servers.$[server].status": "cancelled",
+                },
+            },
+            array_filters=[{"server.status": {"$in": ["pending", "pulling"]}}],
+            return_document=pymongo.ReturnDocument.AFTER,
+        )
+
+        if document is None:
+            return await cls.one(rollout_id)
+
+        return cls.model_validate(document)
@@ -0,0 +1,106 @@
+import datetime
+from typing import Self
+
+import pymongo
+import pymongo.errors
+from pydantic import Field
+from pydantic_mongo_document.cursor import Cursor
+from pydantic_mongo_document.document.asyncio import Document
+from pytz import utc
+
+from ollama_x.model import exceptions
+
+
+class SchedulerReplica(Document):
+    """Running scheduler replica."""
+
+    __replica__ = "default"
+    __database__ = "ollama_x"
+    __collection__ = "scheduler_replicas"
+
+    id: str = Field(description="Replica ID", alias="_id")
+    expires_at: datetime.datetime = Field(description="Replica heartbeat expiration time")
+
+    DuplicateKeyError = exceptions.DuplicateKeyError
+
+    @classmethod
+    async def create_indexes(cls) -> None:
+        """Create indexes for the model."""
+
+        await cls.collection().create_index(
+            [("expires_at", pymongo.ASCENDING)],
+            expireAfterSeconds=0,
+            name="expires_at_index",
+        )
+
+    @classmethod
+    async def heartbeat(cls, replica_id: str, ttl: int) -> None:
+        """Register replica or extend its heartbeat."""
+
+        await cls.collection().update_one(
+            {"_id": replica_id},
+            {
+                "$set": {
+                    "expires_at": datetime.datetime.now(utc) + datetime.timedelta(seconds=ttl),
+                }
+            },
+            upsert=True,
+        )
+
+    @classmethod
+    def all_alive(cls) -> Cursor[Self]:
+        """Find all replicas with a valid heartbeat."""
+
+        return cls.all(add_query={"expires_at": {"$gt": datetime.datetime.now(utc)}})
+
+    @classmethod
+    async def resign(cls, replica_id: str) -> None:
+        """Remove replica so other replicas take over its work immediately."""
+
+        await cls.collection().delete_one({"_id": replica_id})
+
+
+class SchedulerLease(Document):
+    """Lease held by a single scheduler replica."""
+
+    __replica__ = "default"
+    __database__ = "ollama_x"
+    __collection__ = "scheduler_leases"
+
+    id: str = Field(description="Lease name", alias="_id")
+    holder: str = Field(description="Replica ID holding the lease")
+    expires_at: datetime.datetime = Field(description="Lease expiration time")
+
+    DuplicateKeyError = exceptions.DuplicateKeyError
+
+    @classmethod
+    async def acquire(cls, name: str, holder: str, ttl: int) -> bool:
+        """Acquire or renew lease. Returns `True` if holder owns the lease."""
+
+        now = datetime.datetime.now(utc)
+
+        try:
+            await cls.collection().find_one_and_update(
+                {
+                    "_id": name,
+                    "$or": [{"holder": holder}, {"expires_at": {"$lte": now}}],
+                },
+                {
+                    "$set": {
+                        "holder": holder,
+                        "expires_at": now + datetime.timedelta(seconds=ttl),
+                    }
+                },
+                upsert=True,
+            )
+        except pymongo.errors.DuplicateKeyError:
+            # Lease is held by another replica and is not expired yet.
+            return False
+
+        return True
+
+    @classmethod
+    async def release(cls, name: str, holder: str) -> None:
+        """Release lease if it is held by the holder."""
+
+        await cls.collection().delete_one({"_id": name, "holder": holder})
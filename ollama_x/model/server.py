@@ -1,6 +1,7 @@
 import datetime
+import re
 from collections.abc import AsyncIterable
-from typing import Annotated, Any, Self
+from typing import Annotated, Any, ClassVar, Self
 
 import pymongo
 from pydantic import AnyHttpUrl, BaseModel, Field
@@ -32,6 +33,24 @@ class APIServer(Document, ServerBase):
     DuplicateKeyError = exceptions.DuplicateKeyError
     NotFoundError = ServerNotFound
 
+    ACTIVE_TIMEOUT: ClassVar[datetime.timedelta] = datetime.timedelta(seconds=20)
+
+    SETTINGS_FIELDS: ClassVar[tuple[str, ...]] = (
+        "url",
+        "vram_capacity",
+        "pinned_models",
+        "allowed_models",
+    )
+    """Fields edited by admins, all other fields are updated by probes."""
+
+    PROBE_FIELDS: ClassVar[tuple[str, ...]] = (
+        "last_alive",
+        "last_update",
+        "models",
+        "running_models",
+        "vram_observed",
+    )
+
     last_update: datetime.datetime = Field(
         default=datetime.datetime(1970, 1, 1),
         description="Last update",
@@ -52,10 +71,34 @@ class APIServer(Document, ServerBase):
         description="Running models",
     )
 
+    vram_capacity: int | None = Field(
+        None,
+        description="VRAM available for models in bytes",
+    )
+
+    vram_observed: int = Field(
+        0,
+        description="Maximum VRAM used by loaded models seen so far in bytes",
+    )
+
+    pinned_models: list[str] = Field(
+        default_factory=list,
+        description="Models which are always kept loaded",
+    )
+
+    allowed_models: list[str] | None = Field(
+        None,
+        description="Models which may be loaded by placement planner, any if not set",
+    )
+
     @property
     def ollama_client(self) -> "OllamaClient":
         return OllamaClient(self.url)
 
+    @property
+    def vram_used(self) -> int:
+        return sum(model.get("size_vram", 0) for model in self.running_models)
+
     @classmethod
     async def create_indexes(cls) -> None:
         await cls.collection().create_index([("url", pymongo.ASCENDING)], unique=True)
@@ -69,24 +112,67 @@ class APIServer(Document, ServerBase):
             [("running_models.expires_at", pymongo.ASCENDING)],
         )
 
+    @property
+    def is_active(self) -> bool:
+        """Check if server responded recently."""
+
+        last_alive = self.last_alive
+        if last_alive.tzinfo is None:
+            last_alive = last_alive.replace(tzinfo=utc)
+
+        return last_alive >= datetime.datetime.now(utc) - self.ACTIVE_TIMEOUT
+
+    @staticmethod
+    def model_regex(model_name: str) -> str:
+        """Build regex matching model name with optional `latest` version."""
+
+        model, *version = model_name.split(":", 1)
+        if not version:
+            version_regex = "(:latest)?"
+        else:
+            version_regex = rf":{version[0]}"
+
+        return rf"{model}{version_regex}"
+
+    def has_model(self, model_name: str) -> bool:
+        """Check if model is available or running on the server."""
+
+        model_regex = self.model_regex(model_name)
+
+        return any(re.search(model_regex, model["name"]) for model in self.models) or any(
+            re.search(model_regex, model["model"]) for model in self.running_models
+        )
+
+    def pulled_model(self, model_name: str) -> dict[str, Any] | None:
+        """Find model pulled to the server by its exact name."""
+
+        for model in self.models:
+            if model_name in (model.get("model"), model.get("name")):
+                return model
+
+        return None
+
+    def running_model(self, model_name: str) -> dict[str, Any] | None:
+        """Find model loaded on the server by its exact name."""
+
+        for model in self.running_models:
+            if model_name in (model.get("model"), model.get("name")):
+                return model
+
+        return None
+
     @classmethod
     def all_active(cls, model_name: str = None) -> AsyncIterable[Self]:
         """Find all active servers suitable for the model."""
 
         query = {
             "last_alive": {
-                "$gte": datetime.datetime.now(utc) - datetime.timedelta(seconds=20),
+                "$gte": datetime.datetime.now(utc) - cls.ACTIVE_TIMEOUT,
             },
         }
 
         if model_name is not None:
-            model, *version = model_name.split(":", 1)
-            if not version:
-                version_regex = "(:latest)?"
-            else:
-                version_regex = rf":{version}"
-
-            model_regex = rf"{model}{version_regex}"
+            model_regex = cls.model_regex(model_name)
 
             query["$or"] = [
                 {"models.name": {"$regex": model_regex}},
@@ -95,6 +181,12 @@ class APIServer(Document, ServerBase):
 
         return cls.all(add_query=query)
 
+    @classmethod
+    def probe_results(cls) -> AsyncIterable[dict[str, Any]]:
+        """Find probe fields of all servers, without validating whole documents."""
+
+        return cls.collection().find({}, {field: 1 for field in cls.PROBE_FIELDS})
+
     @classmethod
     async def new(cls, base: ServerBase):
         """Create new server."""
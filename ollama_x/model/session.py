@@ -1,7 +1,11 @@
 import datetime
+import hashlib
+import json
 from typing import Any, Self
 
+import bson
 import pymongo
+import pymongo.errors
 from pydantic import Field
 from pydantic_mongo_document import ObjectId
 from pydantic_mongo_document.document.asyncio import Document
@@ -9,6 +13,46 @@ from pydantic_mongo_document.document.asyncio import Document
 from ollama_x.model import exceptions
 
 
+DIGEST_SIZE = 16
+
+
+def extend_digest(digest: str | None, message: dict[str, Any]) -> str:
+    """Extend rolling conversation digest with the next message."""
+
+    canonical = {
+        key: message[key] for key in ("role", "content", "images", "tool_calls") if message.get(key)
+    }
+
+    hasher = hashlib.blake2b(bytes.fromhex(digest) if digest else b"", digest_size=DIGEST_SIZE)
+    hasher.update(json.dumps(canonical, sort_keys=True, separators=(",", ":")).encode())
+
+    return hasher.hexdigest()
+
+
+def conversation_digests(messages: list[dict[str, Any]]) -> list[str]:
+    """Digests of every conversation prefix, `i`-th digest covers `messages[: i + 1]`."""
+
+    digests = []
+    digest = None
+
+    for message in messages:
+        digest = extend_digest(digest, message)
+        digests.append(digest)
+
+    return digests
+
+
+def stored_versions(version: int) -> list[int | None]:
+    """Values of the stored version field, sessions saved before versioning have none."""
+
+    return [version] if version else [0, None]
+
+
+class SessionNotFound(Document.NotFoundError):
+    def __init__(self, message: str | None = None) -> None:
+        super().__init__(message or "Session not found")
+
+
 class Session(Document):
     """Ollama chat session."""
 
@@ -18,21 +62,29 @@ class Session(Document):
 
     user: ObjectId = Field(description="User ID")
     messages: list[dict[str, Any]] | None = Field(None, description="Chat messages")
+    digest: str | None = Field(None, description="Rolling digest of chat messages")
     context: dict[str, Any] | None = Field(None, description="Generate context")
+    version: int = Field(0, description="Number of saves of chat messages")
     expires_after: datetime.datetime = Field(
         description="Session expiration time",
         default_factory=lambda: datetime.datetime.now() + datetime.timedelta(seconds=3600),
     )
 
     DuplicateKeyError = exceptions.DuplicateKeyError
+    NotFoundError = SessionNotFound
 
     @classmethod
     async def create_indexes(cls) -> None:
         """Create indexes for the model."""
 
+        try:
+            await cls.collection().drop_index("user_messages_unique_index")
+        except pymongo.errors.OperationFailure:
+            pass
+
         await cls.collection().create_index(
-            [("user", pymongo.ASCENDING), ("messages", pymongo.ASCENDING)],
-            name="user_messages_unique_index",
+            [("user", pymongo.ASCENDING), ("digest", pymongo.ASCENDING)],
+            name="user_digest_index",
         )
 
         await cls.collection().create_index(
@@ -45,32 +97,124 @@ class Session(Document):
     async def find_or_create(
         cls,
         user_id: str,
-        messages: list[str] | None = None,
+        messages: list[dict[str, Any]] | None = None,
         context: dict[str, Any] | None = None,
     ) -> Self:
-        """Find or create new session."""
+        """Find or create new session.
+
+        Chat sessions are found by digest of the conversation the messages continue:
+        all messages but the last one, or all but the last two if the assistant
+        reply was never added to the session.
+        """
+
+        if not messages:
+            return await cls.find_or_create_by_context(user_id, context)
+
+        digests = conversation_digests(messages)
+        digest = digests[-1]
+
+        candidates = [digest]
+
+        if len(messages) > 1:
+            candidates.append(digests[-2])
+
+        if len(messages) > 2 and messages[-2].get("role") == "assistant":
+            candidates.append(digests[-3])
+
+        session = await cls.one(
+            add_query={"user": user_id, "digest": {"$in": candidates}},
+            required=False,
+        )
+
+        if not session:
+            return await cls(
+                user=user_id, messages=messages, digest=digest, context=context
+            ).insert()
+
+        if session.digest != digest:
+            session.messages = messages
+            session.digest = digest
+            session.expires_after = datetime.datetime.now() + datetime.timedelta(seconds=3600)
+            session.version += 1
 
-        query = {"user": user_id}
+            await session.commit_changes(fields=["messages", "digest", "expires_after", "version"])
+
+        return session
+
+    @classmethod
+    async def find_or_create_by_context(
+        cls,
+        user_id: str,
+        context: dict[str, Any] | None = None,
+    ) -> Self:
+        """Find or create session without messages."""
 
-        if messages is not None:
-            query["messages"] = messages
+        query = {"user": user_id, "digest": None}
 
         if context is not None:
             query["context"] = context
 
         session = await cls.one(add_query=query, required=False)
         if not session:
-            session = await cls(user=user_id, messages=messages, context=context).insert()
+            session = await cls(user=user_id, context=context).insert()
 
         return session
 
     async def add_message(self, message: dict[str, Any]) -> None:
         """Add message to session."""
 
-        self.messages.append(message)
+        self.extend([message])
+        self.version += 1
+
+        await self.commit_changes(fields=["messages", "digest", "expires_after", "version"])
+
+    def extend(self, messages: list[dict[str, Any]]) -> None:
+        """Append messages without saving the session."""
+
+        self.messages = [*(self.messages or []), *messages]
+
+        for message in messages:
+            self.digest = extend_digest(self.digest, message)
+
         self.expires_after = datetime.datetime.now() + datetime.timedelta(seconds=3600)
 
-        await self.commit_changes(fields=["messages", "expires_after"])
+    @classmethod
+    async def changed(cls, session_id: str, version: int) -> Self | None:
+        """Session if its messages were saved since the version was read."""
+
+        return await cls.one(
+            add_query={"_id": session_id, "version": {"$nin": stored_versions(version)}},
+            required=False,
+        )
+
+    async def push_messages(self, messages: list[dict[str, Any]]) -> bool:
+        """Save messages appended since the version was read, unless it was saved since.
+
+        Stored messages are replaced only if all messages are new, sessions
+        created without messages have none stored.
+        """
+
+        update: dict[str, Any] = {
+            "$set": {"digest": self.digest, "expires_after": self.expires_after},
+            "$inc": {"version": 1},
+        }
+
+        if len(messages) == len(self.messages):
+            update["$set"]["messages"] = messages
+        else:
+            update["$push"] = {"messages": {"$each": messages}}
+
+        result = await self.collection().update_one(
+            {"_id": bson.ObjectId(self.id), "version": {"$in": stored_versions(self.version)}},
+            update,
+        )
+
+        if result.matched_count == 0:
+            return False
+
+        self.version += 1
+
+        return True
 
     async def set_context(self, context: list[int]) -> None:
         """Add context to session."""
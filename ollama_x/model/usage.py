@@ -0,0 +1,174 @@
+import datetime
+from collections.abc import Mapping
+from typing import ClassVar, Literal, NamedTuple, Self
+
+import pymongo
+import pymongo.errors
+from pydantic import BaseModel, Field
+from pydantic_mongo_document.cursor import Cursor
+from pydantic_mongo_document.document.asyncio import Document
+
+UsagePeriod = Literal["hour", "day"]
+
+PERIODS: tuple[UsagePeriod, ...] = ("hour", "day")
+
+
+class UsageKey(NamedTuple):
+    """Accounted user, model and project."""
+
+    user: str
+    username: str
+    model: str
+    project: str | None
+
+
+class UsageCounters(BaseModel):
+    """Usage counters."""
+
+    requests: int = Field(0, description="Number of requests")
+    prompt_tokens: int = Field(0, description="Number of prompt tokens")
+    completion_tokens: int = Field(0, description="Number of completion tokens")
+    gpu_seconds: float = Field(0, description="Time spent evaluating prompt and completion")
+
+    def add(self, other: "UsageCounters") -> None:
+        self.requests += other.requests
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.gpu_seconds += other.gpu_seconds
+
+
+def period_start(period: UsagePeriod, time: datetime.datetime) -> datetime.datetime:
+    start = time.replace(minute=0, second=0, microsecond=0)
+
+    return start.replace(hour=0) if period == "day" else start
+
+
+class UsageRecord(Document):
+    """Usage aggregated in memory by an app worker between flushes.
+
+    Stored in a time-series collection, raw records expire after `RETENTION`.
+    """
+
+    __replica__ = "default"
+    __database__ = "ollama_x"
+    __collection__ = "usage_ledger"
+
+    timestamp: datetime.datetime = Field(description="Flush time")
+    meta: dict[str, str | None] = Field(description="User, model and project")
+    counters: UsageCounters = Field(description="Usage counters")
+
+    RETENTION: ClassVar[datetime.timedelta] = datetime.timedelta(days=30)
+
+    @classmethod
+    async def add(cls, time: datetime.datetime, usage: Mapping[UsageKey, UsageCounters]) -> None:
+        """Save usage records in bulk."""
+
+        await cls.collection().insert_many(
+            [
+                {"timestamp": time, "meta": key._asdict(), "counters": counters.model_dump()}
+                for key, counters in usage.items()
+            ],
+            ordered=False,
+        )
+
+    @classmethod
+    async def create_indexes(cls) -> None:
+        """Create time-series collection."""
+
+        try:
+            await cls.collection().database.create_collection(
+                cls.__collection__,
+                timeseries={
+                    "timeField": "timestamp",
+                    "metaField": "meta",
+                    "granularity": "minutes",
+                },
+                expireAfterSeconds=int(cls.RETENTION.total_seconds()),
+            )
+        except pymongo.errors.CollectionInvalid:
+            pass
+
+
+class UsageRollup(Document):
+    """Usage of a user, model and project in an hour or a day."""
+
+    __replica__ = "default"
+    __database__ = "ollama_x"
+    __collection__ = "usage_rollups"
+
+    period: UsagePeriod = Field(description="Rollup period")
+    start: datetime.datetime = Field(description="Period start")
+    user: str = Field(description="User ID")
+    username: str = Field(description="Username")
+    model: str = Field(description="Model name")
+    project: str | None = Field(None, description="continue.dev project ID")
+    counters: UsageCounters = Field(description="Usage counters")
+
+    @classmethod
+    async def create_indexes(cls) -> None:
+        """Create indexes for the model."""
+
+        await cls.collection().create_index(
+            [
+                ("period", pymongo.ASCENDING),
+                ("start", pymongo.ASCENDING),
+                ("user", pymongo.ASCENDING),
+                ("model", pymongo.ASCENDING),
+                ("project", pymongo.ASCENDING),
+            ],
+            unique=True,
+            name="period_start_key_unique_index",
+        )
+
+    @classmethod
+    async def add(cls, time: datetime.datetime, usage: Mapping[UsageKey, UsageCounters]) -> None:
+        """Add usage to hourly and daily rollups in one bulk write."""
+
+        await cls.collection().bulk_write(
+            [
+                pymongo.UpdateOne(
+                    {
+                        "period": period,
+                        "start": period_start(period, time),
+                        "user": key.user,
+                        "model": key.model,
+                        "project": key.project,
+                    },
+                    {
+                        "$set": {"username": key.username},
+                        "$inc": {
+                            f"counters.{name}": value
+                            for name, value in counters.model_dump().items()
+                        },
+                    },
+                    upsert=True,
+                )
+                for key, counters in usage.items()
+                for period in PERIODS
+            ],
+            ordered=False,
+        )
+
+    @classmethod
+    def find(
+        cls,
+        period: UsagePeriod,
+        since: datetime.datetime,
+        until: datetime.datetime | None = None,
+        user: str | None = None,
+        model: str | None = None,
+        project: str | None = None,
+    ) -> Cursor[Self]:
+        """Find rollups of the period started in the time range."""
+
+        query = {"period": period, "start": {"$gte": since}}
+
+        if until is not None:
+            query["start"]["$lt"] = until
+
+        for field, value in (("user", user), ("model", model), ("project", project)):
+            if value is not None:
+                query[field] = value
+
+        # Keys are stored as strings, the document encoder would query IDs as ObjectId.
+        return Cursor[cls](cls, cls.collection().find(query, sort=[("start", pymongo.ASCENDING)]))
@@ -1,4 +1,6 @@
 import base64
+import hashlib
+import hmac
 import random
 import string
 from typing import Annotated, ClassVar, Self
@@ -9,7 +11,15 @@ from pydantic import BaseModel, ConfigDict, Field, SecretStr, StringConstraints
 from pydantic_mongo_document import DocumentNotFound
 from pydantic_mongo_document.document.asyncio import Document
 
+from ollama_x.config import config
 from ollama_x.model import exceptions
+from ollama_x.model.ratelimit import RateLimits
+
+
+def hash_key(key: str) -> str:
+    """Keyed hash of API key, only hashes are stored."""
+
+    return hmac.new(config.key_hash_secret.encode(), key.encode(), hashlib.sha256).hexdigest()
 
 
 class UserNotFound(DocumentNotFound):
@@ -47,7 +57,13 @@ class User(UserBase, Document):
     __database__: ClassVar[str] = "ollama_x"
     __collection__: ClassVar[str] = "users"
 
-    key: SecretStr = Field(description="Users API key")
+    key: SecretStr | None = Field(
+        None,
+        description="Users API key, known only when user is found by it",
+        exclude=True,
+    )
+    key_hash: SecretStr | None = Field(None, description="Keyed hash of users API key")
+    limits: RateLimits | None = Field(None, description="Rate limits of the user")
 
     NotFoundError = UserNotFound
     DuplicateKeyError = exceptions.DuplicateKeyError
@@ -66,9 +82,17 @@ class User(UserBase, Document):
 
     @classmethod
     async def create_indexes(cls) -> None:
+        await cls.hash_stored_keys()
+
+        try:
+            await cls.collection().drop_index("key_1")
+        except pymongo.errors.OperationFailure:
+            pass
+
         await cls.collection().create_index(
-            [("key", pymongo.ASCENDING)],
+            [("key_hash", pymongo.ASCENDING)],
             unique=True,
+            name="key_hash_unique_index",
         )
 
         await cls.collection().create_index(
@@ -76,6 +100,23 @@ class User(UserBase, Document):
             unique=True,
         )
 
+    @classmethod
+    async def hash_stored_keys(cls) -> None:
+        """Replace API keys stored in plain text with their hashes.
+
+        Keys are never hashed with an empty secret, hashes of keys created
+        without it would stop matching once the secret is set.
+        """
+
+        if not config.key_hash_secret:
+            raise RuntimeError("KEY_HASH_SECRET is not set, it is required to hash API keys")
+
+        async for document in cls.collection().find({"key": {"$exists": True}}, {"key": 1}):
+            await cls.collection().update_one(
+                {"_id": document["_id"]},
+                {"$set": {"key_hash": hash_key(document["key"])}, "$unset": {"key": ""}},
+            )
+
     @classmethod
     def generate_key(cls) -> SecretStr:
         """Generate new API key."""
@@ -97,7 +138,8 @@ class User(UserBase, Document):
     ) -> Self:
         """Create new user."""
 
-        user = cls(username=username, key=key or cls.generate_key(), is_admin=is_admin)
+        user = cls(username=username, is_admin=is_admin)
+        user.set_key(SecretStr(key) if key else cls.generate_key())
 
         await user.insert()
 
@@ -113,16 +155,27 @@ class User(UserBase, Document):
         """Find user by its key."""
 
         query = {
-            "key": key,
+            "key_hash": hash_key(key),
         }
 
         if is_admin is not None:
             query["is_admin"] = is_admin
 
-        return await cls.one(add_query=query, required=required)
+        user = await cls.one(add_query=query, required=required)
+
+        if user is not None:
+            user.key = SecretStr(key)
+
+        return user
 
     @classmethod
     async def one_by_username(cls, username: str, required: bool = True) -> Self | None:
         """Find user by username."""
 
         return await User.one(add_query={"username": username}, required=required)
+
+    def set_key(self, key: SecretStr) -> None:
+        """Set new API key and its hash."""
+
+        self.key = key
+        self.key_hash = SecretStr(hash_key(key.get_secret_value()))
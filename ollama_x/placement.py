@@ -0,0 +1,239 @@
+import dataclasses
+import logging
+import math
+from collections import Counter
+from collections.abc import Mapping
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+from ollama_x.model import APIServer
+
+LOG = logging.getLogger(__name__)
+
+DISK_TO_VRAM = 1.2
+"""Estimated VRAM to on-disk size ratio for models never seen loaded."""
+
+TARGET_VALUE = 1e-6
+"""Value of replicas required only by warm targets, placed after demanded ones."""
+
+
+class PlacementAction(BaseModel):
+    """Single model load or unload."""
+
+    server_id: str = Field(description="Server ID")
+    server_url: str = Field(description="Server URL")
+    model: str = Field(description="Model name")
+    action: Literal["load", "unload"] = Field(description="Action")
+    size: int = Field(description="Model VRAM size in bytes")
+    reason: str = Field(description="Reason of the action")
+
+
+class PlacementPlan(BaseModel):
+    """Planned model placement across servers."""
+
+    actions: list[PlacementAction] = Field(default_factory=list, description="Actions")
+    warm_fraction: float = Field(description="Fraction of demand served warm now")
+    planned_warm_fraction: float = Field(
+        description="Fraction of demand served warm after applying the plan"
+    )
+    unplaced: dict[str, int] = Field(
+        default_factory=dict,
+        description="Replicas per model which do not fit anywhere",
+    )
+
+
+@dataclasses.dataclass
+class ServerSlots:
+    """VRAM state of a single server during planning."""
+
+    server: APIServer
+    capacity: int
+    loaded: dict[str, int]
+
+    @property
+    def free(self) -> int:
+        return self.capacity - sum(self.loaded.values())
+
+    def can_load(self, model: str) -> bool:
+        allowed = self.server.allowed_models
+
+        return (
+            model not in self.loaded
+            and (allowed is None or model in allowed or model in self.server.pinned_models)
+            and self.server.pulled_model(model) is not None
+        )
+
+
+def model_sizes(servers: list[APIServer]) -> dict[str, int]:
+    """Estimate VRAM size of every known model.
+
+    Sizes of loaded models are taken from `size_vram`, other models are estimated from
+    their on-disk size.
+    """
+
+    sizes = {}
+
+    for server in servers:
+        for model in server.models:
+            size = int(model.get("size", 0) * DISK_TO_VRAM)
+            sizes[model["model"]] = max(sizes.get(model["model"], 0), size)
+
+    loaded = {}
+
+    for server in servers:
+        for model in server.running_models:
+            loaded[model["model"]] = max(loaded.get(model["model"], 0), model.get("size_vram", 0))
+
+    sizes.update({model: size for model, size in loaded.items() if size})
+
+    return sizes
+
+
+def warm_fraction(
+    warm: Mapping[str, int],
+    rates: Mapping[str, float],
+    desired: Mapping[str, int],
+) -> float:
+    """Fraction of demand served by warm replicas."""
+
+    total = sum(rates.values())
+
+    if not total:
+        return 1.0
+
+    served = sum(
+        rate * min(1.0, warm.get(model, 0) / desired[model])
+        for model, rate in rates.items()
+        if desired.get(model)
+    )
+
+    return served / total
+
+
+def plan_placement(
+    servers: list[APIServer],
+    rates: Mapping[str, float],
+    desired: Mapping[str, int],
+) -> PlacementPlan:
+    """Plan model loads and unloads maximizing the fraction of demand served warm.
+
+    Planning is incremental: loaded models are kept unless their VRAM is needed for
+    replicas of higher value. Value of a replica is the share of its model demand it
+    serves. Pinned models are always loaded and never evicted.
+    """
+
+    sizes = model_sizes(servers)
+
+    slots = []
+    for server in servers:
+        capacity = server.vram_capacity or server.vram_observed
+
+        if not capacity:
+            LOG.debug(f"Skipping {server.url} without known VRAM capacity")
+            continue
+
+        loaded = {model["model"]: model.get("size_vram", 0) for model in server.running_models}
+        slots.append(ServerSlots(server=server, capacity=capacity, loaded=loaded))
+
+    warm = Counter(model for slot in slots for model in slot.loaded)
+    before = warm_fraction(warm, rates, desired)
+
+    def replica_value(model: str, replica: int) -> float:
+        """Value of n-th replica of the model."""
+
+        if replica < 1 or replica > desired.get(model, 0):
+            return 0.0
+
+        return rates.get(model, 0.0) / desired[model] or TARGET_VALUE
+
+    needs: list[tuple[float, str, ServerSlots | None]] = []
+
+    for slot in slots:
+        for model in slot.server.pinned_models:
+            if slot.can_load(model):
+                needs.append((math.inf, model, slot))
+
+    for model, replicas in desired.items():
+        for replica in range(warm[model] + 1, replicas + 1):
+            needs.append((replica_value(model, replica), model, None))
+
+    needs.sort(key=lambda need: need[0] / max(sizes.get(need[1], 1), 1), reverse=True)
+
+    actions = []
+    unplaced = Counter()
+
+    for value, model, target in needs:
+        size = sizes.get(model)
+
+        if not size:
+            unplaced[model] += 1
+            continue
+
+        best: tuple[float, int, ServerSlots, list[str]] | None = None
+
+        for slot in [target] if target is not None else slots:
+            if not slot.can_load(model):
+                continue
+
+            evicted = []
+            free = slot.free
+            evictable = sorted(
+                (loaded for loaded in slot.loaded if loaded not in slot.server.pinned_models),
+                key=lambda loaded: (replica_value(loaded, warm[loaded]), -slot.loaded[loaded]),
+            )
+
+            while free < size and evictable:
+                loaded = evictable.pop(0)
+                evicted.append(loaded)
+                free += slot.loaded[loaded]
+
+            if free < size:
+                continue
+
+            cost = sum(replica_value(loaded, warm[loaded]) for loaded in evicted)
+            if cost >= value:
+                continue
+
+            if best is None or (cost, -(free - size)) < (best[0], -best[1]):
+                best = (cost, free - size, slot, evicted)
+
+        if best is None:
+            unplaced[model] += 1
+            continue
+
+        _, _, slot, evicted = best
+
+        for loaded in evicted:
+            actions.append(
+                PlacementAction(
+                    server_id=slot.server.id,
+                    server_url=str(slot.server.url),
+                    model=loaded,
+                    action="unload",
+                    size=slot.loaded.pop(loaded),
+                    reason=f"make room for `{model}`",
+                )
+            )
+            warm[loaded] -= 1
+
+        slot.loaded[model] = size
+        warm[model] += 1
+
+        actions.append(
+            PlacementAction(
+                server_id=slot.server.id,
+                server_url=str(slot.server.url),
+                model=model,
+                action="load",
+                size=size,
+                reason="pinned" if value == math.inf else f"{rates.get(model, 0.0):.1f} req/min",
+            )
+        )
+
+    return PlacementPlan(
+        actions=actions,
+        warm_fraction=before,
+        planned_warm_fraction=warm_fraction(warm, rates, desired),
+        unplaced=dict(unplaced),
+    )
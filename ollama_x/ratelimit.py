@@ -0,0 +1,200 @@
+import asyncio
+import dataclasses
+import datetime
+import logging
+import os
+import socket
+
+from pytz import utc
+
+from ollama_x.config import config
+from ollama_x.metrics import metrics
+from ollama_x.model.ratelimit import RateLimits, RateLimitUsage
+from ollama_x.throttle import TokenBucket
+
+LOG = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """Request rejected by rate limits."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"Rate limit exceeded, retry after {retry_after:.1f} seconds")
+
+        self.retry_after = retry_after
+
+
+@dataclasses.dataclass(slots=True)
+class Usage:
+    """Token buckets and total usage of a user or a project."""
+
+    limits: RateLimits
+    requests: TokenBucket | None
+    tokens: TokenBucket | None
+    total_requests: float = 0
+    total_tokens: float = 0
+
+    @classmethod
+    def create(cls, limits: RateLimits) -> "Usage":
+        rps, tpm = limits.requests_per_second, limits.tokens_per_minute
+
+        return cls(
+            limits=limits,
+            requests=TokenBucket(rps, max(rps, 1)) if rps else None,
+            tokens=TokenBucket(tpm / 60, tpm) if tpm else None,
+        )
+
+    def delay(self) -> float:
+        """Seconds until the next request is allowed."""
+
+        return max(
+            self.requests.delay(1) if self.requests else 0.0,
+            self.tokens.delay() if self.tokens else 0.0,
+        )
+
+    def add(self, requests: float = 0, tokens: float = 0) -> None:
+        if self.requests and requests:
+            self.requests.debit(requests)
+
+        if self.tokens and tokens:
+            self.tokens.debit(tokens)
+
+
+class RateLimiter:
+    """Per user and per project rate limits enforced by in-memory token buckets.
+
+    Requests are admitted while buckets of all their keys are not in debt.
+    Tokens are known only when the response is done, so they are settled
+    afterwards. Usage of other app workers is synced through Mongo every
+    RATE_LIMIT_SYNC_INTERVAL seconds and taken from local buckets.
+    """
+
+    def __init__(self) -> None:
+        self.worker = f"{socket.gethostname()}-{os.getpid()}"
+        self.usages: dict[str, Usage] = {}
+        self.changed: set[str] = set()
+        self.seen: dict[tuple[str, str], tuple[float, float]] | None = None
+        self.synced: datetime.datetime | None = None
+        self.task: asyncio.Task | None = None
+
+        self.rejected = metrics.counter(
+            "ollama_x_rate_limited_total", "Requests rejected by rate limits"
+        )
+
+    def usage(self, key: str, limits: RateLimits) -> Usage:
+        usage = self.usages.get(key)
+
+        if usage is None or usage.limits != limits:
+            previous = usage
+            usage = self.usages[key] = Usage.create(limits)
+
+            if previous is not None:
+                usage.total_requests = previous.total_requests
+                usage.total_tokens = previous.total_tokens
+
+        return usage
+
+    def acquire(self, limits: dict[str, RateLimits]) -> None:
+        """Count request to every key, raise `RateLimitExceeded` if any key is over limit."""
+
+        usages = {key: self.usage(key, key_limits) for key, key_limits in limits.items()}
+        retry_after = max((usage.delay() for usage in usages.values()), default=0.0)
+
+        if retry_after > 0:
+            self.rejected.inc()
+            raise RateLimitExceeded(retry_after)
+
+        for key, usage in usages.items():
+            usage.add(requests=1)
+            usage.total_requests += 1
+            self.changed.add(key)
+
+    def settle(self, keys: list[str], tokens: int) -> None:
+        """Take prompt and completion tokens of a finished request."""
+
+        for key in keys:
+            usage = self.usages.get(key)
+
+            if usage is not None:
+                usage.add(tokens=tokens)
+                usage.total_tokens += tokens
+                self.changed.add(key)
+
+    async def load_baseline(self) -> None:
+        """Remember totals of other workers published before this worker started.
+
+        Only usage added to them later is taken, totals published later are
+        taken entirely.
+        """
+
+        self.seen = {
+            (other["key"], other["worker"]): (other["requests"], other["tokens"])
+            for other in await RateLimitUsage.updated_by_others(
+                self.worker, datetime.datetime.fromtimestamp(0, utc)
+            )
+        }
+
+    async def sync(self) -> None:
+        """Publish usage of this worker and take usage of others from local buckets."""
+
+        if self.seen is None:
+            await self.load_baseline()
+
+        now = datetime.datetime.now(utc)
+        since = self.synced - datetime.timedelta(seconds=config.rate_limit_sync_interval)
+        changed, self.changed = self.changed, set()
+
+        if changed:
+            try:
+                await RateLimitUsage.publish(
+                    self.worker,
+                    {
+                        key: (self.usages[key].total_requests, self.usages[key].total_tokens)
+                        for key in changed
+                    },
+                )
+            except BaseException:
+                # published with the next sync
+                self.changed |= changed
+                raise
+
+        for other in await RateLimitUsage.updated_by_others(self.worker, since):
+            seen_key = (other["key"], other["worker"])
+            requests, tokens = self.seen.get(seen_key, (0.0, 0.0))
+            self.seen[seen_key] = (other["requests"], other["tokens"])
+
+            if other["requests"] < requests or other["tokens"] < tokens:
+                requests, tokens = 0.0, 0.0
+
+            usage = self.usages.get(other["key"])
+            if usage is not None:
+                usage.add(requests=other["requests"] - requests, tokens=other["tokens"] - tokens)
+
+        self.synced = now
+
+    async def run(self) -> None:
+        try:
+            await self.load_baseline()
+        except Exception as e:
+            LOG.exception(f"Error loading rate limit usage of other workers: {e}")
+
+        while True:
+            await asyncio.sleep(config.rate_limit_sync_interval)
+
+            try:
+                await self.sync()
+            except Exception as e:
+                LOG.exception(f"Error syncing rate limits: {e}")
+
+    def start(self) -> None:
+        self.synced = datetime.datetime.now(utc)
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+
+rate_limiter = RateLimiter()
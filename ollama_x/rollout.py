@@ -0,0 +1,276 @@
+import asyncio
+import datetime
+import json
+import logging
+import time
+
+from pytz import utc
+
+from ollama_x.cache import MISSING, TTLCache, watch_changes
+from ollama_x.client.ollama import OllamaClient
+from ollama_x.config import config
+from ollama_x.model import APIServer, ModelRollout
+from ollama_x.model.rollout import RolloutServer
+
+LOG = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL = 2.0
+"""Minimal interval in seconds between persisted progress updates."""
+
+ROUTES_TTL = 10
+"""Seconds active rollouts are cached for routing without change stream."""
+
+
+def full_model_name(model_name: str) -> str:
+    """Add default `latest` tag to the model name."""
+
+    if ":" in model_name.rsplit("/", 1)[-1]:
+        return model_name
+
+    return f"{model_name}:latest"
+
+
+class Rollouts:
+    """Runs model rollouts and routes requests by their state.
+
+    Rollouts are run by the scheduler leader only. Servers pull the new version
+    in parallel, limited by `ROLLOUT_CONCURRENCY`. Requests are routed to servers
+    with the old version until `min_ready` servers have the new one, then only to
+    servers with the new version. Every app worker reads routing state of active
+    rollouts from Mongo, cached until they change.
+    """
+
+    def __init__(self) -> None:
+        self.semaphore = asyncio.Semaphore(config.rollout_concurrency)
+        self.tasks: dict[str, asyncio.Task] = {}
+        self.routes: TTLCache[None, dict[str, ModelRollout]] = TTLCache("rollouts", 1, ROUTES_TTL)
+        self.watch_task: asyncio.Task | None = None
+
+    @staticmethod
+    def source(model_name: str) -> str:
+        """Name servers pull the model by, through the registry mirror if configured."""
+
+        if not config.rollout_registry:
+            return model_name
+
+        name, tag = OllamaClient.get_model_params(model_name)
+
+        return f"{config.rollout_registry}/{name}:{tag}"
+
+    async def create(
+        self,
+        model_name: str,
+        servers: list[APIServer],
+        min_ready: int,
+    ) -> ModelRollout:
+        """Start rollout of the model to servers."""
+
+        model_name = full_model_name(model_name)
+
+        rollout = ModelRollout(
+            model=model_name,
+            source=self.source(model_name),
+            min_ready=max(1, min(min_ready, len(servers))),
+            servers=[RolloutServer(server_id=server.id, url=str(server.url)) for server in servers],
+        )
+        await rollout.insert()
+
+        self.routes.clear()
+
+        return rollout
+
+    async def reconcile(self) -> None:
+        """Run active rollouts not running yet and stop cancelled ones, leader job."""
+
+        active = {rollout.id: rollout async for rollout in ModelRollout.all_active()}
+
+        for rollout_id, task in list(self.tasks.items()):
+            if rollout_id not in active:
+                task.cancel()
+
+        for rollout_id, rollout in active.items():
+            if rollout_id not in self.tasks:
+                LOG.info(f"Running rollout of `{rollout.model}`")
+                self.start(rollout)
+
+    def start(self, rollout: ModelRollout) -> None:
+        task = self.tasks[rollout.id] = asyncio.create_task(self.run(rollout))
+
+        def forget(done: asyncio.Task) -> None:
+            if self.tasks.get(rollout.id) is done:
+                del self.tasks[rollout.id]
+
+        task.add_done_callback(forget)
+
+    def abandon(self) -> None:
+        """Stop running rollouts when leadership is lost, the next leader resumes them."""
+
+        for task in self.tasks.values():
+            task.cancel()
+
+    async def stop(self) -> None:
+        tasks = list(self.tasks.values())
+
+        self.abandon()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def cancel(self, rollout_id: str) -> ModelRollout:
+        """Cancel rollout. Servers which already pulled the new version keep it.
+
+        Leader stops pulls of the rollout on its next reconciliation.
+        """
+
+        rollout = await ModelRollout.cancel(rollout_id)
+
+        task = self.tasks.get(rollout_id)
+        if task is not None:
+            task.cancel()
+
+        self.routes.clear()
+
+        return rollout
+
+    async def save(self, rollout: ModelRollout) -> None:
+        await rollout.save_progress()
+
+    async def finish(self, rollout: ModelRollout, status: str) -> None:
+        rollout.status = status
+        rollout.finished_at = datetime.datetime.now(utc)
+
+        await self.save(rollout)
+
+        LOG.info(
+            f"Rollout of `{rollout.model}` {status}, "
+            f"{rollout.ready}/{len(rollout.servers)} servers ready"
+        )
+
+    async def run(self, rollout: ModelRollout) -> None:
+        await asyncio.gather(
+            *(self.pull(rollout, server) for server in rollout.servers if server.status != "ready")
+        )
+
+        await self.finish(rollout, "completed" if rollout.ready >= rollout.min_ready else "failed")
+
+    async def pull(self, rollout: ModelRollout, server: RolloutServer) -> None:
+        """Pull new model version to the server."""
+
+        async with self.semaphore:
+            client = OllamaClient(server.url)
+
+            server.status = "pulling"
+            server.error = None
+            await self.save(rollout)
+
+            try:
+                await self.track_pull(rollout, server, client)
+
+                if rollout.source != rollout.model:
+                    async with client.copy_model(rollout.source, rollout.model) as response:
+                        response.raise_for_status()
+
+                    async with client.delete_model(rollout.source):
+                        pass
+
+                server.digest = await self.model_digest(client, rollout.model)
+                server.status = "ready"
+            except asyncio.CancelledError:
+                server.status = "pending"
+                raise
+            except Exception as e:
+                LOG.error(f"Error pulling `{rollout.source}` to {server.url}: {e}")
+                server.status = "failed"
+                server.error = str(e)
+            else:
+                LOG.info(f"Pulled `{rollout.model}` to {server.url}")
+
+            if rollout.status == "running" and rollout.ready >= rollout.min_ready:
+                rollout.status = "cut_over"
+                rollout.cut_over_at = datetime.datetime.now(utc)
+                LOG.info(f"Routing `{rollout.model}` to {rollout.ready} servers with new version")
+
+            await self.save(rollout)
+
+    async def track_pull(
+        self,
+        rollout: ModelRollout,
+        server: RolloutServer,
+        client: OllamaClient,
+    ) -> None:
+        """Pull the model, tracking progress from streamed status lines."""
+
+        layers: dict[str, tuple[int, int]] = {}
+        saved_at = time.monotonic()
+
+        insecure = bool(config.rollout_registry)
+
+        async with client.pull_model(rollout.source, insecure=insecure) as response:
+            response.raise_for_status()
+
+            async for line in response.content:
+                if not line.strip():
+                    continue
+
+                progress = json.loads(line)
+
+                if "error" in progress:
+                    raise RuntimeError(progress["error"])
+
+                if digest := progress.get("digest"):
+                    layers[digest] = (progress.get("completed", 0), progress.get("total", 0))
+
+                    server.completed = sum(completed for completed, _ in layers.values())
+                    server.total = sum(total for _, total in layers.values())
+
+                if time.monotonic() - saved_at > PROGRESS_INTERVAL:
+                    saved_at = time.monotonic()
+                    await self.save(rollout)
+
+    @staticmethod
+    async def model_digest(client: OllamaClient, model_name: str) -> str | None:
+        async with client.list_models() as response:
+            models = (await response.json())["models"]
+
+        for model in models:
+            if model_name in (model.get("model"), model.get("name")):
+                return model.get("digest")
+
+        return None
+
+    async def active(self, model_name: str) -> ModelRollout | None:
+        """Active rollout of the model."""
+
+        routes = self.routes.get(None)
+
+        if routes is MISSING:
+            routes = {rollout.model: rollout async for rollout in ModelRollout.all_active()}
+            self.routes.set(None, routes)
+
+        return routes.get(full_model_name(model_name))
+
+    @staticmethod
+    def route(rollout: ModelRollout, servers: list[APIServer]) -> list[APIServer]:
+        """Choose servers with the model version requests should be routed to."""
+
+        ready = {server.server_id for server in rollout.servers if server.status == "ready"}
+
+        if rollout.status == "cut_over":
+            routed = [server for server in servers if server.id in ready]
+        else:
+            routed = [server for server in servers if server.id not in ready]
+
+        return routed or servers
+
+    def watch(self) -> None:
+        self.watch_task = asyncio.create_task(
+            watch_changes(ModelRollout, lambda _: self.routes.clear(), self.routes.clear)
+        )
+
+    async def stop_watch(self) -> None:
+        if self.watch_task is not None:
+            self.watch_task.cancel()
+            await asyncio.gather(self.watch_task, return_exceptions=True)
+            self.watch_task = None
+
+
+rollouts = Rollouts()
@@ -1,21 +1,31 @@
 import asyncio
 import datetime
 import logging
+from typing import Any
+
+import pymongo.errors
 
 from apscheduler.executors.asyncio import AsyncIOExecutor
-from apscheduler.jobstores.mongodb import MongoDBJobStore
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from pytz import utc
 
+from ollama_x.client.ollama import OllamaClient
 from ollama_x.config import config
+from ollama_x.coordination import Coordinator
+from ollama_x.fleet import fleet
 from ollama_x.model import APIServer, OllamaModel
+from ollama_x.rollout import rollouts
 from ollama_x.startup import STARTUP_TASKS
+from ollama_x.warmer import warm_models
 
 
 LOG = logging.getLogger(__name__)
 
 
-jobstores = {"default": MongoDBJobStore(database="ollama_x", host=config.mongo_uri)}
+# Jobs are derived from shard ownership, so every replica keeps its own in-memory jobs.
+jobstores = {"default": MemoryJobStore()}
 
 
 executors = {
@@ -31,20 +41,18 @@ scheduler = AsyncIOScheduler(
     timezone=utc,
 )
 
+coordinator = Coordinator()
 
-def fake_scheduler() -> AsyncIOScheduler:
-    """Fake scheduler to add jobs from outside."""
-
-    scheduler.state = 1
-    scheduler.wakeup = lambda: None
-
-    return scheduler
+LEADER_JOBS = {"check_running_models", "warm_models", "run_rollouts"}
 
 
 async def check_api(server_id: str) -> None:
     from ollama_x.model.server import APIServer
 
-    server = await APIServer.one(server_id)
+    if not coordinator.owns(server_id):
+        return
+
+    server = fleet.servers.get(server_id) or await APIServer.one(server_id)
 
     try:
         async with server.ollama_client.list_models() as response:
@@ -62,6 +70,8 @@ async def check_api(server_id: str) -> None:
             server.last_update = datetime.datetime.now(utc)
 
             await server.commit_changes(fields=["last_alive", "last_update", "models"])
+
+        fleet.update(server)
     except Exception as e:
         LOG.exception(f"Error checking server {server.url}", e)
 
@@ -69,20 +79,19 @@ async def check_api(server_id: str) -> None:
 async def check_running_models():
     """Check running models on all servers."""
 
-    from ollama_x.model.server import APIServer
-
-    async for server in APIServer.all_active():
+    async for server in fleet.all_active():
         LOG.debug(f"Checking running models for {server.url}")
 
         try:
             async with server.ollama_client.list_running_models() as response:
                 data = await response.json()
                 server.running_models = data["models"]
+                server.vram_observed = max(server.vram_observed, server.vram_used)
         except Exception as e:
             LOG.error(f"Error checking running models for {server.url}: {e}")
             server.running_models = []
         finally:
-            await server.commit_changes(fields=["running_models"])
+            await server.commit_changes(fields=["running_models", "vram_observed"])
 
 
 async def save_models_info(server: APIServer) -> None:
@@ -114,7 +123,7 @@ def generate_job_id(server_id: str) -> str:
 
 
 def add_server_job(server_id: str) -> None:
-    fake_scheduler().add_job(
+    scheduler.add_job(
         check_api,
         "interval",
         id=generate_job_id(server_id),
@@ -124,30 +133,210 @@ def add_server_job(server_id: str) -> None:
 
 
 def delete_server_job(server_id: str) -> None:
-    fake_scheduler().remove_job(generate_job_id(server_id))
+    try:
+        scheduler.remove_job(generate_job_id(server_id))
+    except JobLookupError:
+        pass
 
 
-async def ensure_jobs():
-    from ollama_x.model.server import APIServer
+def add_leader_jobs() -> None:
+    if scheduler.get_job("check_running_models") is None:
+        scheduler.add_job(
+            check_running_models,
+            "interval",
+            id="check_running_models",
+            seconds=config.server_check_interval,
+            next_run_time=datetime.datetime.now(utc) + datetime.timedelta(seconds=10),
+        )
+
+    if scheduler.get_job("run_rollouts") is None:
+        scheduler.add_job(
+            rollouts.reconcile,
+            "interval",
+            id="run_rollouts",
+            seconds=coordinator.renew_interval,
+            max_instances=1,
+            next_run_time=datetime.datetime.now(utc),
+        )
 
-    scheduler.remove_all_jobs()
+    warm = config.warmer_enabled or config.placement_enabled
 
-    async for server in APIServer.all():
+    if warm and scheduler.get_job("warm_models") is None:
         scheduler.add_job(
-            check_api,
+            warm_models,
             "interval",
-            id=generate_job_id(server.id),
-            seconds=config.server_check_interval,
-            args=[server.id],
+            id="warm_models",
+            seconds=config.warm_interval,
+            max_instances=1,
         )
 
-    scheduler.add_job(
-        check_running_models,
-        "interval",
-        id="check_running_models",
-        seconds=config.server_check_interval,
-        next_run_time=datetime.datetime.now(utc) + datetime.timedelta(seconds=10),
-    )
+
+def delete_leader_jobs() -> None:
+    for job_id in LEADER_JOBS:
+        try:
+            scheduler.remove_job(job_id)
+        except JobLookupError:
+            pass
+
+    rollouts.abandon()
+
+
+def ensure_leader_jobs() -> None:
+    """Add or remove fleet-wide jobs according to leadership."""
+
+    if coordinator.is_leader:
+        add_leader_jobs()
+    else:
+        delete_leader_jobs()
+
+
+async def ensure_jobs() -> None:
+    """Align scheduled jobs with servers owned by this replica.
+
+    Only jobs which differ from the desired state are added or removed.
+    """
+
+    from ollama_x.model.server import APIServer
+
+    servers = [server async for server in APIServer.all()]
+    fleet.sync(servers)
+
+    owned = {server.id for server in servers if coordinator.owns(server.id)}
+
+    scheduled = {job.args[0] for job in scheduler.get_jobs() if job.func is check_api}
+
+    for server_id in scheduled - owned:
+        delete_server_job(server_id)
+
+    for server_id in owned - scheduled:
+        add_server_job(server_id)
+
+    ensure_leader_jobs()
+
+
+async def refresh_probes() -> None:
+    """Read probe results of known servers, other changes are streamed."""
+
+    async for probes in APIServer.probe_results():
+        fleet.update_probes(str(probes["_id"]), probes)
+
+
+PROBE_FIELDS = list(APIServer.PROBE_FIELDS)
+
+UPDATED_FIELDS = {
+    "$map": {
+        "input": {"$objectToArray": "$updateDescription.updatedFields"},
+        "in": {"$arrayElemAt": [{"$split": ["$$this.k", "."]}, 0]},
+    }
+}
+"""Top level names of fields set by an update."""
+
+
+class ServerWatcher:
+    """Applies server inserts, updates and deletes from a Mongo change stream.
+
+    Updates of probe fields only are not streamed, otherwise every replica
+    receives every probe of every server. Probe results are read on lease
+    renewal instead.
+    """
+
+    PIPELINE = [
+        {"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}},
+        {
+            "$match": {
+                "$or": [
+                    {"operationType": {"$ne": "update"}},
+                    {"updateDescription.removedFields.0": {"$exists": True}},
+                    {
+                        "$expr": {
+                            "$gt": [
+                                {"$size": {"$setDifference": [UPDATED_FIELDS, PROBE_FIELDS]}},
+                                0,
+                            ]
+                        }
+                    },
+                ]
+            }
+        },
+    ]
+
+    def __init__(self) -> None:
+        self.active: bool = False
+        self.task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self.watch())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+        self.active = False
+
+    def apply(self, change: dict[str, Any]) -> None:
+        """Apply single change to fleet state and jobs."""
+
+        server_id = str(change["documentKey"]["_id"])
+
+        if change["operationType"] == "delete" or change.get("fullDocument") is None:
+            fleet.remove(server_id)
+            delete_server_job(server_id)
+            return
+
+        fleet.update(APIServer.model_validate(change["fullDocument"]))
+
+        if coordinator.owns(server_id) and scheduler.get_job(generate_job_id(server_id)) is None:
+            add_server_job(server_id)
+
+    async def watch(self) -> None:
+        while True:
+            try:
+                async with await APIServer.collection().watch(
+                    self.PIPELINE,
+                    full_document="updateLookup",
+                ) as stream:
+                    self.active = True
+
+                    # Changes made before the stream was opened are not replayed.
+                    await ensure_jobs()
+
+                    async for change in stream:
+                        self.apply(change)
+            except pymongo.errors.OperationFailure as e:
+                LOG.warning(f"Server change stream is not available, polling instead: {e}")
+                self.active = False
+                return
+            except pymongo.errors.PyMongoError as e:
+                LOG.error(f"Server change stream failed: {e}")
+                self.active = False
+                await asyncio.sleep(coordinator.renew_interval)
+
+
+watcher = ServerWatcher()
+
+
+async def coordinate() -> None:
+    """Renew replica leases and rebalance jobs."""
+
+    try:
+        changed = await coordinator.tick()
+    except Exception as e:
+        LOG.exception(f"Error renewing scheduler leases: {e}")
+
+        # Lease may expire while Mongo is unreachable, step down to avoid two leaders.
+        coordinator.is_leader = False
+        delete_leader_jobs()
+
+        return
+
+    # Inserts and deletes are streamed, jobs only move with ring ownership.
+    if changed or not watcher.active:
+        await ensure_jobs()
+    else:
+        # Probe results of servers owned by other replicas are not streamed.
+        await refresh_probes()
 
 
 async def run_startup() -> None:
@@ -160,14 +349,41 @@ async def run_startup() -> None:
             task()
 
 
-async def start():
-    await run_startup()
+async def start_jobs() -> None:
+    """Start scheduler in the running event loop."""
 
     scheduler.start()
 
-    await ensure_jobs()
+    await coordinate()
+    watcher.start()
+
+    scheduler.add_job(
+        coordinate,
+        "interval",
+        id="coordinate",
+        seconds=coordinator.renew_interval,
+        max_instances=1,
+    )
+
+
+async def stop_jobs() -> None:
+    """Stop scheduler and hand its work over to other replicas."""
+
+    await watcher.stop()
+    scheduler.shutdown(wait=False)
+    await rollouts.stop()
+    await coordinator.resign()
+
 
-    await asyncio.Event().wait()
+async def start():
+    await run_startup()
+    await start_jobs()
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stop_jobs()
+        await OllamaClient.close_sessions()
 
 
 def main():
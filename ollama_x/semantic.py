@@ -0,0 +1,228 @@
+import dataclasses
+import hashlib
+import re
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+
+from ollama_x.config import config
+from ollama_x.metrics import metrics
+
+SemanticScope = tuple[str | None, str, str | None, str]
+"""Project ID, model, model digest and hash of the system prompt."""
+
+TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase question with whitespace collapsed and trailing punctuation removed."""
+
+    return TRAILING_PUNCTUATION.sub("", " ".join(text.lower().split()))
+
+
+def chat_question(messages: Any) -> tuple[str, str] | None:
+    """System prompt and question of a chat starting with a single user message.
+
+    Chats with history, images or non-text content are not cached.
+    """
+
+    if not isinstance(messages, list) or not messages:
+        return None
+
+    *system, last = messages
+
+    if not all(isinstance(message, dict) for message in messages):
+        return None
+
+    if any(message.get("role") != "system" for message in system):
+        return None
+
+    if last.get("role") != "user" or last.get("images") or not isinstance(last.get("content"), str):
+        return None
+
+    question = normalize_question(last["content"])
+    if not question:
+        return None
+
+    return "\n".join(str(message.get("content")) for message in system), question
+
+
+def semantic_scope(
+    project_id: str | None, model: str, digest: str | None, system: str
+) -> SemanticScope:
+    return (
+        project_id,
+        model,
+        digest,
+        hashlib.blake2b(system.encode(), digest_size=16).hexdigest(),
+    )
+
+
+@dataclasses.dataclass(eq=False, slots=True)
+class SemanticEntry:
+    id: str
+    scope: SemanticScope
+    row: int
+    answer: str
+    expires: float
+
+
+class SemanticPartition:
+    """Normalized question vectors of one scope in a matrix growing by doubling.
+
+    Rows of removed entries are zeroed and reused, they never match a query.
+    """
+
+    def __init__(self, dimensions: int) -> None:
+        self.vectors = np.zeros((8, dimensions), dtype=np.float32)
+        self.entries: list[SemanticEntry | None] = []
+        self.free: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.entries) - len(self.free)
+
+    def best(self, query: np.ndarray) -> tuple[SemanticEntry | None, float]:
+        """Entry with the question most similar to the query and its similarity."""
+
+        if len(self) == 0 or query.shape[0] != self.vectors.shape[1]:
+            return None, 0.0
+
+        scores = self.vectors[: len(self.entries)] @ query
+        row = int(np.argmax(scores))
+
+        return self.entries[row], float(scores[row])
+
+    def add(self, vector: np.ndarray) -> int:
+        if self.free:
+            row = self.free.pop()
+        else:
+            row = len(self.entries)
+            self.entries.append(None)
+
+            if row == len(self.vectors):
+                self.vectors = np.concatenate((self.vectors, np.zeros_like(self.vectors)))
+
+        self.vectors[row] = vector
+
+        return row
+
+    def remove(self, row: int) -> None:
+        self.vectors[row] = 0
+        self.entries[row] = None
+        self.free.append(row)
+
+
+class SemanticCache:
+    """Chat answers cached by similarity of question embeddings.
+
+    Questions are searched among those asked within the same scope, i.e. the
+    same project, model digest and system prompt. The answer of the most
+    similar one is served when similarity is at least the threshold. Entries
+    are evicted by LRU over all scopes and expire after TTL.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, threshold: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+
+        self.partitions: dict[SemanticScope, SemanticPartition] = {}
+        self.entries: OrderedDict[str, SemanticEntry] = OrderedDict()
+
+        self.hits = metrics.counter("ollama_x_cache_hits_total", "Cache hits")
+        self.misses = metrics.counter("ollama_x_cache_misses_total", "Cache misses")
+        self.false_positives = metrics.counter(
+            "ollama_x_semantic_cache_false_positives_total",
+            "Semantic cache answers reported as not answering the question",
+        )
+        metrics.gauge(
+            "ollama_x_cache_semantic_size",
+            "Number of entries in semantic cache",
+            lambda: len(self.entries),
+        )
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def find(self, scope: SemanticScope, vector: np.ndarray) -> SemanticEntry | None:
+        partition = self.partitions.get(scope)
+        if partition is None:
+            return None
+
+        while True:
+            entry, similarity = partition.best(vector)
+
+            if entry is None or similarity < self.threshold:
+                return None
+
+            if entry.expires >= time.monotonic():
+                return entry
+
+            # another entry may be similar enough
+            self.remove(entry)
+
+    def lookup(self, scope: SemanticScope, vector: np.ndarray) -> SemanticEntry | None:
+        """Find answer to a question similar enough to the normalized question vector."""
+
+        entry = self.find(scope, vector)
+
+        if entry is None:
+            self.misses.inc(cache="semantic")
+            return None
+
+        self.entries.move_to_end(entry.id)
+        self.hits.inc(cache="semantic")
+
+        return entry
+
+    def store(self, scope: SemanticScope, vector: np.ndarray, answer: str) -> None:
+        if self.maxsize <= 0 or not answer or self.find(scope, vector) is not None:
+            return
+
+        partition = self.partitions.get(scope)
+        if partition is None:
+            partition = self.partitions[scope] = SemanticPartition(vector.shape[0])
+        elif vector.shape[0] != partition.vectors.shape[1]:
+            return
+
+        entry = SemanticEntry(
+            secrets.token_hex(8), scope, partition.add(vector), answer, time.monotonic() + self.ttl
+        )
+        partition.entries[entry.row] = entry
+        self.entries[entry.id] = entry
+
+        while len(self.entries) > self.maxsize:
+            self.remove(next(iter(self.entries.values())))
+
+    def remove(self, entry: SemanticEntry) -> None:
+        del self.entries[entry.id]
+
+        partition = self.partitions[entry.scope]
+        partition.remove(entry.row)
+
+        if not len(partition):
+            del self.partitions[entry.scope]
+
+    def report(self, entry_id: str) -> bool:
+        """Drop the entry whose answer did not answer the question.
+
+        Entries are kept in memory of the worker which stored them, `False` is
+        returned for entries of other workers too.
+        """
+
+        entry = self.entries.get(entry_id)
+        if entry is None:
+            return False
+
+        self.remove(entry)
+        self.false_positives.inc()
+
+        return True
+
+
+semantic_cache = SemanticCache(
+    config.semantic_cache_size, config.semantic_cache_ttl, config.semantic_cache_threshold
+)
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any
+
+import bson
+
+from ollama_x.config import config
+from ollama_x.model import Session
+
+LOG = logging.getLogger(__name__)
+
+NEW_SESSION = "new"
+SAVE_ATTEMPTS = 3
+
+
+class SessionStore:
+    """LRU cache of stateful chat sessions with write-behind to Mongo.
+
+    Appended messages are saved by a background task with `$push` conditional on
+    the session version, so a session saved by another app worker meanwhile is
+    reloaded and the messages are appended to it instead of overwriting it.
+    Cached sessions are revalidated against the stored version when opened.
+    Sessions with unsaved messages are kept even if they are evicted from the cache.
+    """
+
+    def __init__(self) -> None:
+        self.sessions: OrderedDict[str, Session] = OrderedDict()
+        self.unsaved: dict[str, tuple[Session, list[dict[str, Any]]]] = {}
+        self.task: asyncio.Task | None = None
+
+    def cache(self, session: Session) -> Session:
+        self.sessions[session.id] = session
+        self.sessions.move_to_end(session.id)
+
+        while len(self.sessions) > config.session_cache_size:
+            self.sessions.popitem(last=False)
+
+        return session
+
+    def rebase(self, session: Session) -> Session:
+        """Append unsaved messages to the session read again from Mongo."""
+
+        unsaved = self.unsaved.get(session.id)
+
+        if unsaved is not None:
+            session.extend(unsaved[1])
+            self.unsaved[session.id] = (session, unsaved[1])
+
+        return session
+
+    def restore(self, session: Session, messages: list[dict[str, Any]]) -> None:
+        """Put back messages not saved before those appended since."""
+
+        session, appended = self.unsaved.pop(session.id, (session, []))
+        self.unsaved[session.id] = (session, [*messages, *appended])
+
+    async def open(self, user_id: str, session_id: str) -> Session:
+        """Get session of the user, `new` creates an empty one."""
+
+        if session_id == NEW_SESSION:
+            return self.cache(await Session(user=user_id, messages=[]).insert())
+
+        session = self.sessions.get(session_id)
+
+        if session is None and session_id in self.unsaved:
+            session = self.unsaved[session_id][0]
+
+        if session is not None:
+            fresh = await Session.changed(session.id, session.version)
+
+            if fresh is not None:
+                session = self.rebase(fresh)
+        elif bson.ObjectId.is_valid(session_id):
+            session = await Session.one(session_id)
+        else:
+            raise Session.NotFoundError()
+
+        if str(session.user) != str(user_id):
+            raise Session.NotFoundError()
+
+        return self.cache(session)
+
+    def append(self, session: Session, messages: list[dict[str, Any]]) -> None:
+        """Append messages to the session, they are saved later."""
+
+        if session.id in self.unsaved:
+            session, unsaved = self.unsaved[session.id]
+        else:
+            session, unsaved = self.sessions.get(session.id, session), []
+
+        session.extend(messages)
+        self.unsaved[session.id] = (session, [*unsaved, *messages])
+
+    async def save(self, session_id: str) -> None:
+        """Save appended messages of the session.
+
+        If the session was saved by another worker since it was read, it is read
+        again and the messages are appended to the stored ones.
+        """
+
+        for _ in range(SAVE_ATTEMPTS):
+            session, messages = self.unsaved.pop(session_id)
+
+            try:
+                if await session.push_messages(messages):
+                    return
+
+                fresh = await Session.changed(session_id, session.version)
+            except Exception:
+                self.restore(session, messages)
+                raise
+
+            if fresh is None:
+                LOG.warning(f"Session {session_id} was removed before messages were saved")
+                return
+
+            self.restore(session, messages)
+            self.rebase(fresh)
+
+            if session_id in self.sessions:
+                self.cache(fresh)
+
+    async def flush(self) -> None:
+        """Save appended messages."""
+
+        for session_id in list(self.unsaved):
+            try:
+                await self.save(session_id)
+            except Exception as e:
+                LOG.error(f"Error saving session {session_id}: {e}")
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(config.session_flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+        await self.flush()
+
+
+sessions = SessionStore()
@@ -64,9 +64,219 @@ def setup_sentry() -> None:
         sentry_sdk.init(config.sentry_dsn)
 
 
+async def start_embedded_scheduler() -> None:
+    """Start scheduler in the app event loop."""
+
+    if config.client_generation or not config.embedded_scheduler:
+        return
+
+    from ollama_x.scheduler import start_jobs
+
+    await start_jobs()
+
+
+async def stop_embedded_scheduler() -> None:
+    """Stop scheduler running in the app event loop."""
+
+    if config.client_generation or not config.embedded_scheduler:
+        return
+
+    from ollama_x.scheduler import stop_jobs
+
+    await stop_jobs()
+
+
+async def start_demand_tracker() -> None:
+    """Start periodic model demand flushes."""
+
+    if config.client_generation:
+        return
+
+    from ollama_x.demand import demand
+
+    demand.start()
+
+
+async def stop_demand_tracker() -> None:
+    """Flush remaining model demand."""
+
+    if config.client_generation:
+        return
+
+    from ollama_x.demand import demand
+
+    await demand.stop()
+
+
+async def start_telemetry() -> None:
+    """Start telemetry export."""
+
+    if config.client_generation:
+        return
+
+    from ollama_x.telemetry import telemetry
+
+    telemetry.start()
+
+
+async def stop_telemetry() -> None:
+    """Export remaining telemetry."""
+
+    if config.client_generation:
+        return
+
+    from ollama_x.telemetry import telemetry
+
+    await telemetry.stop()
+
+
+async def start_key_watch() -> None:
+    """Invalidate cached API keys and project members on changes."""
+
+    if config.client_generation:
+        return
+
+    from ollama_x.auth import project_members, user_keys
+
+    user_keys.start()
+    project_members.start()
+
+
+async def stop_key_watch() -> None:
+    """Stop invalidating cached API keys and project members."""
+
+    if config.client_generation:
+        return
+
+    from ollama_x.auth import project_members, user_keys
+
+    await user_keys.stop()
+    await project_members.stop()
+
+
+async def start_rate_limiter() -> None:
+    """Start syncing rate limit usage between app workers."""
+
+    if config.client_generation:
+        return
+
+    from ollama_x.ratelimit import rate_limiter
+
+    rate_limiter.start()
+
+
+async def stop_rate_limiter() -> None:
+    """Stop syncing rate limit usage."""
+
+    if config.client_generation:
+        return
+
+    from ollama_x.ratelimit import rate_limiter
+
+    await rate_limiter.stop()
+
+
+async def start_usage_ledger() -> None:
+    """Start periodic usage ledger flushes."""
+
+    if config.client_generation:
+        return
+
+    from ollama_x.usage import usage
+
+    usage.start()
+
+
+async def stop_usage_ledger() -> None:
+    """Flush remaining usage."""
+
+    if config.client_generation:
+        return
+
+    from ollama_x.usage import usage
+
+    await usage.stop()
+
+
+async def start_session_store() -> None:
+    """Start saving stateful chat sessions."""
+
+    if config.client_generation:
+        return
+
+    from ollama_x.sessions import sessions
+
+    sessions.start()
+
+
+async def stop_session_store() -> None:
+    """Save remaining stateful chat sessions."""
+
+    if config.client_generation:
+        return
+
+    from ollama_x.sessions import sessions
+
+    await sessions.stop()
+
+
+async def start_rollout_watch() -> None:
+    """Invalidate cached routing state of model rollouts on changes."""
+
+    if config.client_generation:
+        return
+
+    from ollama_x.rollout import rollouts
+
+    rollouts.watch()
+
+
+async def stop_rollout_watch() -> None:
+    """Stop invalidating cached routing state of model rollouts."""
+
+    if config.client_generation:
+        return
+
+    from ollama_x.rollout import rollouts
+
+    await rollouts.stop_watch()
+
+
+async def close_connection_pools() -> None:
+    """Close connection pools to Ollama servers."""
+
+    from ollama_x.client.ollama import OllamaClient
+
+    await OllamaClient.close_sessions()
+
+
 STARTUP_TASKS = [
     setup_document,
     ensure_indexes,
     setup_log,
     setup_sentry,
 ]
+
+APP_STARTUP_TASKS = [
+    *STARTUP_TASKS,
+    start_embedded_scheduler,
+    start_demand_tracker,
+    start_rollout_watch,
+    start_telemetry,
+    start_session_store,
+    start_key_watch,
+    start_rate_limiter,
+    start_usage_ledger,
+]
+
+SHUTDOWN_TASKS = [
+    stop_rollout_watch,
+    stop_telemetry,
+    stop_session_store,
+    stop_key_watch,
+    stop_rate_limiter,
+    stop_usage_ledger,
+    stop_demand_tracker,
+    stop_embedded_scheduler,
+    close_connection_pools,
+]
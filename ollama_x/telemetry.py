@@ -0,0 +1,193 @@
+import asyncio
+import dataclasses
+import datetime
+import logging
+from collections import deque
+from typing import Any
+
+from ollama_x.config import config
+from ollama_x.metrics import metrics
+from ollama_x.model import Session
+
+LOG = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(slots=True)
+class TelemetryEvent:
+    """Finished proxied request to be exported to Langfuse."""
+
+    action: str
+    user_id: str
+    username: str
+    model: str | None
+    input: Any
+    output: str
+    options: dict[str, Any] | None
+    metadata: dict[str, Any]
+    session_context: dict[str, str]
+    start_time: datetime.datetime
+    completion_start: datetime.datetime | None
+    end_time: datetime.datetime | None
+    done: bool
+
+
+class Telemetry:
+    """Bounded buffer of telemetry events exported to Langfuse in batches.
+
+    Requests only append events to the buffer. When the buffer is full the
+    oldest events are dropped. A background task resolves sessions and hands
+    batches to the Langfuse client in a worker thread.
+    """
+
+    def __init__(self) -> None:
+        self.events: deque[TelemetryEvent] = deque(maxlen=config.telemetry_buffer_size)
+        self.has_events = asyncio.Event()
+        self.task: asyncio.Task | None = None
+        self.client = None
+
+        self.emitted = metrics.counter(
+            "ollama_x_telemetry_events_total", "Telemetry events emitted by requests"
+        )
+        self.dropped = metrics.counter(
+            "ollama_x_telemetry_dropped_total", "Telemetry events dropped because buffer is full"
+        )
+        self.exported = metrics.counter(
+            "ollama_x_telemetry_exported_total", "Telemetry events exported to Langfuse"
+        )
+        self.failed = metrics.counter(
+            "ollama_x_telemetry_failed_total", "Telemetry events failed to export"
+        )
+        metrics.gauge(
+            "ollama_x_telemetry_queue_depth",
+            "Telemetry events waiting for export",
+            lambda: len(self.events),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(config.langfuse_public_key and config.langfuse_secret_key)
+
+    def emit(self, event: TelemetryEvent) -> None:
+        """Add event to the buffer without waiting, dropping the oldest one if full."""
+
+        if len(self.events) == self.events.maxlen:
+            self.dropped.inc()
+
+        self.events.append(event)
+        self.emitted.inc()
+        self.has_events.set()
+
+    def take_batch(self) -> list[TelemetryEvent]:
+        batch = []
+
+        while self.events and len(batch) < config.telemetry_batch_size:
+            batch.append(self.events.popleft())
+
+        if not self.events:
+            self.has_events.clear()
+
+        return batch
+
+    async def session_id(self, event: TelemetryEvent) -> str | None:
+        try:
+            session = await Session.find_or_create(
+                event.user_id,
+                messages=event.input if event.action == "chat" else None,
+                context=event.session_context,
+            )
+        except Exception as e:
+            LOG.debug(f"Error finding telemetry session: {e}")
+            return None
+
+        return session.id
+
+    def get_client(self):
+        if self.client is None:
+            from langfuse import Langfuse
+
+            self.client = Langfuse(
+                public_key=config.langfuse_public_key,
+                secret_key=config.langfuse_secret_key,
+                host=config.langfuse_host,
+            )
+
+        return self.client
+
+    def export_batch(self, batch: list[tuple[TelemetryEvent, str | None]]) -> None:
+        """Hand events to the Langfuse client, runs in a worker thread."""
+
+        client = self.get_client()
+
+        for event, session_id in batch:
+            tags = [event.action, "ollama", event.model]
+
+            trace = client.trace(
+                name=event.action,
+                user_id=event.username,
+                session_id=session_id,
+                input=event.input,
+                output=event.output,
+                tags=tags,
+                timestamp=event.start_time,
+            )
+            trace.generation(
+                name=event.action,
+                model=event.model,
+                model_parameters=event.options,
+                input=event.input,
+                output=event.output,
+                metadata=event.metadata,
+                start_time=event.start_time,
+                end_time=event.end_time,
+                completion_start_time=event.completion_start,
+                usage={
+                    "input": event.metadata.get("prompt_eval_count"),
+                    "output": event.metadata.get("eval_count"),
+                    "unit": "TOKENS",
+                },
+                level="DEFAULT" if event.done else "ERROR",
+                status_message=None if event.done else "Request cancelled",
+            )
+
+    async def export(self, events: list[TelemetryEvent]) -> None:
+        sessions = await asyncio.gather(*(self.session_id(event) for event in events))
+
+        try:
+            await asyncio.to_thread(self.export_batch, list(zip(events, sessions)))
+        except Exception as e:
+            LOG.exception(f"Error exporting telemetry: {e}")
+            self.failed.inc(len(events))
+        else:
+            self.exported.inc(len(events))
+
+    async def run(self) -> None:
+        while True:
+            await self.has_events.wait()
+
+            if len(self.events) < config.telemetry_batch_size:
+                await asyncio.sleep(config.telemetry_flush_interval)
+
+            await self.export(self.take_batch())
+
+    def start(self) -> None:
+        if self.enabled:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Export remaining events and flush the Langfuse client."""
+
+        if self.task is None:
+            return
+
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+        while batch := self.take_batch():
+            await self.export(batch)
+
+        if self.client is not None:
+            await asyncio.to_thread(self.client.flush)
+
+
+telemetry = Telemetry()
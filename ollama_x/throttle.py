@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Token bucket refilled at a constant rate.
+
+    Consumers may borrow tokens, waiting until the debt is paid off, so large
+    amounts pass through a small bucket and concurrent consumers are served fairly.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def consume(self, amount: float) -> None:
+        """Take tokens, waiting if the bucket is in debt."""
+
+        self.refill()
+        self.tokens -= amount
+
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+    def debit(self, amount: float) -> None:
+        """Take tokens without waiting, the bucket may go into debt."""
+
+        self.refill()
+        self.tokens -= amount
+
+    def delay(self, amount: float = 0) -> float:
+        """Seconds until the bucket holds the amount of tokens."""
+
+        self.refill()
+
+        return max(0.0, (amount - self.tokens) / self.rate)
@@ -0,0 +1,94 @@
+import asyncio
+import datetime
+import logging
+from collections import defaultdict
+from typing import Any
+
+from pytz import utc
+
+from ollama_x.config import config
+from ollama_x.metrics import metrics
+from ollama_x.model.usage import UsageCounters, UsageKey, UsageRecord, UsageRollup
+
+LOG = logging.getLogger(__name__)
+
+
+class UsageLedger:
+    """Aggregates usage in memory and flushes it to Mongo in bulk.
+
+    Usage of failed flushes is kept for the next one, remaining usage is
+    flushed on shutdown.
+    """
+
+    def __init__(self) -> None:
+        self.usage: defaultdict[UsageKey, UsageCounters] = defaultdict(UsageCounters)
+        self.task: asyncio.Task | None = None
+
+        self.failed = metrics.counter(
+            "ollama_x_usage_flush_failed_total", "Usage ledger flushes failed"
+        )
+        metrics.gauge(
+            "ollama_x_usage_pending_keys",
+            "Usage ledger entries waiting for flush",
+            lambda: len(self.usage),
+        )
+
+    def record(self, key: UsageKey, metadata: dict[str, Any]) -> None:
+        """Account finished request from its final response chunk."""
+
+        counters = self.usage[key]
+        counters.requests += 1
+        counters.prompt_tokens += metadata.get("prompt_eval_count") or 0
+        counters.completion_tokens += metadata.get("eval_count") or 0
+        counters.gpu_seconds += (
+            (metadata.get("prompt_eval_duration") or 0) + (metadata.get("eval_duration") or 0)
+        ) / 1e9
+
+    async def flush(self) -> None:
+        """Write aggregated usage to Mongo."""
+
+        usage, self.usage = self.usage, defaultdict(UsageCounters)
+
+        if not usage:
+            return
+
+        now = datetime.datetime.now(utc)
+
+        try:
+            await UsageRollup.add(now, usage)
+        except Exception:
+            self.failed.inc()
+
+            for key, counters in usage.items():
+                self.usage[key].add(counters)
+
+            raise
+
+        # Rollups are already counted, raw records are not retried.
+        try:
+            await UsageRecord.add(now, usage)
+        except Exception as e:
+            LOG.error(f"Error saving usage records: {e}")
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(config.usage_flush_interval)
+
+            try:
+                await self.flush()
+            except Exception as e:
+                LOG.exception(f"Error flushing usage: {e}")
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+        await self.flush()
+
+
+usage = UsageLedger()
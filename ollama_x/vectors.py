@@ -0,0 +1,323 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import shutil
+import tempfile
+from typing import Self
+
+import numpy as np
+
+from ollama_x.cache import MISSING, TTLCache
+from ollama_x.config import config
+from ollama_x.model import CodebaseChunk, CodebaseIndex
+
+LOG = logging.getLogger(__name__)
+
+
+def quantize(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Normalize vectors and quantize them to int8 with a scale per row."""
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    normalized = vectors / np.where(norms == 0, 1, norms)
+
+    scales = np.abs(normalized).max(axis=1) / 127
+    scales[scales == 0] = 1
+
+    quantized = np.rint(normalized / scales[:, None]).astype(np.int8)
+
+    return quantized, scales.astype(np.float32)
+
+
+def normalize(vector: list[float]) -> np.ndarray:
+    query = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(query)
+
+    return query / norm if norm else query
+
+
+class VectorIndex:
+    """Cosine similarity index over int8 quantized vectors.
+
+    Large indexes are split into clusters by spherical k-means, rows are sorted
+    by cluster and search only scans clusters closest to the query.
+    """
+
+    IVF_MIN_ROWS = 4096
+    """Indexes smaller than this are scanned entirely."""
+
+    PROBES = 8
+    """Number of clusters scanned by search."""
+
+    BLOCK_ROWS = 16384
+    """Rows converted to float32 at once during scans."""
+
+    FILES = ("ids", "vectors", "scales", "centroids", "offsets")
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        vectors: np.ndarray,
+        scales: np.ndarray,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+    ) -> None:
+        self.ids = ids
+        self.vectors = vectors
+        self.scales = scales
+        self.centroids = centroids
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids: np.ndarray, vectors: np.ndarray, scales: np.ndarray) -> Self:
+        """Build index of quantized vectors, clustered if it is large enough."""
+
+        if len(ids) < cls.IVF_MIN_ROWS:
+            return cls(
+                ids,
+                vectors,
+                scales,
+                np.zeros((0, vectors.shape[1]), dtype=np.float32),
+                np.zeros(1, dtype=np.int64),
+            )
+
+        centroids = cls.kmeans(vectors, scales, int(math.sqrt(len(ids))))
+        clusters = np.concatenate(
+            [
+                np.argmax(cls.dequantize(vectors[start:end], scales[start:end]) @ centroids.T, 1)
+                for start, end in cls.blocks(0, len(ids))
+            ]
+        )
+
+        order = np.argsort(clusters, kind="stable")
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(clusters, minlength=len(centroids)))))
+
+        return cls(ids[order], vectors[order], scales[order], centroids, offsets)
+
+    @classmethod
+    def kmeans(
+        cls, vectors: np.ndarray, scales: np.ndarray, k: int, iterations: int = 8
+    ) -> np.ndarray:
+        """Find cluster centroids on a sample of vectors."""
+
+        rng = np.random.default_rng(0)
+        sample_rows = rng.choice(len(vectors), size=min(len(vectors), k * 64), replace=False)
+        sample = cls.dequantize(vectors[sample_rows], scales[sample_rows])
+
+        centroids = sample[rng.choice(len(sample), size=k, replace=False)]
+
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            centroids = np.where(
+                empty[:, None], centroids, sums / np.where(empty, 1, norms[:, 0])[:, None]
+            )
+
+        return centroids.astype(np.float32)
+
+    @staticmethod
+    def dequantize(vectors: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        return vectors.astype(np.float32) * scales[:, None]
+
+    @classmethod
+    def blocks(cls, start: int, end: int) -> list[tuple[int, int]]:
+        return [(row, min(row + cls.BLOCK_ROWS, end)) for row in range(start, end, cls.BLOCK_ROWS)]
+
+    def ranges(self, query: np.ndarray) -> list[tuple[int, int]]:
+        """Row ranges scanned for the query."""
+
+        if not len(self.centroids):
+            return [(0, len(self))]
+
+        probes = min(self.PROBES, len(self.centroids))
+        closest = np.argpartition(-(self.centroids @ query), probes - 1)[:probes]
+
+        return [(int(self.offsets[c]), int(self.offsets[c + 1])) for c in sorted(closest)]
+
+    def search(self, query: np.ndarray, k: int) -> list[tuple[bytes, float]]:
+        """Find IDs of `k` rows most similar to normalized query with their scores.
+
+        IDs are 12 bytes of row ObjectIds.
+        """
+
+        rows, scores = [], []
+
+        for start, end in self.ranges(query):
+            for block_start, block_end in self.blocks(start, end):
+                rows.append(np.arange(block_start, block_end))
+                scores.append(
+                    (self.vectors[block_start:block_end].astype(np.float32) @ query)
+                    * self.scales[block_start:block_end]
+                )
+
+        if not rows:
+            return []
+
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+
+        order = np.argsort(-scores)
+
+        return [(self.ids[rows[i]].tobytes(), float(scores[i])) for i in order]
+
+    def save(self, directory: str) -> None:
+        """Save index files into a new directory, it appears at once when complete."""
+
+        parent = os.path.dirname(directory)
+        os.makedirs(parent, exist_ok=True)
+
+        temporary = tempfile.mkdtemp(dir=parent, prefix=".building-")
+
+        for name in self.FILES:
+            np.save(os.path.join(temporary, f"{name}.npy"), getattr(self, name))
+
+        try:
+            os.rename(temporary, directory)
+        except OSError:
+            # saved by another worker meanwhile
+            shutil.rmtree(temporary, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str) -> Self:
+        """Open index files memory-mapped."""
+
+        return cls(
+            *(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in cls.FILES)
+        )
+
+
+class VectorIndexes:
+    """Codebase vector indexes of continue.dev projects loaded by this worker.
+
+    Index of a version is built once from chunks of the version and never
+    changes. With a directory set, it is saved there and memory-mapped, workers
+    sharing the directory build every version once.
+    """
+
+    OPEN_ATTEMPTS = 3
+    """Builds of an index while newer versions keep being published."""
+
+    def __init__(self, directory: str | None) -> None:
+        self.directory = directory
+        self.loaded: TTLCache[tuple[str, str | None], tuple[int, VectorIndex]] = TTLCache(
+            "vector_indexes", config.vector_index_cache_size, config.vector_index_cache_ttl
+        )
+        self.locks: dict[tuple[str, str | None], asyncio.Lock] = {}
+
+    async def get(
+        self, project_id: str, site: str | None = None
+    ) -> tuple[CodebaseIndex, VectorIndex] | None:
+        """Get current index of the project codebase or docs site, `None` if never built."""
+
+        current = await CodebaseIndex.current(project_id, site)
+        if current is None:
+            return None
+
+        key = (project_id, site)
+        loaded = self.loaded.get(key)
+
+        if loaded is MISSING or loaded[0] < current.version:
+            lock = self.locks.setdefault(key, asyncio.Lock())
+
+            try:
+                async with lock:
+                    loaded = self.loaded.get(key)
+
+                    if loaded is MISSING or loaded[0] < current.version:
+                        current, index = await self.open(current)
+                        loaded = (current.version, index)
+                        self.loaded.set(key, loaded)
+            finally:
+                if not lock.locked():
+                    self.locks.pop(key, None)
+
+        return current, loaded[1]
+
+    def index_directory(self, current: CodebaseIndex) -> str:
+        """Directory of the index files of all versions."""
+
+        name = "codebase"
+        if current.site is not None:
+            name = f"docs-{hashlib.blake2b(current.site.encode(), digest_size=8).hexdigest()}"
+
+        return os.path.join(self.directory, str(current.project), name)
+
+    async def open(self, current: CodebaseIndex) -> tuple[CodebaseIndex, VectorIndex]:
+        """Open index of the version, or of a newer one published during the build."""
+
+        for _ in range(self.OPEN_ATTEMPTS):
+            directory = None
+
+            if self.directory is not None:
+                directory = os.path.join(self.index_directory(current), str(current.version))
+
+                if os.path.isdir(directory):
+                    return current, VectorIndex.load(directory)
+
+            built, index = current, await self.build(current)
+
+            # chunks replaced in a newer version may have been deleted during the scan
+            latest = await CodebaseIndex.current(current.project, current.site)
+
+            if latest is None or latest.version == current.version:
+                break
+
+            LOG.info(f"Codebase index {current.project} changed during build, building again")
+            current = latest
+        else:
+            # not saved, the next request builds the latest version again
+            return built, index
+
+        if directory is None:
+            return current, index
+
+        await asyncio.to_thread(index.save, directory)
+        self.remove_old(os.path.dirname(directory), current.version)
+
+        LOG.info(f"Built codebase index {directory} of {len(index)} chunks")
+
+        return current, VectorIndex.load(directory)
+
+    @staticmethod
+    async def build(current: CodebaseIndex) -> VectorIndex:
+        """Build index of chunks of the version."""
+
+        ids, vectors, scales = [], [], []
+
+        async for chunk in CodebaseChunk.vectors(current):
+            ids.append(chunk["_id"].binary)
+            vectors.append(chunk["vector"])
+            scales.append(chunk["scale"])
+
+        return await asyncio.to_thread(
+            VectorIndex.build,
+            np.frombuffer(b"".join(ids), dtype=np.uint8).reshape(len(ids), 12),
+            np.frombuffer(b"".join(vectors), dtype=np.int8).reshape(len(ids), -1)
+            if ids
+            else np.zeros((0, 0), dtype=np.int8),
+            np.array(scales, dtype=np.float32),
+        )
+
+    @staticmethod
+    def remove_old(directory: str, version: int) -> None:
+        """Remove files of older versions, they stay readable until unmapped."""
+
+        for name in os.listdir(directory):
+            if name.isdigit() and int(name) < version:
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+vector_indexes = VectorIndexes(config.vector_index_dir)
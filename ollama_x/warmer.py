@@ -0,0 +1,185 @@
+import asyncio
+import datetime
+import logging
+import math
+import time
+
+from pytz import utc
+
+from ollama_x.config import config
+from ollama_x.fleet import fleet
+from ollama_x.model import APIServer, ModelDemand
+from ollama_x.placement import PlacementAction, PlacementPlan, plan_placement
+
+LOG = logging.getLogger(__name__)
+
+KEEP_ALIVE = "keep alive"
+DEMAND = "demand"
+
+
+def parse_expires_at(value: str | None) -> datetime.datetime | None:
+    """Parse `expires_at` reported by `/api/ps`."""
+
+    if not value:
+        return None
+
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def desired_replicas(model: str, rate: float) -> int:
+    """Number of warm replicas needed for demand in requests per minute."""
+
+    demanded = math.ceil(rate / config.warm_requests_per_replica) if rate > 0 else 0
+
+    return max(config.warm_targets.get(model, 0), demanded)
+
+
+def desired_models(rates: dict[str, float]) -> dict[str, int]:
+    """Warm replicas needed for every demanded or targeted model."""
+
+    return {
+        model: replicas
+        for model in rates.keys() | config.warm_targets.keys()
+        if (replicas := desired_replicas(model, rates.get(model, 0.0)))
+    }
+
+
+async def preload(
+    server: APIServer,
+    model: str,
+    reason: str,
+    keep_alive: int | None = None,
+) -> None:
+    """Load model on the server and extend its keep alive."""
+
+    started = time.monotonic()
+
+    try:
+        async with server.ollama_client.preload_model(
+            model,
+            keep_alive=config.warm_keep_alive if keep_alive is None else keep_alive,
+        ) as response:
+            data = await response.json()
+    except Exception as e:
+        LOG.error(f"Error preloading `{model}` on {server.url}: {e}")
+        return
+
+    if reason == KEEP_ALIVE:
+        LOG.debug(f"Extended keep alive of `{model}` on {server.url}")
+        return
+
+    load_duration = data.get("load_duration")
+    load_time = load_duration / 1e9 if load_duration else time.monotonic() - started
+
+    LOG.info(
+        f"Preloaded `{model}` on {server.url} ({reason}), "
+        f"avoided {load_time:.2f}s cold start for the next request"
+    )
+
+
+async def unload(server: APIServer, model: str, reason: str) -> None:
+    """Unload model from the server."""
+
+    try:
+        async with server.ollama_client.unload_model(model):
+            pass
+    except Exception as e:
+        LOG.error(f"Error unloading `{model}` on {server.url}: {e}")
+        return
+
+    LOG.info(f"Unloaded `{model}` on {server.url} ({reason})")
+
+
+async def apply_plan(plan: PlacementPlan, servers: list[APIServer]) -> None:
+    """Apply placement plan. Unloads run before loads on each server to free VRAM."""
+
+    by_id = {server.id: server for server in servers}
+
+    actions: dict[str, list[PlacementAction]] = {}
+    for action in plan.actions:
+        actions.setdefault(action.server_id, []).append(action)
+
+    async def apply_server(server: APIServer, server_actions: list[PlacementAction]) -> None:
+        for action in sorted(server_actions, key=lambda action: action.action != "unload"):
+            if action.action == "unload":
+                await unload(server, action.model, action.reason)
+            elif action.model in server.pinned_models:
+                await preload(server, action.model, action.reason, keep_alive=-1)
+            else:
+                await preload(server, action.model, action.reason)
+
+    await asyncio.gather(
+        *(apply_server(by_id[server_id], items) for server_id, items in actions.items())
+    )
+
+
+async def warm_models() -> None:
+    """Keep enough warm replicas of every demanded model.
+
+    Models without demand or target are not touched, so they expire after their
+    keep alive. With placement enabled loads and unloads are planned against VRAM
+    capacity of each server.
+    """
+
+    rates = await ModelDemand.rates(datetime.timedelta(seconds=config.demand_window))
+    servers = [server async for server in fleet.all_active()]
+
+    desired = desired_models(rates)
+
+    refresh_before = datetime.datetime.now(utc) + datetime.timedelta(
+        seconds=2 * config.warm_interval
+    )
+
+    preloads = []
+
+    for model, replicas in desired.items():
+        warm = [server for server in servers if server.running_model(model) is not None]
+
+        for server in warm[:replicas]:
+            expires_at = parse_expires_at(server.running_model(model).get("expires_at"))
+
+            if expires_at is None or expires_at < refresh_before:
+                preloads.append(preload(server, model, KEEP_ALIVE))
+
+    if config.placement_enabled:
+        plan = plan_placement(servers, rates, desired)
+
+        if config.placement_dry_run:
+            LOG.info(f"Placement plan (dry run): {plan.model_dump_json()}")
+        else:
+            preloads.append(apply_plan(plan, servers))
+
+        await asyncio.gather(*preloads)
+        return
+
+    for model, replicas in desired.items():
+        rate = rates.get(model, 0.0)
+
+        warm = [server for server in servers if server.running_model(model) is not None]
+        cold = [
+            server
+            for server in servers
+            if server.running_model(model) is None and server.pulled_model(model) is not None
+        ]
+
+        missing = replicas - len(warm)
+        if missing <= 0:
+            continue
+
+        if len(cold) < missing:
+            LOG.warning(
+                f"`{model}` needs {replicas} warm replicas for {rate:.1f} req/min, "
+                f"only {len(warm) + len(cold)} servers have it"
+            )
+
+        for server in sorted(cold, key=lambda s: len(s.running_models))[:missing]:
+            LOG.info(
+                f"Warming `{model}` on {server.url}: {rate:.1f} req/min, "
+                f"{len(warm)}/{replicas} replicas warm"
+            )
+            preloads.append(preload(server, model, DEMAND))
+
+    await asyncio.gather(*preloads)
@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import json
+import re
+
+import httpx
+import pytest
+from aiohttp import web
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from ollama_x.api import endpoints
+from ollama_x.api.middleware import MIDDLEWARES
+from ollama_x.client.ollama import OllamaClient
+from ollama_x.config import config
+from ollama_x.model import User
+
+
+@pytest.fixture(autouse=True)
+async def close_sessions():
+    yield
+
+    await OllamaClient.close_sessions()
+
+
+class FakeRegistry:
+    """Upstream registry serving blobs with range support, slowed down if needed."""
+
+    def __init__(self) -> None:
+        self.blobs: dict[str, bytes] = {}
+        self.requests: list[tuple[str, str | None]] = []
+        self.chunk_size = 64 * 1024
+        self.chunk_delay = 0.0
+
+        self.app = web.Application()
+        self.app.router.add_get("/v2/{name:.+}/blobs/{digest}", self.get_blob)
+
+    def add_blob(self, content: bytes) -> str:
+        digest = f"sha256:{hashlib.sha256(content).hexdigest()}"
+        self.blobs[digest] = content
+
+        return digest
+
+    async def get_blob(self, request: web.Request) -> web.StreamResponse:
+        digest = request.match_info["digest"]
+        self.requests.append((digest, request.headers.get("Range")))
+
+        if digest not in self.blobs:
+            return web.Response(status=404)
+
+        content = self.blobs[digest]
+        start = 0
+        response = web.StreamResponse()
+
+        if match := re.match(r"bytes=(\d+)-", request.headers.get("Range", "")):
+            start = int(match.group(1))
+            response.set_status(206)
+            response.headers["Content-Range"] = f"bytes {start}-{len(content) - 1}/{len(content)}"
+
+        response.content_length = len(content) - start
+        await response.prepare(request)
+
+        for offset in range(start, len(content), self.chunk_size):
+            await response.write(content[offset : offset + self.chunk_size])
+            await asyncio.sleep(self.chunk_delay)
+
+        return response
+
+
+@pytest.fixture
+async def registry(monkeypatch):
+    fake = FakeRegistry()
+    runner = web.AppRunner(fake.app)
+    await runner.setup()
+
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+
+    port = site._server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(config, "registry_upstream", f"http://127.0.0.1:{port}")
+
+    yield fake
+
+    await runner.cleanup()
+
+
+def ndjson(*chunks: dict) -> bytes:
+    return b"".join(json.dumps(chunk).encode() + b"\n" for chunk in chunks)
+
+
+def sse(*chunks: dict) -> bytes:
+    return b"".join(f"data: {json.dumps(chunk)}\n\n".encode() for chunk in chunks) + (
+        b"data: [DONE]\n\n"
+    )
+
+
+PROMPT_TOKENS = 30
+COMPLETION_TOKENS = 20
+
+RESPONSES = {
+    endpoints.PROXY_CHAT: ndjson(
+        {"message": {"role": "assistant", "content": "Hi"}, "done": False},
+        {
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": PROMPT_TOKENS,
+            "eval_count": COMPLETION_TOKENS,
+            "prompt_eval_duration": 1_000_000_000,
+            "eval_duration": 2_000_000_000,
+        },
+    ),
+    endpoints.PROXY_GENERATE: ndjson(
+        {"response": "Hi", "done": False},
+        {
+            "response": "",
+            "done": True,
+            "prompt_eval_count": PROMPT_TOKENS,
+            "eval_count": COMPLETION_TOKENS,
+        },
+    ),
+    endpoints.OLLAMA_OPENAI_CHAT: sse(
+        {"choices": [{"delta": {"role": "assistant", "content": "Hi"}, "finish_reason": None}]},
+        {"choices": [{"delta": {"role": "assistant", "content": ""}, "finish_reason": "stop"}]},
+        {
+            "choices": [],
+            "usage": {"prompt_tokens": PROMPT_TOKENS, "completion_tokens": COMPLETION_TOKENS},
+        },
+    ),
+    endpoints.OLLAMA_OPENAI_COMPLETIONS: json.dumps(
+        {
+            "choices": [{"text": "Hi", "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": PROMPT_TOKENS, "completion_tokens": COMPLETION_TOKENS},
+        }
+    ).encode(),
+}
+RESPONSES[endpoints.OLLAMA_CHAT] = RESPONSES[endpoints.PROXY_CHAT]
+RESPONSES[endpoints.OLLAMA_COMPLETIONS] = RESPONSES[endpoints.PROXY_GENERATE]
+
+GENERATION_ENDPOINTS = list(RESPONSES)
+
+
+@pytest.fixture
+def user() -> User:
+    return User(username="tester", key=User.generate_key())
+
+
+@pytest.fixture
+async def api(monkeypatch, user):
+    """Client of an app with all middlewares whose generation endpoints answer fixed responses."""
+
+    async def authenticate(request, anonymous_allowed=True):
+        return user
+
+    for module in ("ollama", "ratelimit"):
+        monkeypatch.setattr(f"ollama_x.api.middleware.{module}.authenticate", authenticate)
+
+    app = FastAPI()
+
+    def respond(body: bytes):
+        async def generate() -> StreamingResponse:
+            return StreamingResponse(iter([body]))
+
+        return generate
+
+    for path, body in RESPONSES.items():
+        app.post(path)(respond(body))
+
+    for middleware in MIDDLEWARES:
+        app.add_middleware(middleware)
+
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
@@ -0,0 +1,228 @@
+import asyncio
+import gc
+
+import pytest
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+
+from ollama_x.api.ollama import QueueRequest, proxy_queue_request
+from ollama_x.autocomplete import CompletionCache, PrefixTrie, is_fim_request, split_prompt
+from ollama_x.model import APIServer
+
+KEY = ("user", "main.py", "codellama:latest")
+
+
+def labels(trie: PrefixTrie) -> dict:
+    """Trie as nested dicts of node labels to their values and children."""
+
+    def walk(node):
+        return {child.label: (child.value, walk(child)) for child in node.children.values()}
+
+    return walk(trie.root)
+
+
+def request(prefix: str, suffix: str = "\n}") -> dict:
+    return {"prompt": prefix, "suffix": suffix}
+
+
+def test_insert_splits_node_at_common_prefix():
+    trie = PrefixTrie()
+    trie.insert("abcd", "1")
+    trie.insert("abxy", "2")
+
+    assert labels(trie) == {"ab": (None, {"cd": ("1", {}), "xy": ("2", {})})}
+
+
+def test_insert_prefix_of_stored_key_gets_value_of_split_node():
+    trie = PrefixTrie()
+    trie.insert("abcd", "1")
+    trie.insert("ab", "2")
+
+    assert labels(trie) == {"ab": ("2", {"cd": ("1", {})})}
+    assert list(trie.prefixes("abcdef")) == [(4, "1"), (2, "2")]
+    assert list(trie.prefixes("abx")) == [(2, "2")]
+    assert list(trie.prefixes("a")) == []
+
+
+def test_remove_merges_node_without_value_into_only_child():
+    trie = PrefixTrie()
+    trie.insert("abcd", "1")
+    trie.insert("abxy", "2")
+
+    trie.remove("abxy")
+
+    assert labels(trie) == {"abcd": ("1", {})}
+
+
+def test_remove_inner_key_merges_it_with_only_child():
+    trie = PrefixTrie()
+    trie.insert("abcd", "1")
+    trie.insert("ab", "2")
+
+    trie.remove("ab")
+
+    assert labels(trie) == {"abcd": ("1", {})}
+
+
+def test_remove_inner_key_with_several_children_keeps_node():
+    trie = PrefixTrie()
+    for key in ("ab", "abcd", "abxy"):
+        trie.insert(key, key)
+
+    trie.remove("ab")
+
+    assert labels(trie) == {"ab": (None, {"cd": ("abcd", {}), "xy": ("abxy", {})})}
+
+
+def test_remove_leaf_keeps_parent_with_value():
+    trie = PrefixTrie()
+    trie.insert("ab", "1")
+    trie.insert("abcd", "2")
+
+    trie.remove("abcd")
+
+    assert labels(trie) == {"ab": ("1", {})}
+
+
+def test_remove_missing_key_changes_nothing():
+    trie = PrefixTrie()
+    trie.insert("abcd", "1")
+
+    trie.remove("abc")
+    trie.remove("abcdef")
+    trie.remove("x")
+
+    assert labels(trie) == {"abcd": ("1", {})}
+
+
+def test_typed_start_of_suggestion_gets_its_rest():
+    cache = CompletionCache()
+    cache.store(KEY, request("def add(a, b):\n    "), "return a + b")
+
+    assert cache.lookup(KEY, request("def add(a, b):\n    ")) == "return a + b"
+    assert cache.lookup(KEY, request("def add(a, b):\n    return a")) == " + b"
+    assert cache.lookup(KEY, request("def add(a, b):\n    return a + b")) is None
+    assert cache.lookup(KEY, request("def add(a, b):\n    return b")) is None
+
+
+def test_longest_stored_prefix_is_used():
+    cache = CompletionCache()
+    cache.store(KEY, request("x = "), "1")
+    cache.store(KEY, request("x = 1"), "0")
+
+    assert cache.lookup(KEY, request("x = 1")) == "0"
+
+
+def test_changed_code_after_cursor_drops_completions():
+    cache = CompletionCache()
+    cache.store(KEY, request("x = ", suffix="\nprint(x)"), "1")
+
+    assert cache.lookup(KEY, request("x = ", suffix="\nprint(y)")) is None
+
+    cache.store(KEY, request("y = ", suffix="\nprint(y)"), "2")
+
+    assert cache.lookup(KEY, request("x = ", suffix="\nprint(x)")) is None
+    assert cache.lookup(KEY, request("y = ", suffix="\nprint(y)")) == "2"
+
+
+def test_completions_over_limit_are_evicted_oldest_first():
+    cache = CompletionCache()
+
+    for i in range(CompletionCache.LIMIT + 1):
+        cache.store(KEY, request(f"line {i:02}\n"), f"value {i}")
+
+    assert cache.lookup(KEY, request("line 00\n")) is None
+    assert cache.lookup(KEY, request("line 01\n")) == "value 1"
+
+    files = cache.files.get(KEY)
+    assert len(files.recent) == CompletionCache.LIMIT
+    assert list(files.trie.prefixes("line 00\n")) == []
+
+
+def test_restored_completion_is_moved_to_end():
+    cache = CompletionCache()
+    cache.store(KEY, request("first\n"), "1")
+
+    for i in range(CompletionCache.LIMIT - 1):
+        cache.store(KEY, request(f"line {i:02}\n"), "2")
+
+    cache.store(KEY, request("first\n"), "3")
+    cache.store(KEY, request("last\n"), "4")
+
+    assert cache.lookup(KEY, request("first\n")) == "3"
+    assert cache.lookup(KEY, request("line 00\n")) is None
+
+
+def test_raw_prompt_is_split_at_fim_marker():
+    data = {"prompt": "<|fim_prefix|>x = <|fim_suffix|>\n<|fim_middle|>", "raw": True}
+
+    assert split_prompt(data) == ("<|fim_prefix|>x = ", "<|fim_suffix|>\n<|fim_middle|>")
+    assert split_prompt({"prompt": "x = ", "raw": True}) is None
+    assert not is_fim_request(data)
+    assert is_fim_request({"prompt": "x = ", "suffix": ""})
+
+
+# APIServer of the queue request is never stored
+unstored_server = pytest.mark.filterwarnings("ignore:Pydantic serializer warnings")
+
+
+async def hold_permit() -> tuple[asyncio.Semaphore, QueueRequest, list[bool]]:
+    """Autocomplete lane permit held by a streamed response that was not read."""
+
+    semaphore = asyncio.Semaphore(1)
+    await semaphore.acquire()
+
+    read = []
+
+    async def body():
+        read.append(True)
+        yield b"{}\n"
+
+    async def send():
+        return StreamingResponse(body())
+
+    queue_request = QueueRequest(APIServer(url="http://ollama:11434"), send)
+    await proxy_queue_request(semaphore, queue_request, hold=True)
+
+    assert semaphore.locked()
+
+    return semaphore, queue_request, read
+
+
+@unstored_server
+async def test_dropped_response_releases_lane_permit():
+    semaphore, queue_request, read = await hold_permit()
+    del queue_request
+    gc.collect()
+
+    assert not semaphore.locked()
+    assert not read
+
+
+@unstored_server
+async def test_response_of_disconnected_client_releases_lane_permit():
+    semaphore, queue_request, read = await hold_permit()
+    response = queue_request.response.result()
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise OSError("Connection reset")
+
+    with pytest.raises(ClientDisconnect):
+        await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+
+    assert not semaphore.locked()
+    assert not read
+
+    response.permit.release()
+    assert semaphore._value == 1
+
+
+@unstored_server
+async def test_abandoned_request_releases_lane_permit():
+    semaphore, queue_request, _ = await hold_permit()
+    queue_request.abandon()
+
+    assert not semaphore.locked()
@@ -0,0 +1,21 @@
+import pytest
+
+from ollama_x.api.continue_dev import etag_matches
+
+ETAG = '"abc"'
+
+
+@pytest.mark.parametrize(
+    ("header", "matches"),
+    [
+        (None, False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"other", W/"abc"', True),
+        ('"other"', False),
+        ('"abcd"', False),
+        ("*", True),
+    ],
+)
+def test_etag_matches(header, matches):
+    assert etag_matches(header, ETAG) is matches
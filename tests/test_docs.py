@@ -0,0 +1,264 @@
+import datetime
+import hashlib
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from ollama_x import codebase, docs
+from ollama_x.config import config
+from ollama_x.docs import PublicResolver, SiteCrawler, check_url
+from ollama_x.model import CodebaseChunk, CodebaseIndex, ContinueDevProject, DocsPage, User
+from ollama_x.model.continue_dev import ProjectConfig
+
+PROJECT_ID = "0" * 24
+
+
+class FakeSite:
+    """Docs site answering conditional requests by ETag."""
+
+    def __init__(self) -> None:
+        self.pages = {
+            "/docs/": '<a href="guide">Guide</a> <a href="api">API</a> <a href="moved">Moved</a>'
+            ' <a href="/docsevil/">Other site</a> <a href="/private">Private</a>',
+            "/docs/guide": "<title>Guide</title><p>Install the package.</p>",
+            "/docs/api": "<title>API</title><p>Call the endpoint.</p>",
+        }
+        self.unavailable: set[str] = set()
+        self.requests: list[tuple[str, int]] = []
+
+        self.app = web.Application()
+        self.app.router.add_get("/docs/moved", self.moved)
+        self.app.router.add_get("/{path:.*}", self.page)
+
+    async def moved(self, request: web.Request) -> web.Response:
+        self.requests.append((request.path, 302))
+
+        return web.Response(status=302, headers={"Location": "/private"})
+
+    async def page(self, request: web.Request) -> web.Response:
+        body = self.pages.get(request.path)
+
+        if request.path in self.unavailable:
+            status, response = 503, web.Response(status=503)
+        elif body is None:
+            status, response = 404, web.Response(status=404)
+        else:
+            etag = f'"{hashlib.md5(body.encode()).hexdigest()}"'
+
+            if request.headers.get("If-None-Match") == etag:
+                status, response = 304, web.Response(status=304)
+            else:
+                status = 200
+                response = web.Response(text=body, content_type="text/html", headers={"ETag": etag})
+
+        self.requests.append((request.path, status))
+
+        return response
+
+
+class FakeStorage:
+    """Crawled pages and stored chunks of one docs site."""
+
+    def __init__(self) -> None:
+        self.pages: dict[str, DocsPage] = {}
+        self.embedded: list[str] = []
+        self.replaced: list[str] = []
+        self.version = 0
+
+    async def of_site(self, project_id: str, site: str):
+        for page in list(self.pages.values()):
+            yield page
+
+    async def save_site(self, project_id: str, site: str, pages, removed) -> None:
+        self.pages.update({page.url: page for page in pages})
+
+        for url in removed:
+            self.pages.pop(url, None)
+
+    async def embed(self, user: User, model: str, texts: list[str]) -> list[list[float]]:
+        self.embedded.extend(texts)
+
+        return [[1.0, 0.0] for _ in texts]
+
+    async def replace_files(self, project_id, paths, chunks, version, site=None) -> int:
+        self.replaced.extend(paths)
+
+        return 0
+
+    async def reserve(self, project_id, model, site=None) -> int:
+        return self.version + 1
+
+    async def publish(self, project_id, version, model, site=None) -> CodebaseIndex:
+        self.version = version
+
+        return CodebaseIndex(
+            project=project_id,
+            site=site,
+            version=version,
+            model=model,
+            updated=datetime.datetime.now(),
+        )
+
+
+@pytest.fixture
+async def site():
+    fake = FakeSite()
+    runner = web.AppRunner(fake.app)
+    await runner.setup()
+
+    server = web.TCPSite(runner, "127.0.0.1", 0)
+    await server.start()
+
+    fake.url = f"http://127.0.0.1:{server._server.sockets[0].getsockname()[1]}"
+
+    yield fake
+
+    await runner.cleanup()
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    fake = FakeStorage()
+
+    async def nothing(*args, **kwargs):
+        return None
+
+    async def no_vectors(*args, **kwargs):
+        return {}
+
+    monkeypatch.setattr(DocsPage, "of_site", fake.of_site)
+    monkeypatch.setattr(DocsPage, "save_site", fake.save_site)
+    monkeypatch.setattr(codebase, "embed", fake.embed)
+    monkeypatch.setattr(CodebaseChunk, "embedded", no_vectors)
+    monkeypatch.setattr(CodebaseChunk, "replace_files", fake.replace_files)
+    monkeypatch.setattr(CodebaseChunk, "remove_replaced", nothing)
+    monkeypatch.setattr(CodebaseIndex, "reserve", fake.reserve)
+    monkeypatch.setattr(CodebaseIndex, "current", nothing)
+    monkeypatch.setattr(CodebaseIndex, "publish", fake.publish)
+
+    return fake
+
+
+async def test_crawl_indexes_changed_pages(site, storage, monkeypatch):
+    # the site is served on loopback
+    monkeypatch.setattr(docs, "is_public_address", lambda address: True)
+
+    project = ContinueDevProject(
+        id=PROJECT_ID,
+        admin="admin",
+        name="project",
+        config=ProjectConfig.model_validate(
+            {
+                "contextProviders": [
+                    {
+                        "name": "docs",
+                        "params": {
+                            "sites": [
+                                {
+                                    "title": "Docs",
+                                    "startUrl": f"{site.url}/docs/",
+                                    "rootUrl": f"{site.url}/docs",
+                                }
+                            ]
+                        },
+                    }
+                ]
+            }
+        ),
+    )
+    user = User(username="admin")
+    (docs_site,) = docs.project_sites(project)
+
+    async def ingest() -> docs.SiteIngest:
+        site.requests.clear()
+        storage.embedded.clear()
+        storage.replaced.clear()
+
+        async with aiohttp.ClientSession() as session:
+            return await docs.ingest_site(user, project, docs_site, session)
+
+    result = await ingest()
+
+    assert (result.pages, result.changed, result.removed) == (3, 3, 0)
+    assert sorted(site.requests) == [
+        ("/docs/", 200),
+        ("/docs/api", 200),
+        ("/docs/guide", 200),
+        ("/docs/moved", 302),
+    ]
+    assert "Install the package.\n" in storage.embedded
+    assert result.index.version == 1
+
+    result = await ingest()
+
+    assert (result.pages, result.changed, result.removed, result.index) == (3, 0, 0, None)
+    assert {status for _, status in site.requests} == {302, 304}
+    assert storage.embedded == []
+
+    site.pages["/docs/guide"] = "<title>Guide</title><p>Install the package with pip.</p>"
+    result = await ingest()
+
+    assert (result.pages, result.changed, result.removed) == (3, 1, 0)
+    assert storage.embedded == ["Install the package with pip.\n"]
+    assert storage.replaced == [f"{site.url}/docs/guide"]
+    assert storage.pages[f"{site.url}/docs/guide"].title == "Guide"
+
+    site.unavailable.add("/docs/guide")
+    result = await ingest()
+
+    assert (result.pages, result.changed, result.removed, result.index) == (3, 0, 0, None)
+    assert ("/docs/guide", 503) in site.requests
+    assert storage.pages[f"{site.url}/docs/guide"].title == "Guide"
+
+    site.unavailable.clear()
+    monkeypatch.setattr(config, "docs_max_pages", 2)
+    result = await ingest()
+
+    # pages still linked but over the limit are kept
+    assert (result.pages, result.removed, result.index) == (2, 0, None)
+    assert len(storage.pages) == 3
+
+    monkeypatch.setattr(config, "docs_max_pages", 1000)
+    del site.pages["/docs/api"]
+    result = await ingest()
+
+    assert (result.pages, result.changed, result.removed) == (2, 0, 1)
+    assert storage.embedded == []
+    assert storage.replaced == [f"{site.url}/docs/api"]
+    assert f"{site.url}/docs/api" not in storage.pages
+
+
+def test_links_stay_within_root():
+    crawler = SiteCrawler("https://docs.example.com/guide/", "https://docs.example.com/guide")
+
+    assert crawler.within_root("https://docs.example.com/guide")
+    assert crawler.within_root("https://DOCS.example.com/guide/install")
+    assert not crawler.within_root("https://docs.example.com/guides")
+    assert not crawler.within_root("https://docs.example.com.evil/guide/")
+    assert not crawler.within_root("http://docs.example.com/guide/")
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "file:///etc/passwd",
+        "http://127.0.0.1/",
+        "http://10.0.0.1/",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://[::1]/",
+        "http://[::ffff:192.168.0.1]/",
+    ],
+)
+def test_internal_urls_are_rejected(url):
+    with pytest.raises(aiohttp.InvalidURL):
+        check_url(url)
+
+
+async def test_names_of_internal_hosts_are_not_resolved():
+    resolver = PublicResolver()
+
+    with pytest.raises(OSError):
+        await resolver.resolve("localhost")
+
+    await resolver.close()
@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import os
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from ollama_x import mirror
+from ollama_x.api import registry
+from ollama_x.api.exceptions import handle_registry_error
+from ollama_x.auth import user_keys
+from ollama_x.cache import TTLCache
+from ollama_x.mirror import BlobDownload, BlobStore, RegistryError, read_mapped
+from ollama_x.model import APIServer
+
+
+async def read_blob(download: BlobDownload) -> bytes:
+    size = await download.wait_size()
+
+    return b"".join([chunk async for chunk in download.read(0, size)])
+
+
+async def test_complete_partial_file_is_read_after_rename(tmp_path, registry):
+    content = os.urandom(3000)
+    digest = f"sha256:{hashlib.sha256(content).hexdigest()}"
+
+    store = BlobStore(tmp_path)
+    path = store.blob_path(digest)
+    path.parent.mkdir(parents=True)
+    path.with_name(f"{path.name}-partial").write_bytes(content)
+
+    download = store.get_blob("library/test", digest)
+    size = await download.wait_size()
+    await download.task
+
+    assert path.exists()
+    assert b"".join([chunk async for chunk in download.read(0, size)]) == content
+    assert registry.requests == []
+
+
+async def test_small_blob_is_read_after_download_finished(tmp_path, registry):
+    content = b"small blob"
+    digest = registry.add_blob(content)
+
+    download = BlobStore(tmp_path).get_blob("library/test", digest)
+    await download.task
+
+    assert await read_blob(download) == content
+
+
+async def test_partial_file_is_resumed(tmp_path, registry):
+    content = os.urandom(200_000)
+    digest = registry.add_blob(content)
+
+    store = BlobStore(tmp_path)
+    path = store.blob_path(digest)
+    path.parent.mkdir(parents=True)
+    path.with_name(f"{path.name}-partial").write_bytes(content[:50_000])
+
+    download = store.get_blob("library/test", digest)
+
+    assert await read_blob(download) == content
+    assert registry.requests == [(digest, "bytes=50000-")]
+    assert path.read_bytes() == content
+
+
+async def test_workers_download_blob_once(tmp_path, registry):
+    content = os.urandom(1_000_000)
+    digest = registry.add_blob(content)
+    registry.chunk_delay = 0.01
+
+    # Stores of two workers sharing the directory.
+    first, second = BlobStore(tmp_path), BlobStore(tmp_path)
+
+    first_download = first.get_blob("library/test", digest)
+    await first_download.wait_size()
+    second_download = second.get_blob("library/test", digest)
+
+    assert await asyncio.gather(read_blob(first_download), read_blob(second_download)) == [
+        content,
+        content,
+    ]
+    assert registry.requests == [(digest, None)]
+    assert first.blob_path(digest).read_bytes() == content
+
+
+async def test_empty_blob_is_read(tmp_path):
+    path = tmp_path / "blob"
+    path.write_bytes(b"")
+
+    assert [chunk async for chunk in read_mapped(path, 0, 0)] == []
+
+
+@pytest.fixture
+def registry_api(monkeypatch):
+    servers: list[APIServer] = []
+
+    async def all_servers():
+        for server in servers:
+            yield server
+
+    async def no_user(key):
+        return None
+
+    monkeypatch.setattr(APIServer, "all", all_servers)
+    monkeypatch.setattr(user_keys, "user", no_user)
+    monkeypatch.setattr(mirror, "store", None)
+    monkeypatch.setattr(registry, "server_addresses", TTLCache("test", 1, 60))
+
+    app = FastAPI()
+    app.include_router(registry.router)
+    app.add_exception_handler(RegistryError, handle_registry_error)
+
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ), servers
+
+
+# APIServer of the fake server is never stored
+@pytest.mark.filterwarnings("ignore:Pydantic serializer warnings")
+async def test_registry_is_available_to_servers_only(registry_api):
+    client, servers = registry_api
+
+    async with client:
+        response = await client.get("/v2/library/test/manifests/latest")
+
+        assert response.status_code == 401
+        assert response.json()["errors"][0]["code"] == "UNAUTHORIZED"
+
+        registry.server_addresses.clear()
+        servers.append(APIServer(url="http://127.0.0.1:11434"))
+        response = await client.get("/v2/library/test/manifests/latest")
+
+        # the test mirror is disabled
+        assert response.status_code == 404
@@ -0,0 +1,124 @@
+import datetime
+
+import pytest
+from pytz import utc
+
+from conftest import COMPLETION_TOKENS, GENERATION_ENDPOINTS, PROMPT_TOKENS
+from ollama_x.model.ratelimit import RateLimits, RateLimitUsage
+from ollama_x.ratelimit import RateLimiter, RateLimitExceeded
+
+BODY = {"model": "llama3.1", "messages": [{"role": "user", "content": "Hi"}], "prompt": "Hi"}
+
+
+@pytest.fixture
+def rate_limiter(monkeypatch):
+    limiter = RateLimiter()
+    monkeypatch.setattr("ollama_x.api.middleware.ratelimit.rate_limiter", limiter)
+
+    return limiter
+
+
+class FakeUsageCollection:
+    """Published usage of all workers, as stored in Mongo."""
+
+    def __init__(self) -> None:
+        self.usage: dict[tuple[str, str], dict] = {}
+
+    async def publish(self, worker: str, usage: dict[str, tuple[float, float]]) -> None:
+        for key, (requests, tokens) in usage.items():
+            self.usage[key, worker] = {
+                "key": key,
+                "worker": worker,
+                "requests": requests,
+                "tokens": tokens,
+                "updated": datetime.datetime.now(utc),
+            }
+
+    async def updated_by_others(self, worker: str, since: datetime.datetime) -> list[dict]:
+        return [
+            {name: value for name, value in usage.items() if name != "updated"}
+            for usage in self.usage.values()
+            if usage["worker"] != worker and usage["updated"] >= since
+        ]
+
+
+@pytest.mark.parametrize("path", GENERATION_ENDPOINTS)
+async def test_tokens_are_limited_on_generation_endpoints(api, user, rate_limiter, path):
+    user.limits = RateLimits(tokens_per_minute=PROMPT_TOKENS)
+
+    response = await api.post(path, json=BODY)
+    await response.aread()
+
+    assert response.status_code == 200
+    assert rate_limiter.usages[f"user:{user.id}"].total_tokens == PROMPT_TOKENS + COMPLETION_TOKENS
+
+    response = await api.post(path, json=BODY)
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+async def test_requests_over_limit_are_rejected(api, user, rate_limiter):
+    user.limits = RateLimits(requests_per_second=1)
+
+    assert (await api.post(GENERATION_ENDPOINTS[0], json=BODY)).status_code == 200
+
+    response = await api.post(GENERATION_ENDPOINTS[0], json=BODY)
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+
+async def test_usage_of_other_workers_is_synced(monkeypatch):
+    collection = FakeUsageCollection()
+    monkeypatch.setattr(RateLimitUsage, "publish", collection.publish)
+    monkeypatch.setattr(RateLimitUsage, "updated_by_others", collection.updated_by_others)
+
+    limits = {"user:1": RateLimits(tokens_per_minute=100)}
+    await collection.publish("stopped", {"user:1": (1, 1000)})
+
+    first, second = RateLimiter(), RateLimiter()
+    first.worker, second.worker = "first", "second"
+    first.synced = second.synced = datetime.datetime.now(utc)
+    await first.load_baseline()
+    await second.load_baseline()
+
+    second.acquire(limits)
+    await first.sync()
+    await second.sync()
+
+    # usage published before the start is not taken again
+    second.acquire(limits)
+
+    # usage of a worker first published after the start is taken entirely
+    first.acquire(limits)
+    first.settle(list(limits), 150)
+    await first.sync()
+    await second.sync()
+
+    with pytest.raises(RateLimitExceeded):
+        second.acquire(limits)
+
+    assert second.usages["user:1"].total_tokens == 0
+
+
+async def test_failed_publish_is_retried(monkeypatch):
+    collection = FakeUsageCollection()
+    monkeypatch.setattr(RateLimitUsage, "updated_by_others", collection.updated_by_others)
+
+    async def unavailable(worker, usage):
+        raise ConnectionError
+
+    limiter = RateLimiter()
+    limiter.synced = datetime.datetime.now(utc)
+    limiter.acquire({"user:1": RateLimits(requests_per_second=10)})
+
+    monkeypatch.setattr(RateLimitUsage, "publish", unavailable)
+
+    with pytest.raises(ConnectionError):
+        await limiter.sync()
+
+    monkeypatch.setattr(RateLimitUsage, "publish", collection.publish)
+    await limiter.sync()
+
+    assert collection.usage["user:1", limiter.worker]["requests"] == 1
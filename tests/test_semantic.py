@@ -0,0 +1,126 @@
+import time
+
+import httpx
+import numpy as np
+import pytest
+from aiohttp import web
+from fastapi import FastAPI
+
+import ollama_x.api.ollama
+from conftest import RESPONSES
+from ollama_x.api import endpoints
+from ollama_x.api.helpers import get_session
+from ollama_x.api.middleware import MIDDLEWARES
+from ollama_x.auth import ProjectAccess, project_members
+from ollama_x.model import APIServer, User
+from ollama_x.semantic import SemanticCache, semantic_scope
+
+SCOPE = semantic_scope(None, "llama3.1:latest", None, "")
+QUESTION = {"model": "llama3.1", "messages": [{"role": "user", "content": "What is ollama-x?"}]}
+
+
+def unit(*values: float) -> np.ndarray:
+    vector = np.asarray(values, dtype=np.float32)
+
+    return vector / np.linalg.norm(vector)
+
+
+def test_expired_best_entry_does_not_hide_live_one():
+    cache = SemanticCache(10, 60, 0.9)
+    cache.store(SCOPE, unit(1, 0.3), "expired")
+    cache.store(SCOPE, unit(1, -0.4), "live")
+
+    (expired,) = [entry for entry in cache.entries.values() if entry.answer == "expired"]
+    expired.expires = time.monotonic() - 1
+
+    entry = cache.lookup(SCOPE, unit(1, 0))
+
+    assert entry is not None and entry.answer == "live"
+    assert len(cache) == 1
+
+
+@pytest.fixture
+async def ollama():
+    """Ollama server answering chat requests, counts them."""
+
+    requests = []
+
+    async def chat(request: web.Request) -> web.Response:
+        requests.append(await request.json())
+
+        return web.Response(body=RESPONSES[endpoints.PROXY_CHAT])
+
+    app = web.Application()
+    app.router.add_post("/api/chat", chat)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+
+    yield f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}", requests
+
+    await runner.cleanup()
+
+
+# APIServer of the fake server is never stored
+@pytest.mark.filterwarnings("ignore:Pydantic serializer warnings")
+async def test_project_answers_are_cached_on_ollama_paths(monkeypatch, ollama):
+    url, requests = ollama
+    user = User(id="1" * 24, username="member", key=User.generate_key())
+    project_id = "2" * 24
+
+    async def authenticate(request, anonymous_allowed=True):
+        return user
+
+    async def route(user, requested_model, lane=None):
+        return APIServer(url=url), "llama3.1:latest"
+
+    async def embed(user, model, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    async def access(project):
+        return ProjectAccess(
+            members=frozenset({user.id}),
+            limits=None,
+            version=0,
+            autocomplete_models=frozenset(),
+            semantic_cache=project == project_id,
+        )
+
+    async def is_member(project, user_id):
+        return True
+
+    for module in ("continue_dev", "ollama", "ratelimit"):
+        monkeypatch.setattr(f"ollama_x.api.middleware.{module}.authenticate", authenticate)
+
+    monkeypatch.setattr(ollama_x.api.ollama, "route", route)
+    monkeypatch.setattr(ollama_x.api.ollama, "embed", embed)
+    monkeypatch.setattr(ollama_x.api.ollama, "semantic_cache", SemanticCache(10, 60, 0.9))
+    monkeypatch.setattr(project_members, "access", access)
+    monkeypatch.setattr(project_members, "is_member", is_member)
+
+    app = FastAPI()
+    app.include_router(ollama_x.api.ollama.router)
+    app.dependency_overrides[get_session] = lambda: None
+
+    for middleware in MIDDLEWARES:
+        app.add_middleware(middleware)
+
+    transport = httpx.ASGITransport(app=app)
+    headers = {"ContinueDevProject": project_id}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await client.post(endpoints.OLLAMA_CHAT, json=QUESTION, headers=headers)
+        second = await client.post(endpoints.OLLAMA_CHAT, json=QUESTION, headers=headers)
+        other = await client.post(
+            endpoints.OLLAMA_CHAT, json=QUESTION, headers={"ContinueDevProject": "3" * 24}
+        )
+
+    assert first.status_code == second.status_code == other.status_code == 200
+    assert endpoints.SEMANTIC_CACHE_HEADER not in first.headers
+    assert endpoints.SEMANTIC_CACHE_HEADER in second.headers
+    assert second.json()["message"]["content"] == "Hi"
+    assert endpoints.SEMANTIC_CACHE_HEADER not in other.headers
+    assert len(requests) == 2
@@ -0,0 +1,215 @@
+import datetime
+import json
+import operator
+
+import httpx
+import pytest
+from aiohttp import web
+from fastapi import FastAPI
+from pytz import utc
+
+import ollama_x.api.ollama
+from conftest import COMPLETION_TOKENS, GENERATION_ENDPOINTS, PROMPT_TOKENS
+from ollama_x.api import endpoints
+from ollama_x.api.helpers import get_session
+from ollama_x.api.middleware import MIDDLEWARES
+from ollama_x.api.usage import get_rollups
+from ollama_x.model import APIServer, UsageRecord, UsageRollup
+from ollama_x.usage import UsageLedger
+
+BODY = {"model": "llama3.1", "messages": [{"role": "user", "content": "Hi"}], "prompt": "Hi"}
+
+OPERATORS = {"$gte": operator.ge, "$lt": operator.lt}
+
+
+class FakeCollection:
+    """Collection supporting the queries and updates of the usage ledger."""
+
+    def __init__(self) -> None:
+        self.documents: list[dict] = []
+
+    @staticmethod
+    def matches(document: dict, query: dict) -> bool:
+        for field, condition in query.items():
+            value = document.get(field)
+
+            if isinstance(condition, dict):
+                if not all(OPERATORS[op](value, bound) for op, bound in condition.items()):
+                    return False
+            elif value != condition:
+                return False
+
+        return True
+
+    async def insert_many(self, documents: list[dict], ordered: bool = True) -> None:
+        self.documents.extend(documents)
+
+    async def bulk_write(self, operations: list, ordered: bool = True) -> None:
+        for operation in operations:
+            document = next(
+                (doc for doc in self.documents if self.matches(doc, operation._filter)), None
+            )
+
+            if document is None:
+                document = dict(operation._filter)
+                self.documents.append(document)
+
+            document.update(operation._doc.get("$set", {}))
+
+            for path, value in operation._doc.get("$inc", {}).items():
+                *parents, name = path.split(".")
+                target = document
+
+                for parent in parents:
+                    target = target.setdefault(parent, {})
+
+                target[name] = target.get(name, 0) + value
+
+    async def find(self, query: dict, sort: list | None = None):
+        for document in self.documents:
+            if self.matches(document, query):
+                yield document
+
+
+@pytest.fixture
+def collections(monkeypatch):
+    collections = {UsageRollup: FakeCollection(), UsageRecord: FakeCollection()}
+
+    for document, collection in collections.items():
+        monkeypatch.setattr(document, "collection", classmethod(lambda cls, c=collection: c))
+
+    return collections
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    ledger = UsageLedger()
+    monkeypatch.setattr("ollama_x.api.middleware.usage.usage", ledger)
+
+    return ledger
+
+
+async def test_usage_of_generation_endpoints_is_rolled_up(api, user, ledger, collections):
+    since = datetime.datetime.now(utc) - datetime.timedelta(days=1)
+
+    for path in GENERATION_ENDPOINTS:
+        response = await api.post(path, json=BODY)
+        await response.aread()
+
+        assert response.status_code == 200
+
+    await ledger.flush()
+
+    for period in ("hour", "day"):
+        (rollup,) = await get_rollups(user, since, period=period, user_id=user.id)
+
+        assert rollup.username == user.username
+        assert rollup.model == "llama3.1"
+        assert rollup.counters.requests == len(GENERATION_ENDPOINTS)
+        assert rollup.counters.prompt_tokens == PROMPT_TOKENS * len(GENERATION_ENDPOINTS)
+        assert rollup.counters.completion_tokens == COMPLETION_TOKENS * len(GENERATION_ENDPOINTS)
+
+    assert len(collections[UsageRecord].documents) == 1
+    assert not ledger.usage
+
+
+async def test_stop_flushes_remaining_usage(api, user, ledger, collections):
+    ledger.start()
+
+    response = await api.post(GENERATION_ENDPOINTS[0], json=BODY)
+    await response.aread()
+
+    assert collections[UsageRollup].documents == []
+
+    await ledger.stop()
+
+    assert {rollup["period"] for rollup in collections[UsageRollup].documents} == {"hour", "day"}
+    assert collections[UsageRecord].documents[0]["counters"]["gpu_seconds"] == 3.0
+
+
+@pytest.fixture
+async def openai_server():
+    """OpenAI compatible server adding the usage chunk to streams only on request."""
+
+    async def chat(request: web.Request) -> web.Response:
+        data = await request.json()
+        chunks = [
+            {"choices": [{"delta": {"content": "Hi"}, "finish_reason": None}]},
+            {"choices": [{"delta": {"content": ""}, "finish_reason": "stop"}]},
+        ]
+
+        if (data.get("stream_options") or {}).get("include_usage"):
+            chunks.append(
+                {
+                    "choices": [],
+                    "usage": {
+                        "prompt_tokens": PROMPT_TOKENS,
+                        "completion_tokens": COMPLETION_TOKENS,
+                    },
+                }
+            )
+
+        body = b"".join(
+            f"data: {json.dumps(chunk, separators=(',', ':'))}\n\n".encode() for chunk in chunks
+        )
+
+        return web.Response(body=body + b"data: [DONE]\n\n", content_type="text/event-stream")
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+
+    yield f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    await runner.cleanup()
+
+
+# APIServer of the fake server is never stored
+@pytest.mark.filterwarnings("ignore:Pydantic serializer warnings")
+async def test_usage_is_accounted_but_sent_only_on_request(
+    monkeypatch, user, ledger, collections, openai_server
+):
+    async def authenticate(request, anonymous_allowed=True):
+        return user
+
+    async def route(user, requested_model, lane=None):
+        return APIServer(url=openai_server), requested_model
+
+    for module in ("ollama", "ratelimit"):
+        monkeypatch.setattr(f"ollama_x.api.middleware.{module}.authenticate", authenticate)
+
+    monkeypatch.setattr(ollama_x.api.ollama, "route", route)
+
+    app = FastAPI()
+    app.include_router(ollama_x.api.ollama.router)
+    app.dependency_overrides[get_session] = lambda: None
+
+    for middleware in MIDDLEWARES:
+        app.add_middleware(middleware)
+
+    body = {**BODY, "stream": True}
+    bodies = []
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        for request in (body, {**body, "stream_options": {"include_usage": True}}):
+            response = await client.post(endpoints.OLLAMA_OPENAI_CHAT, json=request)
+            bodies.append(response.content)
+
+    assert b'"usage"' not in bodies[0]
+    assert bodies[0].endswith(b"data: [DONE]\n\n")
+    assert b'"usage"' in bodies[1]
+
+    await ledger.flush()
+
+    (rollup,) = await get_rollups(user, datetime.datetime(2000, 1, 1, tzinfo=utc), period="day")
+
+    assert rollup.counters.requests == 2
+    assert rollup.counters.prompt_tokens == 2 * PROMPT_TOKENS
+    assert rollup.counters.completion_tokens == 2 * COMPLETION_TOKENS
@@ -0,0 +1,140 @@
+import datetime
+
+import bson
+import numpy as np
+import pytest
+
+from ollama_x import vectors
+from ollama_x.model import CodebaseIndex
+from ollama_x.vectors import VectorIndex, VectorIndexes
+
+PROJECT = bson.ObjectId()
+
+
+def matches(document: dict, query: dict) -> bool:
+    """Match a document against the subset of query operators used by index snapshots."""
+
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(document, alternative) for alternative in condition):
+                return False
+            continue
+
+        value = document.get(field)
+
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+
+        for op, bound in condition.items():
+            if op == "$not":
+                if matches(document, {field: bound}):
+                    return False
+            elif op == "$gt":
+                if value is None or not value > bound:
+                    return False
+            elif op == "$lte":
+                if value is None or not value <= bound:
+                    return False
+            elif op == "$in":
+                if value not in bound:
+                    return False
+            elif op == "$nin":
+                if value in bound:
+                    return False
+
+    return True
+
+
+def index(version: int, pending: list[int] | None = None) -> CodebaseIndex:
+    return CodebaseIndex(
+        project=str(PROJECT),
+        version=version,
+        pending=pending or [],
+        model="embed",
+        updated=datetime.datetime.now(),
+    )
+
+
+def chunk(name: str, version: int | None = None, removed: int | None = None) -> dict:
+    document = {"name": name, "project": PROJECT, "site": None}
+
+    if version is not None:
+        document["version"] = version
+
+    if removed is not None:
+        document["removed"] = removed
+
+    return document
+
+
+def snapshot(current: CodebaseIndex, chunks: list[dict]) -> set[str]:
+    return {document["name"] for document in chunks if matches(document, current.chunks_query())}
+
+
+def test_snapshot_hides_pending_updates():
+    chunks = [
+        chunk("legacy"),
+        chunk("replaced", version=1, removed=3),
+        chunk("published", version=3),
+        chunk("replaced by pending", version=1, removed=4),
+        chunk("pending", version=4),
+        chunk("reserved later", version=6),
+    ]
+
+    # update 4 is still running when update 5 is published as version 6
+    assert snapshot(index(6, pending=[4]), chunks) == {
+        "legacy",
+        "published",
+        "replaced by pending",
+        "reserved later",
+    }
+    assert snapshot(index(2), chunks) == {"legacy", "replaced", "replaced by pending"}
+
+
+@pytest.fixture
+def indexes(monkeypatch):
+    versions: list[int] = []
+    built: list[int] = []
+
+    async def current(project_id, site=None):
+        return index(versions[0] if len(versions) == 1 else versions.pop(0))
+
+    async def build(current):
+        built.append(current.version)
+        ids = np.frombuffer(bson.ObjectId().binary, dtype=np.uint8).reshape(1, 12)
+        return VectorIndex.build(ids, np.ones((1, 4), dtype=np.int8), np.ones(1, np.float32))
+
+    monkeypatch.setattr(CodebaseIndex, "current", current)
+    monkeypatch.setattr(VectorIndexes, "build", staticmethod(build))
+
+    return VectorIndexes(None), versions, built
+
+
+async def test_index_built_again_if_published_during_build(indexes):
+    loaded, versions, built = indexes
+    versions.extend([1, 2, 2])
+
+    current, _ = await loaded.get(str(PROJECT))
+
+    assert current.version == 2
+    assert built == [1, 2]
+
+    await loaded.get(str(PROJECT))
+
+    assert built == [1, 2]
+
+
+async def test_loaded_indexes_are_bounded(indexes, monkeypatch):
+    monkeypatch.setattr(vectors.config, "vector_index_cache_size", 2)
+
+    _, versions, _ = indexes
+    loaded = VectorIndexes(None)
+    versions.append(1)
+
+    for project in range(5):
+        await loaded.get(str(project))
+
+    assert len(loaded.loaded) == 2
+    assert not loaded.locks